@@ -0,0 +1,275 @@
+# batch_inspect.py
+#
+# Offline inspection of archived footage / image folders.
+#
+#   python batch_inspect.py data_collection/collected --sheet-id archive_0711
+#   python batch_inspect.py "footage/*.mp4" --workers 4 --batch 8 --speed 50
+#
+# Inputs are split into work units (image chunks / video frame ranges) that
+# run on a process pool; each worker loads the model once, decodes ahead on a
+# small thread pool and runs batched inference. The parent process writes
+# the defect DB and a JSON-lines manifest.
+
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from config import MODEL_PATH, CONF_THRESHOLD, INFER_BATCH_SIZE, REPORT_DIR
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv")
+IMAGES_PER_UNIT = 64
+FRAMES_PER_UNIT = 600
+
+_engine = None
+_names = None
+_version = None
+
+
+# --------------------------------------------------------------------
+def expand_inputs(inputs):
+    """Resolve directories, globs and files into (images, videos) path lists."""
+    images, videos = [], []
+    for spec in inputs:
+        if os.path.isdir(spec):
+            paths = [os.path.join(root, f) for root, _dirs, files in os.walk(spec) for f in files]
+        elif any(ch in spec for ch in "*?["):
+            paths = glob.glob(spec, recursive=True)
+        else:
+            paths = [spec]
+        for p in sorted(paths):
+            ext = os.path.splitext(p)[1].lower()
+            if ext in IMAGE_EXTS:
+                images.append(p)
+            elif ext in VIDEO_EXTS:
+                videos.append(p)
+    return images, videos
+
+
+def plan_units(images, videos, images_per_unit=IMAGES_PER_UNIT, frames_per_unit=FRAMES_PER_UNIT):
+    """Split the work into independent units for the process pool."""
+    units = []
+    for i in range(0, len(images), images_per_unit):
+        units.append({"kind": "images", "paths": images[i:i + images_per_unit]})
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        cap.release()
+        if total <= 0:
+            print(f"⚠️ Cannot read frame count of {path}; inspecting it as one unit.")
+            units.append({"kind": "video", "path": path, "start": 0, "end": None, "fps": fps})
+            continue
+        for start in range(0, total, frames_per_unit):
+            units.append({"kind": "video", "path": path, "start": start,
+                          "end": min(total, start + frames_per_unit), "fps": fps})
+    return units
+
+
+# --------------------------------------------------------------------
+def _iter_unit_frames(unit, decode_threads, prefetch):
+    """Yield ``(source, frame_index, image)`` with decoding running ahead."""
+    if unit["kind"] == "images":
+        with ThreadPoolExecutor(max_workers=decode_threads) as pool:
+            futures = [(p, pool.submit(cv2.imread, p)) for p in unit["paths"]]
+            for p, fut in futures:
+                img = fut.result()
+                if img is None:
+                    print(f"⚠️ Failed to load image at: {p}")
+                    continue
+                yield p, 0, img
+        return
+
+    frames = queue.Queue(maxsize=prefetch)
+
+    def reader():
+        cap = cv2.VideoCapture(unit["path"])
+        if unit["start"]:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, unit["start"])
+        index = unit["start"]
+        while unit["end"] is None or index < unit["end"]:
+            ret, img = cap.read()
+            if not ret:
+                break
+            frames.put((unit["path"], index, img))
+            index += 1
+        cap.release()
+        frames.put(None)
+
+    threading.Thread(target=reader, daemon=True).start()
+    while (item := frames.get()) is not None:
+        yield item
+
+
+def _init_worker(model_path, backend, conf, batch_size, torch_threads, tiled, roi):
+    global _engine, _names, _version
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    from utils.batching import BatchInferenceEngine
+    from utils.model_registry import get_model, model_version
+    model = get_model(model_path, backend=backend)
+    _names = model.names
+    _version = model_version(model)
+    _engine = BatchInferenceEngine(model, batch_size=batch_size, max_wait_ms=0, conf=conf)
+    if tiled:
+        from utils.tiling import TiledInference
+        _engine = TiledInference(_engine)
+    if roi != "off":
+        from utils.roi import ROIInference, StripROI
+        _engine = ROIInference(_engine, StripROI(roi))
+
+
+def _inspect_unit(args):
+    """Worker: run one unit, return its detections and frame count."""
+    unit, decode_threads, prefetch, speed_mps, crop_dir = args
+    detections = []
+    frames = 0
+    batch = []
+
+    def run(batch):
+        for (source, index, img), result in zip(batch, _engine.infer(b[2] for b in batch)):
+            for xyxy, cls_id, conf in zip(result.boxes.xyxy.tolist(), result.boxes.cls.tolist(),
+                                          result.boxes.conf.tolist()):
+                det = {
+                    "source": source,
+                    "frame": index,
+                    "defect_type": _names[int(cls_id)],
+                    "confidence": round(float(conf), 4),
+                    "bbox": [round(v, 1) for v in xyxy],
+                    "frame_size": [img.shape[1], img.shape[0]],
+                    "model_version": _version,
+                    "length_m": 0.0,
+                    "image_path": source,
+                }
+                if unit["kind"] == "video" and unit["fps"] and speed_mps:
+                    det["length_m"] = round(index / unit["fps"] * speed_mps, 2)
+                x1, y1, x2, y2 = (int(v) for v in xyxy)
+                if crop_dir and x2 > x1 and y2 > y1:
+                    stem = os.path.splitext(os.path.basename(source))[0]
+                    det["image_path"] = os.path.join(
+                        crop_dir, f"{stem}_{index:06d}_{det['defect_type']}_{x1}_{y1}.jpg")
+                    cv2.imwrite(det["image_path"], img[y1:y2, x1:x2])
+                detections.append(det)
+
+    for item in _iter_unit_frames(unit, decode_threads, prefetch):
+        batch.append(item)
+        frames += 1
+        if len(batch) >= _engine.batch_size:
+            run(batch)
+            batch = []
+    if batch:
+        run(batch)
+    return detections, frames
+
+
+# --------------------------------------------------------------------
+def run_batch_inspection(inputs, sheet_id="batch", model_path=MODEL_PATH, conf=CONF_THRESHOLD,
+                         batch_size=INFER_BATCH_SIZE, workers=None, decode_threads=2,
+                         prefetch=32, speed_mps=None, manifest_path=None, write_db=True,
+                         save_crops=False, backend=None, tiled=False, roi="off"):
+    """Inspect every image / video frame in ``inputs``; returns a summary dict."""
+    images, videos = expand_inputs(inputs)
+    units = plan_units(images, videos)
+    if not units:
+        print("❌ No images or videos found.")
+        return {"frames": 0, "defects": 0}
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or max(1, cpus // 2), len(units)))
+    torch_threads = max(1, cpus // workers)
+    out_dir = os.path.join(REPORT_DIR, sheet_id)
+    manifest_path = manifest_path or os.path.join(out_dir, "batch_manifest.jsonl")
+    crop_dir = os.path.join(out_dir, "images") if save_crops else None
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    if crop_dir:
+        os.makedirs(crop_dir, exist_ok=True)
+
+    store = None
+    if write_db:
+        from utils.sql_connector import init_db, get_store
+        init_db()
+        store = get_store()
+
+    video_s = 0.0
+    for unit in units:
+        if unit["kind"] == "video" and unit["fps"] and unit["end"] is not None:
+            video_s += (unit["end"] - unit["start"]) / unit["fps"]
+
+    print(f"📦 {len(images)} image(s), {len(videos)} video(s) → {len(units)} unit(s) "
+          f"on {workers} worker(s) × {torch_threads} thread(s), batch={batch_size}")
+    t0 = time.perf_counter()
+    frames = defects = 0
+    jobs = [(u, decode_threads, prefetch, speed_mps, crop_dir) for u in units]
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker,
+                  initargs=(model_path, backend, conf, batch_size, torch_threads, tiled, roi)) as pool, \
+            open(manifest_path, "w") as manifest:
+        for done, (dets, n) in enumerate(pool.imap_unordered(_inspect_unit, jobs), 1):
+            frames += n
+            defects += len(dets)
+            for det in dets:
+                manifest.write(json.dumps(det) + "\n")
+                if store is not None:
+                    store.add(sheet_id, det["defect_type"], det["length_m"], det["image_path"],
+                              confidence=det["confidence"], box=det["bbox"],
+                              frame_size=det["frame_size"], model_version=det["model_version"],
+                              frame_index=det["frame"])
+            elapsed = time.perf_counter() - t0
+            print(f"   [{done}/{len(units)}] {frames} frames, {defects} defects, "
+                  f"{frames / elapsed:.1f} FPS", end="\r")
+    if store is not None:
+        store.flush()
+
+    elapsed = time.perf_counter() - t0
+    summary = {"frames": frames, "defects": defects, "seconds": round(elapsed, 2),
+               "fps": round(frames / elapsed, 1) if elapsed else 0.0,
+               "manifest": manifest_path}
+    if video_s:
+        summary["realtime_factor"] = round(video_s / elapsed, 1)
+    print(f"\n✅ Batch inspection done: {frames} frames, {defects} defects in {elapsed:.1f}s "
+          f"({summary['fps']} FPS" +
+          (f", ×{summary['realtime_factor']} real-time" if video_s else "") +
+          f") → {manifest_path}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline defect inspection of image folders / videos.")
+    parser.add_argument("inputs", nargs="+", help="directories, globs, image or video files")
+    parser.add_argument("--sheet-id", default="batch", help="sheet id used for DB rows and output folder")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", default=None,
+                        help="pytorch | onnx | onnx_int8 | openvino | openvino_int8 (default: config)")
+    parser.add_argument("--conf", type=float, default=CONF_THRESHOLD)
+    parser.add_argument("--batch", type=int, default=max(4, INFER_BATCH_SIZE))
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: half the cores)")
+    parser.add_argument("--decode-threads", type=int, default=2)
+    parser.add_argument("--speed", type=float, default=None, help="line speed (m/s) for video length_m")
+    parser.add_argument("--manifest", default=None, help="output JSON-lines manifest path")
+    parser.add_argument("--no-db", action="store_true", help="do not write defect_logs")
+    parser.add_argument("--save-crops", action="store_true", help="save a crop per detection")
+    parser.add_argument("--tiled", action="store_true", help="overlapping-tile inference")
+    parser.add_argument("--roi", choices=("off", "fixed", "auto"), default="off",
+                        help="crop frames to the strip before inference")
+    args = parser.parse_args()
+
+    result = run_batch_inspection(
+        args.inputs, sheet_id=args.sheet_id, model_path=args.model, conf=args.conf,
+        batch_size=args.batch, workers=args.workers, decode_threads=args.decode_threads,
+        speed_mps=args.speed, manifest_path=args.manifest, write_db=not args.no_db,
+        save_crops=args.save_crops, backend=args.backend, tiled=args.tiled,
+        roi=args.roi,
+    )
+    sys.exit(0 if result["frames"] else 1)
@@ -0,0 +1,202 @@
+# benchmark.py
+#
+# End-to-end throughput benchmark of the live pipeline — no webcam needed.
+#
+#   python benchmark.py                                        # synthetic strip, 30 FPS, 20 s
+#   python benchmark.py --fps 0 --batch 1 4 8                  # pipeline ceiling, batch sweep
+#   python benchmark.py --source "folder:data_collection/collected?cache=1"
+#   python benchmark.py --source video:footage/line1.mp4 --save reports/bench_line1.json
+#   python benchmark.py --baseline reports/bench_line1.json    # exit 1 on a regression
+#   python benchmark.py --sinks                                # DB / image-write capacity only
+#
+# Each run drives run_live_detection() from a replay source (see
+# utils/frame_sources.py) and reports sustained FPS, capture-to-result
+# latency percentiles, dropped frames and the DB / image sink throughput.
+# Rows and images of the benchmark sheet are removed afterwards (--keep).
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from config import DB_NAME, REPORT_DIR
+
+DEFAULT_SOURCE = "synthetic"
+REGRESSION_TOLERANCE = 0.10   # fps may drop / p95 latency may grow this much vs. the baseline
+
+
+def _with_options(source, **options):
+    """Append ``key=value`` options to a source spec (``synthetic?fps=30``)."""
+    extra = "&".join(f"{k}={v}" for k, v in options.items() if v is not None)
+    if not extra:
+        return source
+    return f"{source}{'&' if '?' in source else '?'}{extra}"
+
+
+def _cleanup(sheet_id, db_name=DB_NAME):
+    conn = sqlite3.connect(db_name)
+    with conn:
+        conn.execute("DELETE FROM defect_logs WHERE sheet_number = ?", (sheet_id,))
+        # a leftover session would show up as interrupted and prompt a resume in the GUI
+        conn.execute("DELETE FROM sessions WHERE sheet_number = ?", (sheet_id,))
+    conn.close()
+    shutil.rmtree(os.path.join(REPORT_DIR, sheet_id), ignore_errors=True)
+
+
+def run_benchmark(source=DEFAULT_SOURCE, fps=None, frames=None, seconds=20.0, batch_size=None,
+                  preview=False, keep=False, **options):
+    """One pipeline run; returns a flat result row.
+
+    ``fps`` / ``frames`` are added to the source spec. ``fps=0`` leaves the
+    source unthrottled: FPS is then the pipeline's ceiling and the dropped
+    frames show by how much the source outruns it. The run ends after
+    ``seconds`` or when the source runs out, whichever comes first.
+    ``options`` go to ``run_live_detection`` (conf, tiled, roi, motion_gate, …).
+    """
+    from live_detection import run_live_detection
+    from utils.sql_connector import get_store, init_db
+
+    init_db()
+    rows_before = get_store().stats()["rows_written"]   # the store is shared by every run
+    spec = _with_options(source, fps=fps, frames=frames, loop=None if frames is None else 0)
+    sheet_id = f"bench_{time.strftime('%Y%m%d_%H%M%S')}_b{batch_size or 'cfg'}"
+    summary = {}
+    t0 = time.perf_counter()
+    try:
+        run_live_detection(
+            sheet_id, batch_size=batch_size, headless=not preview,
+            camera={"id": None, "device": spec},
+            stop_callback=(lambda: time.perf_counter() - t0 >= seconds) if seconds else None,
+            stats_callback=summary.update, **options)
+    finally:
+        if not keep:
+            _cleanup(sheet_id)
+    if not summary:
+        raise RuntimeError(f"Source could not be opened: {spec}")
+
+    stages, elapsed = summary["stages"], summary["elapsed_s"] or 1e-9
+    capture, images = stages["capture"], stages["images"]
+    captured = capture["frames"]
+    return {
+        "source": source, "batch": batch_size, "elapsed_s": round(elapsed, 2),
+        "frames": summary["frames"], "fps": round(summary["fps"], 1),
+        **summary["latency"],
+        "captured": captured, "dropped": capture["dropped"],
+        "drop_pct": round(100.0 * capture["dropped"] / captured, 1) if captured else 0.0,
+        "defects": summary["defects"],
+        "db_rows_per_s": round((stages["db_store"]["rows_written"] - rows_before) / elapsed, 1),
+        "images_per_s": round(images["written"] / elapsed, 1),
+        "image_mb_per_s": round(images["mb"] / elapsed, 2),
+        "images_dropped": images["dropped"],
+    }
+
+
+def bench_sinks(rows=20000, images=300):
+    """Capacity of the persistence sinks alone: DB rows/s and image writes/s."""
+    import numpy as np
+    from utils.frame_sources import SyntheticSource
+    from utils.image_sink import ImageSink
+    from utils.sql_connector import DefectStore, init_db
+
+    tmp = tempfile.mkdtemp(prefix="bench_sinks_")
+    try:
+        db_name = os.path.join(tmp, "bench.db")
+        init_db(db_name)
+        store = DefectStore(db_name=db_name).start()
+        t0 = time.perf_counter()
+        for i in range(rows):
+            store.add("bench", "scratch", i * 0.01, f"img_{i}.jpg")
+        store.close()
+        db_s = time.perf_counter() - t0
+
+        ok, frame = SyntheticSource(fps=0).read()
+        sink = ImageSink()
+        t0 = time.perf_counter()
+        for i in range(images):
+            sink.submit(np.roll(frame, i, axis=0), os.path.join(tmp, "img", f"{i}{sink.ext}"))
+        sink.close()
+        img_s = time.perf_counter() - t0
+        written = sink.stats()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {"db_rows_per_s": round(rows / db_s, 1),
+            "images_per_s": round(written["written"] / img_s, 1),
+            "image_mb_per_s": round(written["mb"] / img_s, 2),
+            "image_errors": written["errors"]}
+
+
+def check_regression(rows, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Messages for rows slower than the matching baseline row (same source and batch)."""
+    problems = []
+    base = {(b["source"], b["batch"]): b for b in baseline}
+    for row in rows:
+        ref = base.get((row["source"], row["batch"]))
+        if ref is None:
+            continue
+        label = f"{row['source']} batch={row['batch']}"
+        if row["fps"] < ref["fps"] * (1 - tolerance):
+            problems.append(f"{label}: {row['fps']} FPS vs {ref['fps']} baseline")
+        if "p95_ms" in ref and row.get("p95_ms", 0) > ref["p95_ms"] * (1 + tolerance):
+            problems.append(f"{label}: p95 {row['p95_ms']} ms vs {ref['p95_ms']} ms baseline")
+        if row["drop_pct"] > ref["drop_pct"] + 100 * tolerance:
+            problems.append(f"{label}: {row['drop_pct']}% frames dropped "
+                            f"vs {ref['drop_pct']}% baseline")
+    return problems
+
+
+def print_table(rows):
+    cols = ("batch", "frames", "fps", "p50_ms", "p95_ms", "p99_ms", "drop_pct", "defects",
+            "db_rows_per_s", "images_per_s", "image_mb_per_s")
+    print("\n📊 " + "  ".join(f"{c:>13}" for c in cols))
+    for row in rows:
+        print("   " + "  ".join(f"{str(row.get(c, '')):>13}" for c in cols))
+
+
+# --------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end live pipeline benchmark.")
+    parser.add_argument("--source", default=DEFAULT_SOURCE,
+                        help='"synthetic", "folder:<dir>", "video:<file>" (options: "spec?key=value")')
+    parser.add_argument("--fps", type=float, default=None, help="replay rate (0 = unthrottled)")
+    parser.add_argument("--frames", type=int, default=None, help="stop after this many source frames")
+    parser.add_argument("--seconds", type=float, default=20.0, help="duration per run (0 = until source ends)")
+    parser.add_argument("--batch", type=int, nargs="+", default=[None], help="batch sizes to sweep")
+    parser.add_argument("--conf", type=float, default=None)
+    parser.add_argument("--tiled", action="store_true", default=None)
+    parser.add_argument("--roi", choices=("off", "fixed", "auto"), default=None)
+    parser.add_argument("--preview", action="store_true", help="include overlay rendering / window")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark sheet's rows and images")
+    parser.add_argument("--sinks", action="store_true", help="only measure DB / image-write capacity")
+    parser.add_argument("--save", default=None, help="write results as JSON")
+    parser.add_argument("--baseline", default=None, help="JSON from --save to compare against")
+    args = parser.parse_args()
+
+    if args.sinks:
+        print(json.dumps(bench_sinks(), indent=2))
+        sys.exit(0)
+
+    results = []
+    for batch in args.batch:
+        print(f"\n⏱️ Benchmark: {args.source} batch={batch or 'config'}")
+        results.append(run_benchmark(args.source, fps=args.fps, frames=args.frames,
+                                     seconds=args.seconds, batch_size=batch, preview=args.preview,
+                                     keep=args.keep, conf=args.conf, tiled=args.tiled, roi=args.roi))
+    print_table(results)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved: {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = check_regression(results, json.load(f))
+        for msg in problems:
+            print(f"❌ Regression — {msg}")
+        if problems:
+            sys.exit(1)
+        print("✅ No regression against the baseline.")
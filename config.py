@@ -2,14 +2,153 @@
 
 # Model
 MODEL_PATH = "runs/detect/train5/weights/best.pt"
+MODEL_RUNS_DIR = "runs/detect"  # where train_module.py writes new weights
+MODEL_FOLLOW_LATEST = False     # True = use the newest runs/detect/*/weights/best.pt
+WARMUP_IMGSZ = 640              # dummy inference size used to warm the model up
+INFERENCE_BACKEND = "pytorch"   # pytorch | onnx | onnx_int8 | openvino | openvino_int8 (see export_module.py)
+DATASET_YAML = "dataset/data.yaml"
+
+# Training dataset (dataset_builder.py builds DATASET_DIR/images|labels/train|val + DATASET_YAML)
+DATASET_DIR = "dataset"
+DATASET_SOURCES = [   # (images dir, labels dir mirroring it, where the class comes from)
+    ("data_collection/collected", "data_collection/labels", "folder"),   # <defect>/ folder name
+    ("custom_data/train/images", "custom_data/train/labels", "ids"),     # ids of DATASET_YAML names
+    ("dataset/train/images", "dataset/train/labels", "ids"),
+]
+DATASET_VAL_FRACTION = 0.2  # share of images in the val split (chosen by content hash, stable)
+DATASET_MAX_SIDE = 1280     # larger images are stored downscaled, others hardlinked (0 = never resize)
+DATASET_WORKERS = 0         # processes hashing / validating / resizing (0 = one per core)
 
 # SQL
 DB_NAME = "defects.db"
+DB_BATCH_SIZE = 200         # buffered defect rows per executemany()
+DB_FLUSH_INTERVAL_S = 0.5   # max age of a buffered row before it is written
+DB_MIGRATE_CHUNK_ROWS = 20_000  # rows backfilled per transaction when an old database is upgraded
+
+# Defect archive (Parquet history partitioned by date and sheet)
+ARCHIVE_DIR = "archive/defects"
+ARCHIVE_INTERVAL_S = 3600       # how often the GUI rolls new defect_logs rows into the archive
+ARCHIVE_CHUNK_ROWS = 50_000     # rows read from SQLite per archive write
+ARCHIVE_PURGE_AFTER_DAYS = 0    # delete archived rows older than this from SQLite (0 = keep)
 
 # Reports
 REPORT_DIR = "reports"
+REPORT_SPOOL_FORMAT = "csv"  # csv | parquet — per-sheet defect spool written during detection
+REPORT_FLUSH_ROWS = 1        # CSV spool rows buffered before they are written out
+REPORT_PARQUET_ROW_GROUP = 1000   # Parquet spool rows per row group (written on close too)
+REPORT_DENSITY = True        # add a density sheet + heat-map PNG to each Excel report
+DENSITY_BIN_M = 1.0          # length of one density bin along the strip (m)
+DENSITY_WIDTH_BINS = 10      # bins across the strip width
+DENSITY_WORST_N = 5          # worst segments listed in the report
+
+# Defect images
+IMAGE_SAVE_MODE = "frame"   # "frame" = one full frame per frame with defects, "crop" = padded crop per box
+IMAGE_FORMAT = "jpg"        # jpg | webp | png
+IMAGE_QUALITY = 90          # JPEG/WebP quality (PNG: higher = faster, less compression)
+CROP_PADDING = 16           # px added around each box in crop mode
+IMAGE_WRITER_THREADS = 2
+IMAGE_QUEUE_SIZE = 64       # images in flight before back-pressure / dropping
+IMAGE_BLOCK_WHEN_FULL = False  # True = block detection when disk falls behind, False = drop + count
 
 # Meter Tracking
 DEFAULT_SPEED = 50.0  # meters/sec
+SPEED_SOURCE = "constant"   # constant | profile | encoder
+SPEED_PROFILE_PATH = "speed_profile.csv"  # "t_s,speed_mps" rows, used by SPEED_SOURCE="profile"
+ENCODER_PULSES_PER_M = 1000.0
+ENCODER_SIMULATE = True     # generate encoder pulses at DEFAULT_SPEED when no hardware feed is wired
 #Config threshold for defect detection
-CONF_THRESHOLD = 0.4 
\ No newline at end of file
+CONF_THRESHOLD = 0.4 
+
+# Alerts (never block detection)
+ALERT_MIN_INTERVAL_S = 2.0  # per defect type: one alert per interval, extra defects coalesced into it
+ALERT_SINKS = ["log"]       # extra outputs besides GUI toasts: log | socket | plc
+ALERT_LOG_PATH = "reports/alerts.log"
+ALERT_SOCKET_ADDR = ("127.0.0.1", 9750)  # UDP JSON datagrams for SocketSink
+ALERT_PLC_PULSE_S = 1.0     # stand-in PLC output held high this long per alert
+ALERT_TOAST_MS = 4000       # GUI toast display time
+ALERT_TOAST_MAX = 4         # toasts visible at once
+
+# Camera (one shared owner per device, see utils/camera.py)
+CAMERA_DEVICE = 0           # cv2.VideoCapture index or URL, or a replay source:
+                            # "synthetic", "folder:<dir>", "video:<file>" (utils/frame_sources.py)
+CAMERA_WIDTH = 0            # requested resolution (0 = driver default)
+CAMERA_HEIGHT = 0
+CAMERA_FPS = 0              # requested frame rate (0 = driver default)
+CAMERA_BUFFER_SIZE = 1      # driver-side frame queue; 1 = lowest latency
+CAMERA_FOURCC = ""          # e.g. "MJPG" for high-resolution USB cameras ("" = default)
+CAMERA_READ_RETRIES = 5     # consecutive failed reads before the camera is given up
+CAMERA_IDLE_RELEASE_S = 10.0  # keep the device open this long without subscribers (tab switches)
+
+# Replay / synthetic frame sources (benchmarks, testing without a webcam)
+SOURCE_DEFAULT_FPS = 30.0   # pace of replay sources unless the spec, CAMERA_FPS or the video says otherwise
+SOURCE_LOOP = True          # restart folders / videos at the end (set loop=0 in the spec for one pass)
+SYNTHETIC_DEFECT_RATE = 0.02  # probability of an injected defect per synthetic frame
+SYNTHETIC_SEED = 0
+
+# Detection sessions (crash-safe journal, utils/session.py)
+SESSION_RESUME = True       # restarting an interrupted sheet continues its session and meter position
+SESSION_STALE_S = 15.0      # a "running" session silent this long belongs to a dead process
+
+# Metrics / profiling (utils/metrics.py)
+METRICS_ENABLED = True      # per-stage timers, counters and queue gauges
+METRICS_HOST = "127.0.0.1"  # local only
+METRICS_PORT = 9108         # Prometheus text at /metrics, JSON at /stats (0 = no endpoint)
+METRICS_LOG_INTERVAL_S = 30.0  # one summary line per detection loop this often (0 = off)
+METRICS_WINDOW = 2048       # recent samples per stage kept for percentiles
+PROFILE_DIR = "reports/profiles"
+PROFILE_SECONDS = 10.0      # default cProfile window (GET /profile?seconds=N, --profile N)
+PROFILE_MAX_SECONDS = 300.0  # longest window GET /profile accepts (longer requests are clamped)
+
+# Multi-camera / multi-line inspection (multi_camera.py)
+CAMERAS = [
+    {"id": "cam0", "device": 0, "surface": "top", "line": "line1"},
+    # {"id": "cam1", "device": 1, "surface": "bottom", "line": "line1"},
+]
+MULTI_CAMERA_MODE = "process"  # process = one worker process per stream (uses all cores)
+                               # thread  = one process, streams share a single model instance
+MULTI_CAMERA_TORCH_THREADS = 0  # torch threads per worker process (0 = cores / streams)
+
+# Live pipeline
+CAPTURE_BUFFER_SIZE = 2     # frames held between capture and inference (newest wins)
+SINK_QUEUE_SIZE = 256       # pending jobs per persistence sink (image / DB / alerts)
+
+# Preview window
+HEADLESS = False            # True = no overlay rendering / window at all (also --headless)
+PREVIEW_EVERY_N = 1         # render every Nth inferred frame
+PREVIEW_MAX_FPS = 15.0      # cap on preview rendering rate (0 = uncapped)
+PREVIEW_SCALE = 1.0         # < 1.0 renders a cheaper downscaled preview
+
+# Batched inference
+INFER_BATCH_SIZE = 1        # frames per forward pass (1 = single-frame mode)
+INFER_MAX_WAIT_MS = 15      # max time to hold the first frame while filling a batch
+
+# Cross-frame defect tracking (one record per physical defect)
+TRACK_ENABLED = True
+TRACK_IOU_THRESHOLD = 0.3   # min IoU to continue a track
+TRACK_MAX_DISTANCE_PX = 40  # or centroid within this distance
+TRACK_TTL_FRAMES = 5        # frames a track survives unmatched before it is emitted
+TRACK_PX_PER_M = 0.0        # image px per metre of strip travel (0 = no motion prediction)
+TRACK_MOTION_AXIS = "y"     # image axis the strip moves along
+
+# Tiled inference for wide / high-resolution frames
+TILED_INFERENCE = False     # also --tiled on the CLIs
+TILE_SIZE = 640             # px; tiles are inferred at native resolution
+TILE_OVERLAP = 0.2          # fraction of a tile shared with its neighbour
+TILE_REGIONS = [(0.0, 0.0, 1.0, 1.0)]  # (x0, y0, x1, y1) frame fractions to tile
+TILE_INCLUDE_FULL = True    # also run the downscaled full frame (large defects)
+TILE_NMS_IOU = 0.5          # cross-tile NMS IoU
+TILE_MERGE_IOS = 0.7        # merge a box mostly inside another (cut at a tile border)
+
+# Region of interest (strip only, no rollers / background)
+ROI_MODE = "off"            # off | fixed | auto (also --roi)
+ROI_FIXED = (0.0, 0.0, 1.0, 1.0)  # (x0, y0, x1, y1) frame fractions for ROI_MODE="fixed"
+ROI_MARGIN_PX = 16          # px kept outside the detected strip edges
+ROI_REFRESH_FRAMES = 30     # re-detect strip edges every N frames (auto)
+ROI_SMOOTHING = 0.7         # weight of the previous edge estimate (auto)
+
+# Motion / change gating (skip inference on unchanged frames)
+MOTION_GATE = False         # also --motion-gate
+MOTION_THRESHOLD = 2.0      # mean abs grey difference (0-255) that counts as a change
+MOTION_DOWNSCALE = 8        # thumbnail stride in px
+MOTION_MAX_SKIP = 30        # inspect at least every Nth frame ...
+MOTION_MIN_INSPECT_INTERVAL_S = 0.5  # ... and at least this often
@@ -4,6 +4,10 @@ from datetime import datetime
 import cv2
 import subprocess
 
+# Run directly (python data_capture.py) as well as with -m: make the repo root importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.camera import get_camera  # noqa: E402
+
 # ------------------------------------------------------------------
 COLLECTED_DIR = "data_collection/collected"
 ANNOTATOR_SCRIPT = "data_collection/annotations/data_labeler.py"
@@ -14,8 +18,8 @@ def capture_images(defect_type: str):
     folder = os.path.join(COLLECTED_DIR, defect_type)
     os.makedirs(folder, exist_ok=True)
 
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
+    frames = get_camera().subscribe(maxlen=1)
+    if frames is None:
         print("❌ Could not open webcam.")
         return
 
@@ -23,10 +27,13 @@ def capture_images(defect_type: str):
     print(f"📷  Capturing for '{defect_type}'.  SPACE=capture  ESC=quit")
 
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("⚠️ Camera failure.")
-            break
+        item = frames.get(timeout=1.0)
+        if item is None:
+            if frames.closed:
+                print("⚠️ Camera failure.")
+                break
+            continue
+        frame = item.image
 
         cv2.imshow("Capture Window (SPACE save / ESC exit)", frame)
         key = cv2.waitKey(1) & 0xFF
@@ -41,7 +48,7 @@ def capture_images(defect_type: str):
             print(f"✅ Saved {save_path}")
             counter += 1
 
-    cap.release()
+    frames.unsubscribe()
     cv2.destroyAllWindows()
 
     # Prompt for immediate annotation
@@ -3,16 +3,17 @@ import cv2
 import shutil
 import sys 
 import subprocess
-import threading
 from datetime import datetime
 
-from PyQt5.QtCore import Qt, pyqtSignal, QTimer
-from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QListWidget, QInputDialog, QFileDialog, QMessageBox
 )
 
+from utils.camera import get_camera
+from utils.preview_widget import PreviewWidget
+
 # Constant Paths for config.py
 COLLECTED_DIR = "data_collection/collected"
 LABELS_DIR    = "data_collection/labels"
@@ -23,9 +24,6 @@ ANNOTATOR     = "data_collection/annotations/data_labeler.py"
 class DataCollectionWidget(QWidget):
     """Full camera‑capture + annotation UI."""
 
-    # Qt signal to update frame in GUI thread
-    _frame_signal = pyqtSignal(QImage)
-
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Data Collection")
@@ -33,13 +31,12 @@ class DataCollectionWidget(QWidget):
 
 
         # State
-        self.cap = None
+        self.camera_sub = None
         self.running = False
         self.current_defect = None
 
         # Ui widgets
-        self.video_lbl = QLabel("Camera preview")
-        self.video_lbl.setAlignment(Qt.AlignCenter)
+        self.video_lbl = PreviewWidget("Camera preview")
         self.video_lbl.setFixedHeight(300)
 
         self.defect_list = QListWidget()
@@ -78,7 +75,6 @@ class DataCollectionWidget(QWidget):
         self.new_defect_btn.clicked.connect(self.create_defect_folder)
         self.annotate_btn.clicked.connect(self.launch_annotator)
         self.upload_btn.clicked.connect(self.upload_images)
-        self._frame_signal.connect(self.update_frame)
 
         # Timer key‑listener for SPACE capture
         self.space_timer = QTimer(self)
@@ -93,33 +89,20 @@ class DataCollectionWidget(QWidget):
     def start_camera(self):
         if self.running:
             return
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
+        # Shared camera: live detection may already be using it, no reopen
+        self.camera_sub = get_camera().subscribe(
+            callback=lambda f: self.video_lbl.submit(f.image))   # scaled off the GUI thread, FPS-capped
+        if self.camera_sub is None:
             QMessageBox.critical(self, "Camera Error", "❌ Cannot open webcam.")
             return
         self.running = True
-        threading.Thread(target=self.read_frames, daemon=True).start()
 
     def stop_camera(self):
         self.running = False
-        if self.cap:
-            self.cap.release()
-            self.cap = None
-        self.video_lbl.clear()
-
-    def read_frames(self):
-        while self.running and self.cap:
-            ret, frame = self.cap.read()
-            if not ret:
-                continue
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, _ = rgb.shape
-            qimg = QImage(rgb.data, w, h, 3 * w, QImage.Format_RGB888)
-            self._frame_signal.emit(qimg)
-
-    def update_frame(self, qimg):
-        self.video_lbl.setPixmap(QPixmap.fromImage(qimg).scaled(
-            self.video_lbl.width(), self.video_lbl.height(), Qt.KeepAspectRatio))
+        if self.camera_sub:
+            self.camera_sub.unsubscribe()
+            self.camera_sub = None
+        self.video_lbl.clear_preview()
 
     # Space to Capture
     def check_spacebar(self):
@@ -128,15 +111,15 @@ class DataCollectionWidget(QWidget):
       
 
     def capture_frame(self):
-        if not (self.running and self.cap):
+        if not (self.running and self.camera_sub):
             return
         defect = self.get_selected_defect()
         if not defect:
             QMessageBox.warning(self, "No Folder", "Select or create a defect folder first.")
             return
 
-        ret, frame = self.cap.read()
-        if not ret:
+        frame = get_camera().snapshot()   # newest frame from the shared stream, no second read
+        if frame is None:
             return
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         fname = f"{defect}_{ts}.jpg"
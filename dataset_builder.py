@@ -0,0 +1,338 @@
+# dataset_builder.py
+#
+# Builds the YOLO training layout train_module.py expects from every place
+# images are collected:
+#
+#   python dataset_builder.py                    # incremental build into dataset/
+#   python dataset_builder.py --val 0.15 --max-side 960
+#   python dataset_builder.py --copy             # copies instead of hardlinks
+#
+# Sources are DATASET_SOURCES in config.py: data_collection/collected/<defect>/
+# with the data_labeler labels (class = folder name), plus image folders whose
+# YOLO labels already carry class ids (custom_data/train, dataset/train).
+# Images without a label file are not annotated yet and are skipped.
+#
+# Output: dataset/images/{train,val}, dataset/labels/{train,val} and
+# dataset/data.yaml. Files are named by content hash, so an image present in
+# several folders is stored once with the union of its labels, and the split
+# is derived from the hash, so it never reshuffles. An index of every source
+# file's size, mtime and hash lets re-runs skip unchanged files; new or
+# changed images are hashed, decoded, validated and (above --max-side)
+# downscaled on a process pool, and everything else is hardlinked.
+
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import time
+
+import cv2
+import yaml
+
+from config import (
+    DATASET_DIR, DATASET_YAML, DATASET_SOURCES, DATASET_VAL_FRACTION, DATASET_MAX_SIDE,
+    DATASET_WORKERS,
+)
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+INDEX_NAME = ".build_index.json"
+INDEX_VERSION = 1
+SPLITS = ("train", "val")
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def split_for(sha, val_fraction):
+    """Split of an image, fixed by its content hash (not by scan order)."""
+    return "val" if int(sha[:8], 16) / 0x100000000 < val_fraction else "train"
+
+
+def output_paths(out_dir, sha, ext, split):
+    stem = sha[:16]
+    return (os.path.join(out_dir, "images", split, stem + ext),
+            os.path.join(out_dir, "labels", split, stem + ".txt"))
+
+
+def _place(src, dst, link):
+    """Hardlink ``src`` to ``dst`` (copy across filesystems); False if it was copied."""
+    if link:
+        try:
+            os.link(src, dst)
+            return True
+        except FileExistsError:
+            return True   # same content from another source, placed by another worker
+        except OSError:
+            pass
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+    return False
+
+
+def _prepare(job):
+    """Worker: hash, decode-check and place one source image."""
+    src, sha, out_dir, val_fraction, max_side, link = job
+    record = {"src": src}
+    try:
+        sha = sha or file_hash(src)
+        ext = os.path.splitext(src)[1].lower()
+        split = split_for(sha, val_fraction)
+        image_path, _ = output_paths(out_dir, sha, ext, split)
+        img = cv2.imread(src)
+        if img is None:
+            return {**record, "sha": sha, "error": "unreadable image"}
+        h, w = img.shape[:2]
+        record.update(sha=sha, split=split, image=image_path, w=w, h=h, ext=ext)
+        if os.path.exists(image_path):
+            return record
+        if max_side and max(h, w) > max_side:
+            scale = max_side / max(h, w)
+            img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))),
+                             interpolation=cv2.INTER_AREA)
+            tmp = f"{image_path}.{os.getpid()}.tmp{ext}"
+            if not cv2.imwrite(tmp, img):
+                return {**record, "error": "resize write failed"}
+            os.replace(tmp, image_path)
+            record["resized"] = True
+        else:
+            record["linked"] = _place(src, image_path, link)
+    except OSError as exc:
+        record["error"] = str(exc)
+    return record
+
+
+def read_labels(path, class_id=None):
+    """Valid YOLO box lines of a label file; ``class_id`` replaces the file's ids.
+
+    Returns ``(lines, dropped)``; coordinates are clipped to the image.
+    """
+    lines, dropped = [], 0
+    with open(path) as f:
+        for raw in f:
+            parts = raw.split()
+            if not parts:
+                continue
+            try:
+                cls = int(float(parts[0]))
+                cx, cy, bw, bh = (min(max(float(v), 0.0), 1.0) for v in parts[1:5])
+            except ValueError:
+                dropped += 1
+                continue
+            if len(parts) != 5 or bw <= 0 or bh <= 0 or cls < 0:
+                dropped += 1
+                continue
+            cls = class_id if class_id is not None else cls
+            lines.append(f"{cls} {cx:.6f} {cy:.6f} {bw:.6f} {bh:.6f}")
+    return lines, dropped
+
+
+def scan_sources(sources=DATASET_SOURCES):
+    """``(image, label_or_None, class_name_or_None)`` for every source image."""
+    entries = []
+    for images_dir, labels_dir, classes in sources:
+        if not os.path.isdir(images_dir):
+            continue
+        for root, _dirs, files in os.walk(images_dir):
+            for name in sorted(files):
+                if not name.lower().endswith(IMAGE_EXTS):
+                    continue
+                src = os.path.join(root, name)
+                rel = os.path.relpath(src, images_dir)
+                label = os.path.join(labels_dir, os.path.splitext(rel)[0] + ".txt")
+                class_name = None
+                if classes == "folder":
+                    parts = rel.split(os.sep)
+                    class_name = parts[0] if len(parts) > 1 else None
+                    if class_name is None:   # loose file: no folder to take the class from
+                        label = None
+                entries.append((src, label if label and os.path.isfile(label) else None, class_name))
+    return entries
+
+
+def _load_index(out_dir):
+    try:
+        with open(os.path.join(out_dir, INDEX_NAME)) as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "names": [], "files": {}, "outputs": {}}
+
+
+def _existing_names(yaml_path):
+    """Class names of an existing data.yaml, so class ids stay stable."""
+    try:
+        with open(yaml_path) as f:
+            names = (yaml.safe_load(f) or {}).get("names") or []
+    except (OSError, yaml.YAMLError, AttributeError):
+        return []
+    if isinstance(names, dict):
+        names = [names[k] for k in sorted(names)]
+    return [str(n) for n in names]
+
+
+def _write_if_changed(path, text):
+    try:
+        with open(path) as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return True
+
+
+def build_dataset(sources=DATASET_SOURCES, out_dir=DATASET_DIR, yaml_path=DATASET_YAML,
+                  val_fraction=DATASET_VAL_FRACTION, max_side=DATASET_MAX_SIDE,
+                  workers=DATASET_WORKERS, link=True):
+    """Build or update the YOLO dataset; returns a summary dict."""
+    t0 = time.perf_counter()
+    for kind in ("images", "labels"):
+        for split in SPLITS:
+            os.makedirs(os.path.join(out_dir, kind, split), exist_ok=True)
+    index = _load_index(out_dir)
+    if index.get("max_side", max_side) != max_side:
+        # stored images were sized for the old limit: place every image again
+        for old in index["outputs"].values():
+            if os.path.exists(old["image"]):
+                os.remove(old["image"])
+        index["files"] = {}
+
+    entries = scan_sources(sources)
+    labelled = [e for e in entries if e[1] is not None]
+    unlabelled = len(entries) - len(labelled)
+
+    # Class ids: keep the existing order, append new defect folders
+    names = index["names"] or _existing_names(yaml_path)
+    for class_name in sorted({c for _, _, c in labelled if c is not None}):
+        if class_name not in names:
+            names.append(class_name)
+
+    # Unchanged files (same size + mtime, output in place) are taken from the index
+    records, jobs = {}, []
+    for src, _label, _cls in labelled:
+        st = os.stat(src)
+        cached = index["files"].get(src)
+        same = cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns
+        if same and (cached.get("error") or (
+                cached["split"] == split_for(cached["sha"], val_fraction)
+                and os.path.exists(cached["image"]))):
+            records[src] = cached
+            continue
+        records[src] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        jobs.append((src, cached["sha"] if same else None, out_dir, val_fraction, max_side, link))
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    resized = copied = 0
+    if jobs:
+        print(f"📦 Preparing {len(jobs)} new or changed image(s) on {workers} worker(s)…")
+        if workers > 1:
+            with mp.get_context("spawn").Pool(workers) as pool:
+                results = list(pool.imap_unordered(_prepare, jobs, chunksize=8))
+        else:
+            results = [_prepare(job) for job in jobs]
+        for result in results:
+            src = result.pop("src")
+            records[src].update(result)
+            resized += bool(result.get("resized"))
+            copied += result.get("linked") is False
+
+    # One output per content hash; its labels are the union over every copy of the image
+    outputs, bad, dropped = {}, 0, 0
+    for src, label, class_name in labelled:
+        record = records[src]
+        if record.get("error"):
+            bad += 1
+            continue
+        out = outputs.setdefault(record["sha"], {"image": record["image"], "split": record["split"],
+                                                 "lines": [], "sources": 0})
+        out["sources"] += 1
+        class_id = names.index(class_name) if class_name is not None else None
+        lines, n = read_labels(label, class_id)
+        dropped += n
+        for line in lines:
+            if line not in out["lines"]:
+                out["lines"].append(line)
+
+    top = max((int(line.split()[0]) for out in outputs.values() for line in out["lines"]),
+              default=-1)
+    if top >= len(names):
+        print(f"⚠️ Labels use class ids up to {top} but only {len(names)} name(s) are known; "
+              f"edit the placeholders in {yaml_path}.")
+        names += [f"class_{i}" for i in range(len(names), top + 1)]
+
+    written = 0
+    counts = dict.fromkeys(SPLITS, 0)
+    for sha, out in outputs.items():
+        _, label_path = output_paths(out_dir, sha, "", out["split"])
+        out["label"] = label_path
+        written += _write_if_changed(label_path, "".join(line + "\n" for line in out["lines"]))
+        counts[out["split"]] += 1
+
+    # Outputs of images that were removed, changed or moved to the other split
+    removed = 0
+    for sha, old in index["outputs"].items():
+        current = outputs.get(sha)
+        for key in ("image", "label"):
+            if (current is None or current[key] != old[key]) and os.path.exists(old[key]):
+                os.remove(old[key])
+                removed += key == "image"
+
+    val_dir = "images/val" if counts["val"] else "images/train"
+    if not counts["val"] and counts["train"]:
+        print("⚠️ No image fell into the val split; validating on train.")
+    yaml_text = yaml.safe_dump({
+        "path": os.path.abspath(out_dir), "train": "images/train", "val": val_dir,
+        "nc": len(names), "names": names,
+    }, sort_keys=False)
+    os.makedirs(os.path.dirname(yaml_path) or ".", exist_ok=True)
+    _write_if_changed(yaml_path, yaml_text)
+
+    index.update(max_side=max_side, val_fraction=val_fraction, names=names,
+                 files={src: records[src] for src, _, _ in labelled},
+                 outputs={sha: {"image": o["image"], "label": o["label"]} for sha, o in outputs.items()})
+    _write_if_changed(os.path.join(out_dir, INDEX_NAME), json.dumps(index, indent=1))
+
+    summary = {"images": len(outputs), "train": counts["train"], "val": counts["val"],
+               "classes": len(names), "processed": len(jobs), "resized": resized,
+               "copied": copied, "labels_written": written, "removed": removed,
+               "duplicates": len(labelled) - bad - len(outputs), "unlabelled": unlabelled,
+               "bad_images": bad, "bad_label_lines": dropped,
+               "seconds": round(time.perf_counter() - t0, 2)}
+    print(f"✅ Dataset {out_dir}: {summary['images']} image(s) (train {counts['train']} / "
+          f"val {counts['val']}), {len(names)} class(es); {len(jobs)} processed, "
+          f"{summary['duplicates']} duplicate(s), {unlabelled} unlabelled skipped, "
+          f"{removed} removed in {summary['seconds']}s")
+    if bad or dropped:
+        print(f"⚠️ {bad} unreadable image(s), {dropped} invalid label line(s) skipped.")
+    return summary
+
+
+# --------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the YOLO training dataset from collected images.")
+    parser.add_argument("--out", default=DATASET_DIR, help="dataset root (images/, labels/)")
+    parser.add_argument("--yaml", default=DATASET_YAML, help="data.yaml to write")
+    parser.add_argument("--val", type=float, default=DATASET_VAL_FRACTION, help="val split fraction")
+    parser.add_argument("--max-side", type=int, default=DATASET_MAX_SIDE,
+                        help="downscale larger images (0 = never)")
+    parser.add_argument("--workers", type=int, default=DATASET_WORKERS, help="processes (0 = one per core)")
+    parser.add_argument("--copy", action="store_true", help="copy images instead of hardlinking")
+    args = parser.parse_args()
+
+    result = build_dataset(out_dir=args.out, yaml_path=args.yaml, val_fraction=args.val,
+                           max_side=args.max_side, workers=args.workers, link=not args.copy)
+    sys.exit(0 if result["images"] else 1)
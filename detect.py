@@ -4,13 +4,21 @@ import cv2
 import time
 import os
 from datetime import datetime
-from ultralytics import YOLO
 
-def run_detection(sheet_id, model_path="model/best.pt", save_path="reports", speed_mps=50):
-    model = YOLO(model_path)
+from utils.batching import BatchInferenceEngine
+from utils.camera import get_camera
+from utils.model_registry import get_model
+from utils.helper import render_preview
+from utils.pipeline import PreviewThrottle
+from config import HEADLESS, PREVIEW_EVERY_N, PREVIEW_MAX_FPS, PREVIEW_SCALE
 
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
+def run_detection(sheet_id, model_path="model/best.pt", save_path="reports", speed_mps=50,
+                  batch_size=None, headless=None):
+    model = get_model(model_path)
+    engine = BatchInferenceEngine(model, batch_size=batch_size, conf=0.4)
+
+    frames_in = get_camera().subscribe(engine.batch_size)
+    if frames_in is None:
         print("❌ Error: Cannot open webcam.")
         return []
 
@@ -19,56 +27,70 @@ def run_detection(sheet_id, model_path="model/best.pt", save_path="reports", spe
 
     defect_log = []
     start_time = time.time()
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("⚠️ Failed to capture frame.")
-            break
-
-        # Predict using YOLOv8
-        results = model(frame, imgsz=640, conf=0.4)
-        boxes = results[0].boxes
-        detected = False
-
-        for box in boxes:
-            cls_id = int(box.cls[0])
-            conf = float(box.conf[0])
-            defect_type = model.names[cls_id]
-
-            # Calculate time + estimated length
-            elapsed_time = time.time() - start_time
-            approx_length = round(elapsed_time * speed_mps, 2)
-            timestamp = datetime.now().strftime("%H:%M:%S")
-
-            # Crop and save defect region
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            cropped = frame[y1:y2, x1:x2]
-            img_filename = f"{defect_type}_{timestamp.replace(':', '-')}.jpg"
-            img_path = os.path.join(save_path, sheet_id, "images", img_filename)
-            cv2.imwrite(img_path, cropped)
-
-            print(f"✅ Detected: {defect_type} at {approx_length}m [{timestamp}]")
-
-            defect_log.append({
-                "sheet_id": sheet_id,
-                "defect_type": defect_type,
-                "timestamp": timestamp,
-                "length_m": approx_length,
-                "image_path": img_path
-            })
-
-            detected = True
-
-        # Show annotated frame
-        annotated = results[0].plot()
-        cv2.imshow("🛠️ Steel Sheet Detection", annotated)
-
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('q'):
-            print("🛑 Detection stopped.")
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+    headless = HEADLESS if headless is None else headless
+    preview = PreviewThrottle(0 if headless else PREVIEW_EVERY_N, PREVIEW_MAX_FPS)
+    rendered = 0
+
+    def read_frame(timeout=None):
+        frame = frames_in.get(timeout)
+        return frame.image if frame is not None else None
+
+    try:
+        while True:
+            frames = engine.collect(read_frame)
+            if not frames:
+                if frames_in.closed:
+                    print("⚠️ Failed to capture frame.")
+                    break
+                continue
+
+            # Predict using YOLOv8, one forward pass per batch
+            results = engine.infer(frames)
+
+            for frame, result in zip(frames, results):
+                for box in result.boxes:
+                    cls_id = int(box.cls[0])
+                    conf = float(box.conf[0])
+                    defect_type = model.names[cls_id]
+
+                    # Calculate time + estimated length
+                    elapsed_time = time.time() - start_time
+                    approx_length = round(elapsed_time * speed_mps, 2)
+                    timestamp = datetime.now().strftime("%H:%M:%S")
+
+                    # Crop and save defect region
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    cropped = frame[y1:y2, x1:x2]
+                    img_filename = f"{defect_type}_{timestamp.replace(':', '-')}.jpg"
+                    img_path = os.path.join(save_path, sheet_id, "images", img_filename)
+                    cv2.imwrite(img_path, cropped)
+
+                    print(f"✅ Detected: {defect_type} at {approx_length}m [{timestamp}]")
+
+                    defect_log.append({
+                        "sheet_id": sheet_id,
+                        "defect_type": defect_type,
+                        "timestamp": timestamp,
+                        "length_m": approx_length,
+                        "image_path": img_path
+                    })
+
+            # Show annotated frame (skipped entirely when headless)
+            if preview.due():
+                cv2.imshow("🛠️ Steel Sheet Detection", render_preview(results[-1], scale=PREVIEW_SCALE))
+                rendered += 1
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    print("🛑 Detection stopped.")
+                    break
+    except KeyboardInterrupt:
+        print("🛑 Detection stopped.")
+
+    frames_in.unsubscribe()
+    if not headless:   # headless OpenCV builds have no GUI backend to tear down
+        cv2.destroyAllWindows()
+    elapsed = time.time() - start_time
+    print(f"📊 {engine.frames / elapsed if elapsed else 0.0:.1f} FPS detection, "
+          f"{rendered / elapsed if elapsed else 0.0:.1f} FPS preview "
+          f"({'headless' if headless else f'{rendered} frames rendered'}); {engine.summary()}")
     return defect_log
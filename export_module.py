@@ -0,0 +1,169 @@
+# export_module.py
+#
+# Export trained weights for CPU inference and compare backends.
+#
+#   python export_module.py                      # ONNX (+ INT8 ONNX) for config.MODEL_PATH
+#   python export_module.py --openvino           # also OpenVINO FP32 / INT8
+#   python export_module.py --compare            # latency + mAP table for every export found
+#
+# Exports are written next to the .pt file with the names that
+# utils.model_registry.backend_path() expects, so setting
+# config.INFERENCE_BACKEND is all that is needed to switch.
+
+import argparse
+import csv
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from config import MODEL_PATH, DATASET_YAML, REPORT_DIR
+from utils.model_registry import BACKEND_SUFFIXES, backend_path
+
+CALIB_DIR = "data_collection/collected"
+IMGSZ = 640
+
+
+def _calibration_images(folder=CALIB_DIR, limit=200):
+    paths = sorted(p for p in glob.glob(os.path.join(folder, "**", "*"), recursive=True)
+                   if p.lower().endswith((".jpg", ".jpeg", ".png")))
+    return paths[:limit]
+
+
+def _letterbox_blob(path, imgsz=IMGSZ):
+    """Image → 1x3xHxW float32 blob, preprocessed like the ultralytics predictor."""
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    blob = canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+    return np.ascontiguousarray(blob)
+
+
+def quantize_onnx(onnx_path, out_path, calib_dir=CALIB_DIR):
+    """INT8 ONNX: static QDQ quantization calibrated on collected images,
+    or dynamic (weights-only) quantization when there are none."""
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static,
+    )
+    import onnxruntime as ort
+
+    images = _calibration_images(calib_dir)
+    if not images:
+        print("⚠️ No calibration images; falling back to dynamic INT8 quantization.")
+        quantize_dynamic(onnx_path, out_path, weight_type=QuantType.QUInt8)
+        return out_path
+
+    input_name = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(images)
+
+        def get_next(self):
+            for p in self._paths:
+                blob = _letterbox_blob(p)
+                if blob is not None:
+                    return {input_name: blob}
+            return None
+
+    quantize_static(onnx_path, out_path, Reader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return out_path
+
+
+def export_all(weights=MODEL_PATH, int8=True, openvino=False, data=DATASET_YAML):
+    """Produce every requested variant of ``weights``; returns {backend: path}."""
+    from ultralytics import YOLO
+
+    out = {"pytorch": weights}
+    model = YOLO(weights)
+
+    print("📦 Exporting ONNX…")
+    onnx_path = model.export(format="onnx", imgsz=IMGSZ, dynamic=True, simplify=True)
+    out["onnx"] = onnx_path
+    if int8:
+        print("📦 Quantizing ONNX to INT8…")
+        out["onnx_int8"] = quantize_onnx(onnx_path, backend_path(weights, "onnx_int8"))
+
+    if openvino:
+        print("📦 Exporting OpenVINO…")
+        out["openvino"] = model.export(format="openvino", imgsz=IMGSZ, dynamic=True)
+        if int8:
+            print("📦 Exporting OpenVINO INT8 (NNCF, calibrated on the dataset)…")
+            out["openvino_int8"] = model.export(format="openvino", imgsz=IMGSZ, int8=True, data=data)
+
+    for backend, path in out.items():
+        print(f"   {backend:<14} {path}")
+    return out
+
+
+def compare_backends(weights=MODEL_PATH, data=DATASET_YAML, images_dir=CALIB_DIR, runs=50):
+    """Latency (single frame, CPU) and mAP for every exported backend found.
+
+    Writes ``reports/backend_comparison.csv`` and returns the rows.
+    """
+    from ultralytics import YOLO
+
+    images = [img for img in (cv2.imread(p) for p in _calibration_images(images_dir, limit=runs))
+              if img is not None]
+    if not images:
+        images = [np.zeros((IMGSZ, IMGSZ, 3), dtype=np.uint8)]
+
+    rows = []
+    for backend in BACKEND_SUFFIXES:
+        path = backend_path(weights, backend)
+        if not os.path.exists(path):
+            continue
+        model = YOLO(path, task="detect")
+        model(images[0], imgsz=IMGSZ, verbose=False)  # warm-up
+        times = []
+        for i in range(runs):
+            t0 = time.perf_counter()
+            model(images[i % len(images)], imgsz=IMGSZ, verbose=False)
+            times.append((time.perf_counter() - t0) * 1000)
+        row = {"backend": backend,
+               "p50_ms": round(float(np.percentile(times, 50)), 2),
+               "p95_ms": round(float(np.percentile(times, 95)), 2),
+               "fps": round(1000.0 / float(np.mean(times)), 1),
+               "map50": None, "map50_95": None}
+        if os.path.exists(data):
+            metrics = model.val(data=data, imgsz=IMGSZ, batch=1, device="cpu", verbose=False)
+            row["map50"] = round(float(metrics.box.map50), 4)
+            row["map50_95"] = round(float(metrics.box.map), 4)
+        rows.append(row)
+        print(f"   {backend:<14} p50 {row['p50_ms']:>7.2f} ms  p95 {row['p95_ms']:>7.2f} ms  "
+              f"{row['fps']:>6.1f} FPS  mAP50 {row['map50']}  mAP50-95 {row['map50_95']}")
+
+    if rows:
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        csv_path = os.path.join(REPORT_DIR, "backend_comparison.csv")
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"✅ Comparison saved: {csv_path}")
+    else:
+        print("❌ No exported models found — run the export first.")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export YOLO weights for CPU backends.")
+    parser.add_argument("--weights", default=MODEL_PATH)
+    parser.add_argument("--no-int8", action="store_true", help="skip INT8 variants")
+    parser.add_argument("--openvino", action="store_true", help="also export OpenVINO")
+    parser.add_argument("--data", default=DATASET_YAML, help="dataset yaml for INT8 calibration / mAP")
+    parser.add_argument("--compare", action="store_true", help="only compare existing exports")
+    args = parser.parse_args()
+
+    if not args.compare:
+        export_all(args.weights, int8=not args.no_int8, openvino=args.openvino, data=args.data)
+    compare_backends(args.weights, data=args.data)
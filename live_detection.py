@@ -1,11 +1,53 @@
+import argparse
 import os
+import threading
+import time
 import cv2
-from ultralytics import YOLO
 
-from utils.meter_tracker import MeterTracker
-from utils.helper import format_timestamp, save_image, generate_defect_filename
-from utils.sql_connector import insert_defect
-from config import MODEL_PATH, DEFAULT_SPEED, REPORT_DIR, CONF_THRESHOLD  # add CONF_THRESHOLD in config.py
+from utils.meter_tracker import MeterTracker, make_speed_source
+from utils.helper import generate_defect_filename, render_preview
+from utils.sql_connector import init_db, insert_defect, flush_defects, get_store
+from utils.camera import get_camera
+from utils.pipeline import SinkWorker, PreviewThrottle, LatencyWindow, format_stage_stats
+from utils.metrics import get_metrics, serve_metrics, PeriodicLog, ProfileWindow
+from utils.image_sink import ImageSink
+from utils.defect_tracker import DefectTracker
+from utils.batching import BatchInferenceEngine
+from utils.model_registry import get_model, model_version
+from utils.tiling import TiledInference
+from utils.roi import ROIInference, StripROI
+from utils.motion_gate import MotionGate
+from report_generator import ReportWriter, restore_spool
+from utils.session import DetectionSession
+from utils.detections import result_arrays
+from utils.defect_density import across_position
+from config import (
+    DEFAULT_SPEED, REPORT_DIR, CONF_THRESHOLD,
+    SPEED_SOURCE, SPEED_PROFILE_PATH, ENCODER_PULSES_PER_M, ENCODER_SIMULATE,
+    CAPTURE_BUFFER_SIZE, SINK_QUEUE_SIZE, IMAGE_SAVE_MODE,
+    HEADLESS, PREVIEW_EVERY_N, PREVIEW_MAX_FPS, PREVIEW_SCALE, TILED_INFERENCE,
+    ROI_MODE, MOTION_GATE, ALERT_SINKS, CAMERA_DEVICE, METRICS_LOG_INTERVAL_S, SESSION_RESUME,
+)
+
+WINDOW_NAME = "Steel Inspector (press 'q' to exit)"
+
+
+# --------------------------------------------------------------------
+def _make_display_handler(stop_event, scale, preview_callback=None):
+    if preview_callback is not None:       # embedding GUI shows the frame (e.g. PreviewWidget)
+        def show(job):
+            result, length_m = job
+            preview_callback(render_preview(result, length_m, scale))
+        return show
+
+    def show(job):
+        result, length_m = job
+        cv2.imshow(WINDOW_NAME, render_preview(result, length_m, scale))
+        if cv2.waitKey(1) & 0xFF == ord("q"):
+            print("🛑 Stopping via 'q' key.")
+            stop_event.set()
+    return show
+
 
 # --------------------------------------------------------------------
 def run_live_detection(
@@ -14,92 +56,342 @@ def run_live_detection(
         stop_callback=None,
         show_alert_callback=None,
         conf: float | None = None,
+        batch_size: int | None = None,
+        headless: bool | None = None,
+        tiled: bool | None = None,
+        roi: str | None = None,
+        motion_gate: bool | None = None,
+        preview_callback=None,
+        camera: dict | None = None,
+        model_lock=None,
+        stats_callback=None,
+        profile_s: float | None = None,
+        resume: bool | None = None,
+        model_path: str | None = None,
         ):
     """
-    Run YOLO live detection in a loop.
+    Run YOLO live detection as a staged pipeline.
+
+    The shared camera thread fills a small ring buffer (newest frame wins), the
+    calling thread runs (optionally batched) inference, and image saving,
+    DB inserts, alerts and display each run on their own sink worker so none
+    of them stall capture or inference. Boxes are tracked across frames so
+    each physical defect is recorded once, with its best-scoring image.
     Args
         sheet_id                : coil/sheet identifier string
         speed_mps (optional)    : conveyor speed (m/s); if None → DEFAULT_SPEED
         stop_callback (func)    : returns True when GUI/user wants to stop
         show_alert_callback     : called with defect_info dict when a defect detected
         conf (float, optional)  : confidence threshold (default from config)
+        batch_size (optional)   : frames per forward pass (default INFER_BATCH_SIZE)
+        headless (optional)     : skip overlay rendering and the window (default HEADLESS)
+        tiled (optional)        : overlapping-tile inference (default TILED_INFERENCE)
+        roi (optional)          : "off" | "fixed" | "auto" strip cropping (default ROI_MODE)
+        motion_gate (optional)  : skip inference on unchanged frames (default MOTION_GATE)
+        preview_callback (func) : receives annotated BGR preview frames instead of the
+                                  OpenCV window (called on the display worker thread)
+        camera (optional)       : stream entry from CAMERAS ({"id", "device", "surface"});
+                                  defaults to CAMERA_DEVICE, untagged
+        model_lock (optional)   : lock shared by streams that share one model instance
+        stats_callback (func)   : called once at the end with the run summary dict
+                                  (frames, fps, latency percentiles, per-stage stats)
+        profile_s (optional)    : cProfile the detection loop for this many seconds
+                                  from the start (also on demand: GET /profile)
+        resume (optional)       : continue an interrupted session of this sheet/stream at
+                                  its last meter position (default SESSION_RESUME)
+        model_path (optional)   : weights to detect with (default MODEL_PATH)
     Returns
         list[dict] defects      : collected defect dictionaries
     """
 
-    model = YOLO(MODEL_PATH)
+    camera = camera or {}
+    camera_id, surface = camera.get("id"), camera.get("surface")
+    model = get_model(model_path)
+    version = model_version(model)
     speed = speed_mps if speed_mps is not None else DEFAULT_SPEED
     conf_thr = conf if conf is not None else CONF_THRESHOLD
 
-    tracker = MeterTracker(sheet_number=sheet_id, speed_m_per_sec=speed)
+    speed_source = make_speed_source(SPEED_SOURCE, speed, SPEED_PROFILE_PATH,
+                                     ENCODER_PULSES_PER_M, ENCODER_SIMULATE)
+    headless = HEADLESS if headless is None else headless
+    # Crash-safe session journal; an interrupted run of this sheet/stream resumes where it stopped
+    resume = SESSION_RESUME if resume is None else resume
+    init_db()   # the sessions table may not exist yet (fresh install / older database)
+    session = DetectionSession(sheet_id, camera_id, surface)
+    prior = session.lookup() if resume else None
+    tracker = MeterTracker(sheet_number=sheet_id, speed_m_per_sec=speed, speed_source=speed_source,
+                           offset_m=prior["length_m"] if prior else 0.0)
     tracker.start()
 
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("❌ Camera not detected.")
+    defects: list[dict] = []
+    stop_event = threading.Event()
+    engine = BatchInferenceEngine(model, batch_size=batch_size, lock=model_lock, conf=conf_thr)
+    tiled = TILED_INFERENCE if tiled is None else tiled
+    if tiled:
+        engine = TiledInference(engine)
+    roi = ROI_MODE if roi is None else roi
+    if roi != "off":
+        engine = ROIInference(engine, StripROI(roi))
+    gate = MotionGate() if (MOTION_GATE if motion_gate is None else motion_gate) else None
+    # Frames come from the shared camera thread; each is stamped with its strip
+    # position there, so positions stay correct however long inference takes
+    ring = get_camera(camera.get("device", CAMERA_DEVICE)).subscribe(
+        max(CAPTURE_BUFFER_SIZE, engine.batch_size),
+        transform=lambda f: f._replace(length_m=tracker.length_at(f.t_ns)))
+    if ring is None:
+        print(f"❌ Camera {camera.get('device', CAMERA_DEVICE)} not detected.")
+        tracker.stop()
         return []
+    metrics = get_metrics()
+    sinks, gauges, report, profiler = {}, [], None, None
+    completed = False
+    try:
+        session.begin(resume)
+        frames_before = session.frames
+        if session.resumed:
+            restore_spool(sheet_id, stream=camera_id)   # DB rows are the authority after a crash
 
-    defects: list[dict] = []
+        labels = {"camera": camera_id}
+        serve_metrics()
 
-    print("🔍 Live detection started — press 'q' or Stop button to end.")
-    while True:
-        # Quick exit if GUI sets stop flag BEFORE grabbing next frame
-        if stop_callback and stop_callback():
-            break
-
-        ret, frame = cap.read()
-        if not ret:
-            print("⚠️ Camera read failed.")
-            break
-
-        # YOLO inference
-        results = model(frame, imgsz=640, conf=conf_thr)
-
-        # Parse detections
-        for r in results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])
-                conf_score = float(box.conf[0])
-                defect_type = model.names[cls_id]
-                timestamp = format_timestamp()
-                length_m = tracker.get_length()
-
-                defect_filename = generate_defect_filename(sheet_id, defect_type)
-                image_path = os.path.join(REPORT_DIR, sheet_id, "images", defect_filename)
-                save_image(frame, image_path)
-
-                defect_info = {
-                    "defect_type": defect_type,
-                    "timestamp" : timestamp,
-                    "length_m"  : length_m,
-                    "image_path": image_path,
-                    "confidence": conf_score,
-                }
-
-                defects.append(defect_info)
-                insert_defect(sheet_id, defect_type, length_m, image_path)
-
-                if show_alert_callback:
-                    show_alert_callback(defect_info)
-
-        # Draw overlay
-        annotated = results[0].plot()
-        cv2.putText(
-            annotated, f"Length: {tracker.get_length():.2f} m",
-            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2
-        )
-        cv2.imshow("Steel Inspector (press 'q' to exit)", annotated)
-
-        # Check stop flags after display
-        if stop_callback and stop_callback():
-            break
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            print("🛑 Stopping via 'q' key.")
-            break
+        def timed(stage):
+            return lambda seconds: metrics.observe(stage, seconds, **labels)
 
-    # Cleanup
-    tracker.stop()
-    cap.release()
-    cv2.destroyAllWindows()
-    print("✅ Live detection ended.")
+        images = ImageSink(observe=timed("image_write"))
+        image_dir = os.path.join(REPORT_DIR, sheet_id, "images",
+                                 *([camera_id] if camera_id else []))
+        preview = PreviewThrottle(0 if headless else PREVIEW_EVERY_N, PREVIEW_MAX_FPS)
+        report = ReportWriter(sheet_id, stream=camera_id)   # one spool per stream: no shared file
+        workers = {
+            "db": SinkWorker("db", lambda row: insert_defect(**row), SINK_QUEUE_SIZE,
+                             observe=timed("db")),
+            "report": SinkWorker("report", report.append, SINK_QUEUE_SIZE, observe=timed("report")),
+        }
+        if not headless:
+            workers["display"] = SinkWorker(
+                "display", _make_display_handler(stop_event, PREVIEW_SCALE, preview_callback),
+                maxsize=1, policy="drop_oldest", observe=timed("display"))
+        if show_alert_callback:
+            workers["alerts"] = SinkWorker("alerts", show_alert_callback, SINK_QUEUE_SIZE,
+                                           observe=timed("alerts"))
+        for worker in workers.values():
+            worker.start()
+        sinks = {"images": images, **workers}
+        defect_tracker = DefectTracker()
+        gauges = [metrics.add_gauge("queue_depth", lambda: len(ring), queue="capture", **labels),
+                  metrics.add_gauge("dropped", lambda: ring.dropped, kind="counter",
+                                    queue="capture", **labels),
+                  metrics.add_gauge("queue_depth", lambda: get_store().stats()["depth"],
+                                    queue="db_store")]
+        for name, sink in sinks.items():
+            gauges.append(metrics.add_gauge("queue_depth", lambda s=sink: s.stats().get("depth", 0),
+                                            queue=name, **labels))
+            gauges.append(metrics.add_gauge("dropped", lambda s=sink: s.stats()["dropped"],
+                                            kind="counter", queue=name, **labels))
+        profiler = metrics.add_profiler(ProfileWindow(f"live_{camera_id or sheet_id}"))
+        if profile_s:
+            profiler.request(profile_s)
+        periodic = PeriodicLog(metrics, METRICS_LOG_INTERVAL_S, **labels)
+
+        def emit(track):
+            frame_h, frame_w = track.best_frame.shape[:2]
+            width_pos = across_position(track.best_box, track.best_frame.shape)
+            image_path = os.path.join(
+                image_dir, generate_defect_filename(sheet_id, track.defect_type, images.ext))
+            if IMAGE_SAVE_MODE == "crop":
+                queued = images.submit_crops(track.best_frame, [(track.best_box, image_path)])
+            else:
+                queued = images.submit(track.best_frame, image_path)
+            if not queued:
+                image_path = None   # dropped under back-pressure: the file will never exist
+            track.best_frame = None
+
+            defect_info = {
+                "defect_type"   : track.defect_type,
+                "timestamp"     : track.timestamp,
+                "length_m"      : round(track.first_length_m, 2),
+                "last_length_m" : round(track.last_length_m, 2),
+                "frames"        : track.hits,
+                "image_path"    : image_path,
+                "confidence"    : track.peak_conf,
+                "width_pos"     : round(width_pos, 3),
+                "camera_id"     : camera_id,
+                "surface"       : surface,
+            }
+            defects.append(defect_info)
+            metrics.inc("defects", **labels)
+            sinks["report"].submit(defect_info)
+            session.submitted(track.first_length_m)
+            queued = sinks["db"].submit({
+                "sheet_number": sheet_id, "defect_type": track.defect_type,
+                "length_meter": defect_info["length_m"], "image_path": image_path,
+                "camera_id": camera_id, "surface": surface, "session_id": session.id,
+                "confidence": track.peak_conf, "box": track.best_box,
+                "frame_size": (frame_w, frame_h), "model_version": version,
+                "frame_index": track.best_index, "ts_epoch": track.t_epoch,
+                "last_length_m": defect_info["last_length_m"], "frames": track.hits,
+            })
+            if not queued:
+                session.withdraw()
+            if "alerts" in sinks:
+                sinks["alerts"].submit(defect_info)
+
+        if headless:
+            print("🔍 Live detection started (headless) — Ctrl+C or Stop button to end.")
+        elif preview_callback is not None:
+            print("🔍 Live detection started — press Stop to end.")
+        else:
+            print("🔍 Live detection started — press 'q' or Stop button to end.")
+        t_start = time.perf_counter()
+        inspected = 0   # frames actually inferred: drives track TTL across gated gaps
+        latency = LatencyWindow()
+        try:
+            while not stop_event.is_set():
+                if stop_callback and stop_callback():
+                    break
+                profiler.poll()
+                periodic.maybe_log()
+
+                t0 = time.perf_counter()
+                batch = engine.collect(ring.get)
+                if not batch:
+                    if ring.closed:
+                        break
+                    continue
+                metrics.observe("wait", time.perf_counter() - t0, **labels)   # idle: no frames yet
+                metrics.inc("frames", len(batch), **labels)
+                if gate is not None:
+                    n = len(batch)
+                    batch = [f for f in batch if gate.should_infer(f.image)]
+                    metrics.inc("gated", n - len(batch), **labels)
+                    if not batch:
+                        continue
+                now_ns = time.monotonic_ns()
+                for frame in batch:
+                    metrics.observe("queue", (now_ns - frame.t_ns) / 1e9, **labels)
+
+                # YOLO inference, one forward pass per batch
+                t1 = time.perf_counter()
+                results = engine.infer(f.image for f in batch)
+                t2 = time.perf_counter()
+                metrics.observe("infer", t2 - t1, **labels)
+                speed = getattr(results[0], "speed", None) if results else None
+                if isinstance(speed, dict):   # ultralytics per-image split of the forward pass
+                    for stage in ("preprocess", "inference", "postprocess"):
+                        if speed.get(stage) is not None:
+                            metrics.observe(stage, speed[stage] / 1000.0, **labels)
+
+                # Parse detections; tracks that ended are handed to the sinks
+                for frame, r in zip(batch, results):
+                    inspected += 1
+                    xyxy, confs, classes = result_arrays(r)
+                    detections = [
+                        (box.tolist(), float(c), model.names[int(k)])
+                        for box, c, k in zip(xyxy, confs, classes)
+                    ]
+                    for track in defect_tracker.update(detections, frame.image, frame.length_m,
+                                                       inspected, frame.index):
+                        emit(track)
+                    latency.add(frame.t_ns)
+                done_ns = time.monotonic_ns()
+                metrics.observe("parse", time.perf_counter() - t2, **labels)
+                for frame in batch:
+                    metrics.observe("latency", (done_ns - frame.t_ns) / 1e9, **labels)
+
+                # Journal only up to the oldest defect not committed yet (open tracks included)
+                session.update(frames_before + engine.frames, batch[-1].length_m,
+                               min((t.first_length_m for t in defect_tracker.tracks), default=None))
+
+                if preview.due():
+                    sinks["display"].submit((results[-1], batch[-1].length_m))
+        except KeyboardInterrupt:
+            print("🛑 Stopping via Ctrl+C.")
+
+        completed = True
+    finally:
+        # Cleanup: leave the camera first, emit open tracks, then drain the sinks.
+        # After an error the open tracks are not emitted and the session stays
+        # "running": its committed watermark lies before them, so a resume re-inspects them.
+        if profiler is not None:
+            profiler.stop()
+            metrics.remove_profiler(profiler)
+        stop_event.set()
+        ring.unsubscribe()
+        if completed:
+            for track in defect_tracker.flush():
+                emit(track)
+        for sink in sinks.values():
+            sink.close()
+        if report is not None:
+            report.close()
+        tracker.stop()
+        flush_defects()
+        if session.id is not None:
+            if completed:
+                session.update(frames_before + engine.frames, None)   # keeps the last position
+                session.end()
+            else:
+                session.store.detach(session)
+        metrics.remove_gauges(gauges)
+        if not headless:   # only a window needs tearing down; headless OpenCV builds have no GUI
+            cv2.destroyAllWindows()
+
+    elapsed = time.perf_counter() - t_start
+    stage_stats = {"capture": ring.stats()}
+    stage_stats.update({name: sink.stats() for name, sink in sinks.items()})
+    stage_stats["db_store"] = get_store().stats()
+    stage_stats["tracker"] = defect_tracker.stats()
+    if gate is not None:
+        stage_stats["gate"] = gate.stats()
+    detect_fps = engine.frames / elapsed if elapsed else 0.0
+    lat = latency.percentiles()
+    tag = f" [{camera_id}]" if camera_id else ""
+    print(f"✅ Live detection ended{tag} — {engine.frames} frames in {elapsed:.1f}s "
+          f"({detect_fps:.1f} FPS; {engine.summary()}).")
+    if lat:
+        print("   latency   " + "  ".join(f"{k}={v}" for k, v in lat.items()))
+    if headless:
+        print("   preview   headless — no overlay rendering")
+    else:
+        rendered = sinks["display"].stats()["processed"]
+        print(f"   preview   {rendered} frames rendered "
+              f"({rendered / elapsed if elapsed else 0.0:.1f} FPS vs {detect_fps:.1f} FPS detection, "
+              f"scale={PREVIEW_SCALE})")
+    print(format_stage_stats(stage_stats))
+    if stats_callback:
+        stats_callback({"camera_id": camera_id, "session_id": session.id, "elapsed_s": elapsed,
+                        "frames": engine.frames, "fps": detect_fps, "defects": len(defects),
+                        "latency": lat, "stages": stage_stats})
     return defects
+
+
+# --------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run live steel-sheet defect detection.")
+    parser.add_argument("sheet_id", help="coil / sheet identifier")
+    parser.add_argument("--model", default=None, help="weights file (default MODEL_PATH)")
+    parser.add_argument("--speed", type=float, default=None, help="line speed in m/s")
+    parser.add_argument("--conf", type=float, default=None, help="confidence threshold")
+    parser.add_argument("--batch", type=int, default=None, help="frames per forward pass")
+    parser.add_argument("--headless", action="store_true", default=None,
+                        help="no preview window or overlay rendering")
+    parser.add_argument("--tiled", action="store_true", default=None,
+                        help="overlapping-tile inference for wide frames")
+    parser.add_argument("--roi", choices=("off", "fixed", "auto"), default=None,
+                        help="crop frames to the strip before inference")
+    parser.add_argument("--motion-gate", action="store_true", default=None,
+                        help="skip inference on frames that have not changed")
+    parser.add_argument("--profile", type=float, default=None, metavar="SECONDS",
+                        help="cProfile the detection loop for SECONDS from the start")
+    args = parser.parse_args()
+    from utils.alerts import AlertDispatcher, make_alert_sinks
+    alerts = AlertDispatcher(make_alert_sinks()).start() if ALERT_SINKS else None
+    try:
+        run_live_detection(args.sheet_id, speed_mps=args.speed, conf=args.conf,
+                           batch_size=args.batch, headless=args.headless, tiled=args.tiled,
+                           roi=args.roi, motion_gate=args.motion_gate, profile_s=args.profile,
+                           model_path=args.model,
+                           show_alert_callback=alerts.submit if alerts else None)
+    finally:
+        if alerts:
+            alerts.close()
@@ -2,27 +2,48 @@ import sys
 import shutil
 import os
 import threading
+from PyQt5.QtCore import pyqtSignal, QTimer
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QVBoxLayout, QPushButton,
-    QLineEdit, QTabWidget, QFileDialog, QMessageBox
+    QLineEdit, QTabWidget, QFileDialog, QMessageBox, QInputDialog
 )
 
 from live_detection import run_live_detection
-from report_generator import generate_report
+from multi_camera import run_multi_camera
+from report_generator import generate_report, regenerate_from_db
 from utils.sql_connector import init_db
+from utils.defect_archive import get_archive
+from utils.session import interrupted_sessions, close_session
+from utils.alerts import AlertDispatcher, make_alert_sinks
+from utils.toast import ToastStack
+from utils.preview_widget import PreviewWidget
+from utils import model_registry
+from config import CAMERAS, SESSION_RESUME
 from data_collection.data_collection import DataCollectionWidget  # Data‑collection tab
 
 class MainWindow(QWidget):
+    # Worker threads talk to the GUI only through these (queued) signals
+    _alert_signal = pyqtSignal(object)
+    _finished_signal = pyqtSignal(str, object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Steel Sheet Defect Inspection Dashboard")
         self.resize(650, 450)
 
         init_db()
+        get_archive().start()      # periodically roll defect_logs into the Parquet archive
+        model_registry.preload()   # load + warm up now, not on the first Start click
         self.stop_flag = False
         self.detect_thread = None
+        self.model_path = None     # None = MODEL_PATH; set when newly trained weights are adopted
         self.defects = []
 
+        self.toasts = ToastStack(self)
+        self._alert_signal.connect(self.show_defect_alert)
+        self._finished_signal.connect(self.detection_finished)
+        self.alerts = AlertDispatcher([self._alert_signal.emit, *make_alert_sinks()]).start()
+
         self.tabs = QTabWidget()
         self.tabs.addTab(self.build_detection_tab(), "Detection")
         self.tabs.addTab(self.build_training_tab(), "Train")
@@ -31,6 +52,7 @@ class MainWindow(QWidget):
 
         layout = QVBoxLayout(self)
         layout.addWidget(self.tabs)
+        QTimer.singleShot(0, self.check_interrupted_sessions)   # once the window is up
 
     # ---------------- Detection TAB ----------------
     def build_detection_tab(self):
@@ -43,7 +65,9 @@ class MainWindow(QWidget):
         self.start_btn = QPushButton("Start Detection")
         self.stop_btn  = QPushButton("🛑 Stop Detection")
         self.status_lbl = QLabel("Status: Idle")
+        self.preview = PreviewWidget("Live preview")
 
+        lay.addWidget(self.preview, stretch=1)
         lay.addWidget(self.start_btn)
         lay.addWidget(self.stop_btn)
         lay.addWidget(self.status_lbl)
@@ -54,14 +78,33 @@ class MainWindow(QWidget):
 
     def detection_worker(self, sheet_id):
         """Background thread that runs detection."""
-        self.defects = run_live_detection(
-            sheet_id,
-            stop_callback=lambda: self.stop_flag,
-            show_alert_callback=self.show_defect_alert
-        )
+        if len(CAMERAS) > 1:
+            # one worker per stream; the preview shows the first camera
+            results = run_multi_camera(
+                sheet_id,
+                stop_callback=lambda: self.stop_flag,
+                show_alert_callback=self.alerts.submit,
+                preview_callback=lambda cam_id, image: (
+                    self.preview.submit(image) if cam_id == CAMERAS[0]["id"] else None),
+                model_path=self.model_path,
+            )
+            self.defects = [d for defects in results.values() for d in defects]
+        else:
+            self.defects = run_live_detection(
+                sheet_id,
+                stop_callback=lambda: self.stop_flag,
+                show_alert_callback=self.alerts.submit,
+                preview_callback=self.preview.submit,
+                camera=CAMERAS[0] if CAMERAS else None,
+                model_path=self.model_path,
+            )
+        self.alerts.flush()   # deliver alerts still held by the rate limit
         # After loop ends generate report
-        if self.defects:
-            path = generate_report(sheet_id, self.defects)
+        path = generate_report(sheet_id, self.defects) if self.defects else None
+        self._finished_signal.emit(sheet_id, path)
+
+    def detection_finished(self, sheet_id, path):
+        if path:
             self.status_lbl.setText(f"✅ Report saved → {path}")
             QMessageBox.information(self, "Done", f"Report generated for {sheet_id}")
         else:
@@ -83,17 +126,48 @@ class MainWindow(QWidget):
         self.detect_thread = threading.Thread(target=self.detection_worker, args=(sheet_id,), daemon=True)
         self.detect_thread.start()
 
+    def check_interrupted_sessions(self):
+        """Offer to resume a sheet whose inspection died with the app; close out the rest."""
+        by_sheet = {}
+        for session in interrupted_sessions():   # newest first
+            by_sheet.setdefault(session["sheet_number"], []).append(session)
+        for i, (sheet_id, sessions) in enumerate(by_sheet.items()):
+            length = max(s["length_m"] or 0.0 for s in sessions)
+            count = sum(s["defects"] or 0 for s in sessions)
+            answer = QMessageBox.No
+            if i == 0 and SESSION_RESUME:
+                answer = QMessageBox.question(
+                    self, "Interrupted Inspection",
+                    f"Inspection of sheet {sheet_id} stopped unexpectedly at {length:.1f} m "
+                    f"({count} defects recorded).\n\nResume it at that position?\n"
+                    f"(No closes it and builds the report from what was recorded.)")
+            if answer == QMessageBox.Yes:
+                self.sheet_id_input.setText(sheet_id)
+                self.start_detection()   # picks the session up (SESSION_RESUME)
+                continue
+            for session in sessions:
+                close_session(session["id"])
+            path = regenerate_from_db(sheet_id)
+            self.status_lbl.setText(f"Interrupted sheet {sheet_id} closed — report → {path}")
+
     def stop_detection(self):
         if not self.detect_thread:
             return
         self.stop_flag = True
         self.status_lbl.setText("Stopping… please wait.")
 
-    def show_defect_alert(self, info):
-        alert = QMessageBox()
-        alert.setWindowTitle("⚠️ Defect Detected")
-        alert.setText(f"{info['defect_type']} at {info['length_m']:.2f} m")
-        alert.exec_()
+    def show_defect_alert(self, alert):
+        """GUI-thread slot: non-modal toast, detection keeps running."""
+        self.toasts.show_message(f"⚠️ {alert.message}")
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.toasts.relayout()
+
+    def closeEvent(self, event):
+        self.stop_flag = True
+        self.alerts.close()
+        super().closeEvent(event)
 
     # ---------------- Training TAB ----------------
     def build_training_tab(self):
@@ -124,7 +198,13 @@ class MainWindow(QWidget):
         import subprocess
         ret = subprocess.run([sys.executable, "train_module.py"]).returncode
         if ret == 0:
-            QMessageBox.information(self, "Training", "Model training completed!")
+            weights = model_registry.latest_weights()
+            answer = QMessageBox.question(self, "Training",
+                                          f"Model training completed!\nNew weights: {weights}\n"
+                                          "Use them for detection in this session?")
+            if weights and answer == QMessageBox.Yes:
+                self.model_path = weights
+                model_registry.preload(weights)   # load + warm up the new weights in the background
         else:
             QMessageBox.critical(self, "Training", "Training failed — check console.")
 
@@ -133,10 +213,20 @@ class MainWindow(QWidget):
         tab = QWidget()
         lay = QVBoxLayout(tab)
         open_btn = QPushButton("📂 Open Reports Folder")
+        regen_btn = QPushButton("Rebuild Sheet Report from DB")
         lay.addWidget(open_btn)
+        lay.addWidget(regen_btn)
         open_btn.clicked.connect(self.open_reports_folder)
+        regen_btn.clicked.connect(self.regenerate_report)
         return tab
 
+    def regenerate_report(self):
+        sheet_id, ok = QInputDialog.getText(self, "Rebuild Report", "Sheet number:")
+        if not ok or not sheet_id.strip():
+            return
+        path = regenerate_from_db(sheet_id.strip())
+        QMessageBox.information(self, "Report", f"Report rebuilt → {path}")
+
     def open_reports_folder(self):
         import subprocess, platform
         path = os.path.abspath("reports")
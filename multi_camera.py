@@ -0,0 +1,208 @@
+# multi_camera.py
+"""
+Inspect several camera streams (surfaces / lines) at once.
+
+Each stream in ``CAMERAS`` runs the full live pipeline (capture, inference,
+tracking, sinks) of ``run_live_detection``. In "process" mode every stream
+gets its own worker process, camera and model instance, so streams scale
+across cores instead of sharing one GIL; in "thread" mode they run in this
+process and share one model. Defects are tagged with the stream's camera id
+and surface in the DB, the report spools and the alerts.
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import threading
+
+from config import CAMERAS, MULTI_CAMERA_MODE, MULTI_CAMERA_TORCH_THREADS
+
+
+def _sheet_for(stream, sheet_ids):
+    """``sheet_ids`` is one sheet for every stream, or a ``{line: sheet_id}`` mapping."""
+    if isinstance(sheet_ids, dict):
+        return sheet_ids.get(stream.get("line"))
+    return sheet_ids
+
+
+def _stream_worker(stream, sheet_id, options, stop, events, previews, torch_threads, preview):
+    """Worker process: one stream with its own camera, model and sinks."""
+    if torch_threads:
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+    from live_detection import run_live_detection
+
+    cam_id = stream["id"]
+
+    def send_preview(image):
+        try:
+            previews.put_nowait((cam_id, image))
+        except queue.Full:
+            pass   # GUI behind: drop, the next frame is coming
+
+    defects = []
+    try:
+        defects = run_live_detection(
+            sheet_id, stop_callback=stop.is_set,
+            show_alert_callback=lambda info: events.put(("alert", cam_id, info)),
+            preview_callback=send_preview if preview else None, headless=not preview,
+            camera=stream, **options)
+    finally:
+        events.put(("done", cam_id, defects))
+
+
+def run_multi_camera(sheet_ids, streams=None, mode=None, stop_callback=None,
+                     show_alert_callback=None, preview_callback=None, **options):
+    """
+    Run every stream until ``stop_callback()`` returns True (or Ctrl+C).
+
+    Args
+        sheet_ids               : sheet id for all streams, or ``{line: sheet_id}``
+        streams (optional)      : stream entries (default CAMERAS)
+        mode (optional)         : "process" | "thread" (default MULTI_CAMERA_MODE)
+        stop_callback (func)    : returns True when GUI/user wants to stop
+        show_alert_callback     : called in this process with each defect_info dict
+        preview_callback (func) : called in this process with ``(camera_id, image)``;
+                                  without it the streams run headless
+        **options               : passed on to ``run_live_detection`` (conf, batch_size, …)
+    Returns
+        dict {camera_id: list[dict] defects}
+    """
+    streams = streams or CAMERAS
+    mode = mode or MULTI_CAMERA_MODE
+    if mode not in ("process", "thread"):
+        raise ValueError(f"Unknown multi-camera mode: {mode}")
+    jobs = []
+    for stream in streams:
+        sheet_id = _sheet_for(stream, sheet_ids)
+        if sheet_id:
+            jobs.append((stream, sheet_id))
+        else:
+            print(f"⚠️ No sheet id for stream {stream['id']} (line {stream.get('line')}); skipped.")
+    if not jobs:
+        return {}
+
+    print(f"🎥 Inspecting {len(jobs)} stream(s) in {mode} mode: "
+          + ", ".join(f"{s['id']}={s.get('surface', '?')}→{sheet}" for s, sheet in jobs))
+    if mode == "thread":
+        return _run_threads(jobs, stop_callback, show_alert_callback, preview_callback, options)
+    return _run_processes(jobs, stop_callback, show_alert_callback, preview_callback, options)
+
+
+def _run_threads(jobs, stop_callback, show_alert_callback, preview_callback, options):
+    from live_detection import run_live_detection
+
+    stop = threading.Event()
+    model_lock = threading.Lock()   # one model instance, one forward pass at a time
+    results = {}
+
+    def run(stream, sheet_id):
+        cam_id = stream["id"]
+        results[cam_id] = run_live_detection(
+            sheet_id, stop_callback=stop.is_set, show_alert_callback=show_alert_callback,
+            preview_callback=(lambda image: preview_callback(cam_id, image)) if preview_callback else None,
+            headless=preview_callback is None, camera=stream, model_lock=model_lock, **options)
+
+    threads = [threading.Thread(target=run, args=job, name=f"stream-{job[0]['id']}", daemon=True)
+               for job in jobs]
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            if stop_callback and stop_callback():
+                stop.set()
+            for t in threads:
+                t.join(timeout=0.1)
+    except KeyboardInterrupt:
+        print("🛑 Stopping via Ctrl+C.")
+        stop.set()
+        for t in threads:
+            t.join()
+    return results
+
+
+def _run_processes(jobs, stop_callback, show_alert_callback, preview_callback, options):
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    events = ctx.Queue()                           # alerts + results: never dropped
+    previews = ctx.Queue(maxsize=2 * len(jobs))    # preview frames: dropped when full
+    torch_threads = MULTI_CAMERA_TORCH_THREADS or max(1, (os.cpu_count() or 1) // len(jobs))
+    procs = {}
+    for stream, sheet_id in jobs:
+        p = ctx.Process(target=_stream_worker, name=f"stream-{stream['id']}",
+                        args=(stream, sheet_id, options, stop, events, previews, torch_threads,
+                              preview_callback is not None))
+        p.start()
+        procs[stream["id"]] = p
+
+    results = {}
+    try:
+        while len(results) < len(procs):
+            if stop_callback and stop_callback():
+                stop.set()
+            try:
+                kind, cam_id, payload = events.get(timeout=0.05)
+                if kind == "alert" and show_alert_callback:
+                    show_alert_callback(payload)
+                elif kind == "done":
+                    results[cam_id] = payload
+            except queue.Empty:
+                for cam_id, p in procs.items():
+                    if not p.is_alive() and cam_id not in results and events.empty():
+                        print(f"❌ Stream {cam_id} exited unexpectedly (code {p.exitcode}).")
+                        results[cam_id] = []
+            while preview_callback:
+                try:
+                    preview_callback(*previews.get_nowait())
+                except queue.Empty:
+                    break
+    except KeyboardInterrupt:
+        print("🛑 Stopping via Ctrl+C.")
+        stop.set()
+        while len(results) < len(procs) and any(p.is_alive() for p in procs.values()):
+            try:
+                kind, cam_id, payload = events.get(timeout=0.5)
+                if kind == "done":
+                    results[cam_id] = payload
+            except queue.Empty:
+                pass
+    for p in procs.values():
+        p.join(timeout=5.0)
+    return results
+
+
+# --------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run live detection on every configured camera.")
+    parser.add_argument("sheet_id", nargs="+",
+                        help="one sheet id for all streams, or LINE=SHEET pairs per line")
+    parser.add_argument("--mode", choices=("process", "thread"), default=None,
+                        help="one process per stream (default from config) or shared-model threads")
+    parser.add_argument("--model", default=None, help="weights file (default MODEL_PATH)")
+    parser.add_argument("--conf", type=float, default=None, help="confidence threshold")
+    parser.add_argument("--batch", type=int, default=None, help="frames per forward pass")
+    args = parser.parse_args()
+
+    if len(args.sheet_id) == 1 and "=" not in args.sheet_id[0]:
+        sheets = args.sheet_id[0]
+    else:
+        sheets = dict(pair.split("=", 1) for pair in args.sheet_id)
+
+    from report_generator import generate_report
+    from utils.alerts import AlertDispatcher, make_alert_sinks
+    from config import ALERT_SINKS
+
+    alerts = AlertDispatcher(make_alert_sinks()).start() if ALERT_SINKS else None
+    try:
+        run_multi_camera(sheets, mode=args.mode, conf=args.conf, batch_size=args.batch,
+                         model_path=args.model,
+                         show_alert_callback=alerts.submit if alerts else None)
+    finally:
+        if alerts:
+            alerts.close()
+    for sheet in sorted(set(sheets.values()) if isinstance(sheets, dict) else {sheets}):
+        generate_report(sheet)
@@ -1,39 +1,383 @@
 # report_generator.py
 
+import csv
+import math
 import os
-import pandas as pd
-from utils.sql_connector import insert_defect
-from config import REPORT_DIR  # ✅ Use global path from config
-
-def generate_report(sheet_id, defect_data):
-    # Create report folder
-    report_dir = os.path.join(REPORT_DIR, sheet_id)
-    os.makedirs(report_dir, exist_ok=True)
-
-    # Excel path
-    excel_path = os.path.join(report_dir, f"{sheet_id}.xlsx")
-
-    # Prepare DataFrame
-    df = pd.DataFrame(defect_data)
-    df = df[["defect_type", "timestamp", "length_m", "image_path"]]  # Keep columns in order
-    df.rename(columns={
-        "defect_type": "Defect Type",
-        "timestamp": "Timestamp",
-        "length_m": "Length (m)",
-        "image_path": "Defect Image"
-    }, inplace=True)
-
-    # Save Excel file
-    df.to_excel(excel_path, index=False)
-    print(f"✅ Report saved: {excel_path}")
+import re
+import threading
+from config import (  # ✅ Use global path from config
+    REPORT_DIR, DB_NAME, REPORT_SPOOL_FORMAT, REPORT_FLUSH_ROWS, REPORT_PARQUET_ROW_GROUP,
+    REPORT_DENSITY, DENSITY_WORST_N, ARCHIVE_PURGE_AFTER_DAYS,
+)
+
+# Spool columns → Excel headers (first four match the original report layout)
+COLUMNS = {
+    "defect_type": "Defect Type",
+    "timestamp": "Timestamp",
+    "length_m": "Length (m)",
+    "image_path": "Defect Image",
+    "confidence": "Confidence",
+    "last_length_m": "Last Seen (m)",
+    "frames": "Frames",
+    "width_pos": "Across Strip (0-1)",
+    "camera_id": "Camera",
+    "surface": "Surface",
+}
+XLSX_MAX_ROWS = 1_048_575   # Excel sheet limit minus the header row
+DB_CHUNK_ROWS = 5000
+
+
+def spool_path(sheet_id, fmt=REPORT_SPOOL_FORMAT, stream=None):
+    """Spool file of a sheet; each camera stream (process) writes its own."""
+    suffix = f".{stream}" if stream else ""
+    return os.path.join(REPORT_DIR, sheet_id, f"{sheet_id}_defects{suffix}.{fmt}")
+
+
+def spool_files(sheet_id):
+    """Every spool file of a sheet: all streams, CSV and Parquet (incl. part files)."""
+    import glob
+    base = glob.escape(os.path.splitext(spool_path(sheet_id, "csv"))[0])
+    return sorted(path for ext in ("csv", "parquet")
+                  for path in glob.glob(f"{base}.{ext}") + glob.glob(f"{base}.*.{ext}"))
+
+
+def spool_stream(path, sheet_id):
+    """Stream (camera id) a spool file belongs to; None for the untagged spool."""
+    name = os.path.basename(path)[len(f"{sheet_id}_defects"):]
+    parts = name.split(".")[1:-1]           # drop the leading "" and the extension
+    if parts and re.fullmatch(r"part\d+", parts[-1]):
+        parts = parts[:-1]                  # Parquet continuation part
+    return parts[0] if parts else None
+
+
+class ReportWriter:
+    """Append-only defect spool, written as defects arrive.
+
+    CSV rows are flushed to the OS every ``flush_rows`` rows (default
+    REPORT_FLUSH_ROWS), so a crash loses at most that many. Parquet is
+    written as one row group per ``flush_rows`` rows (default
+    REPORT_PARQUET_ROW_GROUP, the remainder on close): tiny row groups make
+    the file slow to read. ``finalize()`` closes the spool and can add an
+    ``.xlsx`` built from it in bounded memory.
+    """
+
+    def __init__(self, sheet_id, fmt=REPORT_SPOOL_FORMAT, flush_rows=None, append=True,
+                 stream=None):
+        if fmt not in ("csv", "parquet"):
+            raise ValueError(f"Unsupported report spool format: {fmt}")
+        self.sheet_id = sheet_id
+        self.fmt = fmt
+        if flush_rows is None:
+            flush_rows = REPORT_FLUSH_ROWS if fmt == "csv" else REPORT_PARQUET_ROW_GROUP
+        self.flush_rows = max(1, int(flush_rows))
+        self.path = spool_path(sheet_id, fmt, stream)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending = []
+        self.rows = 0
+
+        if fmt == "csv":
+            exists = append and os.path.exists(self.path) and os.path.getsize(self.path) > 0
+            self._file = open(self.path, "a" if exists else "w", newline="")
+            self._csv = csv.DictWriter(self._file, fieldnames=list(COLUMNS), extrasaction="ignore")
+            if not exists:
+                self._csv.writeheader()
+                self._file.flush()
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._schema = pa.schema([
+                ("defect_type", pa.string()), ("timestamp", pa.string()),
+                ("length_m", pa.float64()), ("image_path", pa.string()),
+                ("confidence", pa.float64()), ("last_length_m", pa.float64()),
+                ("frames", pa.int64()), ("width_pos", pa.float64()),
+                ("camera_id", pa.string()), ("surface", pa.string()),
+            ])
+            if append and os.path.exists(self.path):
+                # Parquet files cannot be appended to; continue in a numbered part file
+                base, ext = os.path.splitext(self.path)
+                n = 1
+                while os.path.exists(f"{base}.part{n}{ext}"):
+                    n += 1
+                self.path = f"{base}.part{n}{ext}"
+            self._parquet = pq.ParquetWriter(self.path, self._schema)
+
+    def append(self, defect):
+        with self._lock:
+            self._pending.append(defect)
+            self.rows += 1
+            if len(self._pending) >= self.flush_rows:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
 
-    # ✅ Insert into SQLite database for each defect
-    for defect in defect_data:
-        insert_defect(
-            sheet_number=sheet_id,
-            defect_type=defect["defect_type"],
-            length_meter=defect["length_m"],
-            image_path=defect["image_path"]
-        )
+    def _flush_locked(self):
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        if self.fmt == "csv":
+            self._csv.writerows(rows)
+            self._file.flush()
+        else:
+            import pyarrow as pa
+            cols = {name: [r.get(name) for r in rows] for name in self._schema.names}
+            self._parquet.write_table(pa.table(cols, schema=self._schema))
 
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self.fmt == "csv":
+                self._file.close()
+            else:
+                self._parquet.close()
+
+    def finalize(self, xlsx=True):
+        """Close the spool; optionally write ``<sheet>.xlsx``. Returns the report path."""
+        self.close()
+        return write_xlsx(self.sheet_id) if xlsx else self.path
+
+
+# --------------------------------------------------------------------
+def _iter_file(path):
+    """Stream the rows of one spool file as dicts."""
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            yield from csv.DictReader(f)
+    else:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=DB_CHUNK_ROWS):
+            yield from batch.to_pylist()
+
+
+def _iter_spool(sheet_id):
+    """Stream spool rows as dicts from every spool file of the sheet."""
+    for path in spool_files(sheet_id):
+        yield from _iter_file(path)
+
+
+def write_xlsx(sheet_id):
+    """Build ``<sheet>.xlsx`` from the spool with a write-only (streaming) workbook."""
+    from openpyxl import Workbook
+
+    excel_path = os.path.join(REPORT_DIR, sheet_id, f"{sheet_id}.xlsx")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=str(sheet_id)[:31] or "Defects")
+    ws.append(list(COLUMNS.values()))
+    numeric = {"length_m", "confidence", "last_length_m", "width_pos"}
+    written = 0
+    for row in _iter_spool(sheet_id):
+        if written >= XLSX_MAX_ROWS:
+            print(f"⚠️ Report truncated at {XLSX_MAX_ROWS} rows; full data is in the spool.")
+            break
+        values = []
+        for key in COLUMNS:
+            v = row.get(key)
+            if v in ("", None):
+                values.append(None)
+            elif key in numeric:
+                values.append(float(v))
+            elif key == "frames":
+                values.append(int(v))
+            else:
+                values.append(v)
+        ws.append(values)
+        written += 1
+    if REPORT_DENSITY:
+        _write_density_sheet(wb, sheet_id)
+    wb.save(excel_path)
+    print(f"✅ Report saved: {excel_path}")
     return excel_path
+
+
+def _write_density_sheet(wb, sheet_id):
+    """"Density" worksheet: summary, worst segments, per-metre table and heat-map PNG."""
+    from utils.defect_density import sheet_density, render_heatmap
+
+    density = sheet_density(sheet_id)
+    png = os.path.join(REPORT_DIR, sheet_id, f"{sheet_id}_heatmap.png")
+    render_heatmap(density, png)
+    print(f"🗺️ Heat-map saved: {png}")
+
+    ws = wb.create_sheet(title="Density")
+    ws.append(["Defects", density.n_defects])
+    ws.append(["Sheet length (m)", round(float(density.sheet_length_m), 2)])
+    ws.append(["Defects per metre", round(density.per_metre, 4)])
+    ws.append(["Heat-map", png])
+    ws.append([])
+    ws.append(["Worst segments", "Start (m)", "End (m)", "Defects", "By type"])
+    for rank, (start, end, count, per_type) in enumerate(density.worst_segments(DENSITY_WORST_N), 1):
+        by_type = ", ".join(f"{t}: {n}" for t, n in per_type.items())
+        ws.append([rank, start, end, count, by_type])
+    ws.append([])
+    ws.append(["Start (m)", "End (m)", "Defects", "Defects/m", *density.types])
+    per_m = density.segment_density()
+    for i, count in enumerate(density.along_total):
+        if count:
+            ws.append([float(density.length_edges[i]), float(density.length_edges[i + 1]),
+                       int(count), float(per_m[i]), *(int(density.along[t][i]) for t in density.types)])
+    try:
+        from openpyxl.drawing.image import Image
+        img = Image(png)
+    except ImportError:   # embedding needs Pillow; the PNG is still next to the report
+        return
+    img.anchor = "H2"
+    ws.add_image(img)
+
+
+def generate_report(sheet_id, defect_data=None):
+    """Final report for ``sheet_id``.
+
+    Live detection already streams defects to the spool and the DB, so this
+    only renders the spool to Excel. ``defect_data`` is used to build the
+    spool when none exists (callers that collected defects themselves);
+    nothing is inserted into the DB a second time.
+    """
+    if not spool_files(sheet_id) and defect_data:
+        writer = ReportWriter(sheet_id, fmt="csv", append=False)
+        for defect in defect_data:
+            writer.append(defect)
+        writer.close()
+    return write_xlsx(sheet_id)
+
+
+_ALL_STREAMS = object()
+
+
+# defect_logs columns read back into spool rows (the archive names timestamp "ts")
+DB_FIELDS = ("defect_type", "timestamp", "length_meter", "image_path", "camera_id", "surface",
+             "confidence", "last_length_m", "frames", "box_x1", "box_y1", "box_x2", "box_y2",
+             "frame_w", "frame_h")
+
+
+def _sqlite_rows(sheet_id, db_name, camera_id):
+    import sqlite3
+
+    sql = f"SELECT {', '.join(DB_FIELDS)} FROM defect_logs WHERE sheet_number = ?"
+    args = [sheet_id]
+    if camera_id is not _ALL_STREAMS:
+        sql += " AND camera_id IS ?"
+        args.append(camera_id)
+    conn = sqlite3.connect(db_name)
+    try:
+        cur = conn.execute(sql + " ORDER BY length_meter", args)
+        while True:
+            chunk = cur.fetchmany(DB_CHUNK_ROWS)
+            if not chunk:
+                break
+            yield from chunk
+    finally:
+        conn.close()
+
+
+def _archive_rows(sheet_id, db_name, camera_id):
+    """The sheet's rows from the Parquet archive plus the ones not archived yet."""
+    import numpy as np
+    from utils.defect_archive import DefectArchive, get_archive
+
+    archive = get_archive() if db_name == DB_NAME else DefectArchive(db_name=db_name)
+    columns = ["ts" if f == "timestamp" else f for f in DB_FIELDS]
+    data = archive.query(sheets=[sheet_id], columns=columns)
+    data["ts"] = np.array([None if s == "NaT" else s.replace("T", " ")
+                           for s in np.datetime_as_string(data["ts"], unit="s")], dtype=object)
+
+    def value(v):
+        return None if isinstance(v, float) and math.isnan(v) else v   # Parquet nulls → None
+
+    rows = (tuple(value(v) for v in row) for row in zip(*(data[c].tolist() for c in columns)))
+    if camera_id is not _ALL_STREAMS:
+        rows = (row for row in rows if row[4] == camera_id)
+    yield from sorted(rows, key=lambda row: row[2])
+
+
+def _db_defects(sheet_id, db_name=DB_NAME, camera_id=_ALL_STREAMS):
+    """Stream a sheet's ``defect_logs`` rows as spool dicts, ``fetchmany`` chunk by chunk.
+
+    Rows that carry their box geometry also get the across-strip position.
+    When ARCHIVE_PURGE_AFTER_DAYS lets the archive delete old rows from
+    SQLite, the sheet is read through the archive so older sheets stay complete.
+    """
+    from utils.defect_density import across_position
+
+    source = _archive_rows if ARCHIVE_PURGE_AFTER_DAYS and ARCHIVE_PURGE_AFTER_DAYS > 0 else _sqlite_rows
+    for (defect_type, timestamp, length_m, image_path, cam, surface, conf, last_length_m, frames,
+         *box, frame_w, frame_h) in source(sheet_id, db_name, camera_id):
+        width_pos = None
+        if box[0] is not None and frame_w and frame_h:
+            width_pos = round(across_position(box, (frame_h, frame_w)), 3)
+        yield {"defect_type": defect_type, "timestamp": timestamp, "length_m": length_m,
+               "image_path": image_path, "camera_id": cam, "surface": surface,
+               "confidence": conf, "last_length_m": last_length_m,
+               "frames": int(frames) if frames is not None else None,
+               "width_pos": width_pos}
+
+
+def regenerate_from_db(sheet_id, xlsx=True, db_name=DB_NAME):
+    """Rebuild a sheet's spools (and xlsx) straight from ``defect_logs``.
+
+    Rows are read with ``fetchmany`` in chunks, so memory stays bounded
+    however large the sheet is. Each camera stream gets its own spool again,
+    so a later ``restore_spool`` of one stream replaces exactly its rows.
+    Returns the xlsx path, or the spool paths when ``xlsx`` is False.
+    """
+    from utils.sql_connector import flush_defects
+
+    flush_defects()
+    for path in spool_files(sheet_id):   # the DB is the full record
+        os.remove(path)
+    writers = {}
+    for defect in _db_defects(sheet_id, db_name):
+        stream = defect["camera_id"]
+        if stream not in writers:
+            writers[stream] = ReportWriter(sheet_id, fmt="csv", append=False, stream=stream)
+        writers[stream].append(defect)
+    for writer in writers.values():
+        writer.close()
+    print(f"📄 {sum(w.rows for w in writers.values())} defect(s) read from DB for {sheet_id}")
+    return write_xlsx(sheet_id) if xlsx else spool_files(sheet_id)
+
+
+def _mixed_spool(path):
+    """True if an untagged spool holds rows of tagged streams (a combined rebuild)."""
+    for row in _iter_file(path):
+        if row.get("camera_id"):
+            return True
+    return False
+
+
+def restore_spool(sheet_id, stream=None, db_name=DB_NAME):
+    """Rewrite one stream's spool from ``defect_logs`` before a session resumes.
+
+    After a crash the spool and the DB may each miss the last few rows; the
+    DB (committed together with the session journal) is authoritative. An
+    untagged spool that still holds every stream's rows (older combined
+    rebuild) is cut back to the untagged rows, or the report would count
+    this stream twice. Warns if the sheet's spools and the DB disagree.
+    """
+    from utils.sql_connector import flush_defects
+
+    flush_defects()
+    rebuild = [stream]
+    for path in spool_files(sheet_id):
+        owner = spool_stream(path, sheet_id)
+        if owner == stream or (owner is None and _mixed_spool(path)):
+            os.remove(path)
+            if owner != stream and owner not in rebuild:
+                rebuild.append(owner)
+    rows = 0
+    for owner in rebuild:
+        writer = ReportWriter(sheet_id, fmt="csv", append=False, stream=owner)
+        for defect in _db_defects(sheet_id, db_name, camera_id=owner):
+            writer.append(defect)
+        writer.close()
+        if owner == stream:
+            rows = writer.rows
+        elif not writer.rows:
+            os.remove(writer.path)
+
+    spooled = sum(1 for _ in _iter_spool(sheet_id))
+    stored = sum(1 for _ in _db_defects(sheet_id, db_name))
+    if spooled != stored:
+        print(f"⚠️ Report spools of {sheet_id} hold {spooled} row(s), the DB {stored}")
+    return rows
@@ -3,35 +3,40 @@
 import sys
 import os
 import cv2
-from ultralytics import YOLO
 from utils.helper import format_timestamp, generate_defect_filename, save_image
 from utils.sql_connector import insert_defect
+from utils.batching import BatchInferenceEngine
+from utils.model_registry import get_model
+from config import MODEL_PATH
 
 # CONFIG
-MODEL_PATH = "runs/detect/train5/weights/best.pt"
 SHEET_ID = "test_sheet"
 
-# ✅ Check for image path argument
+# ✅ Check for image path argument(s)
 if len(sys.argv) < 2:
-    print("❌ Please provide the path to the test image:\nUsage: python test_model.py /path/to/image.jpg")
+    print("❌ Please provide the path to the test image(s):\nUsage: python test_model.py /path/to/image.jpg [more.jpg ...]")
     sys.exit(1)
 
-IMAGE_PATH = sys.argv[1]
+IMAGE_PATHS = sys.argv[1:]
 
 # Load model
-model = YOLO(MODEL_PATH)
+model = get_model(MODEL_PATH)
 
-# Load image
-frame = cv2.imread(IMAGE_PATH)
-if frame is None:
-    print(f"❌ Failed to load image at: {IMAGE_PATH}")
-    sys.exit(1)
+# Load images
+frames = []
+for image_path in IMAGE_PATHS:
+    frame = cv2.imread(image_path)
+    if frame is None:
+        print(f"❌ Failed to load image at: {image_path}")
+        sys.exit(1)
+    frames.append(frame)
 
-# Run detection
-results = model(IMAGE_PATH, conf=0.1, imgsz=640)
+# Run detection — all images in one batched forward pass
+engine = BatchInferenceEngine(model, batch_size=len(frames), conf=0.1)
+results = engine.infer(frames)
 
 found_defects = False
-for r in results:
+for frame, r in zip(frames, results):
     for box in r.boxes:
         cls_id = int(box.cls[0])
         conf = float(box.conf[0])
@@ -49,10 +54,11 @@ for r in results:
         print(f"✅ Detected: {defect_type} | Confidence: {conf:.2f} | Saved: {image_path}")
         found_defects = True
 
-# Display result
-annotated_frame = results[0].plot()
-cv2.imshow("Test Image Detection", annotated_frame)
-cv2.waitKey(0)
+# Display results
+print(f"📊 {engine.summary()}")
+for r in results:
+    cv2.imshow("Test Image Detection", r.plot())
+    cv2.waitKey(0)
 cv2.destroyAllWindows()
 
 if not found_defects:
@@ -1,4 +1,9 @@
 from ultralytics import YOLO
 
-model = YOLO('yolov8n.pt')
-model.train(data='dataset/data.yaml', epochs=20, imgsz=640, batch=8)
+from config import DATASET_YAML
+from dataset_builder import build_dataset
+
+if __name__ == "__main__":   # the dataset builder's process pool re-imports this module
+    build_dataset()   # incremental: only new or changed images are processed
+    model = YOLO('yolov8n.pt')
+    model.train(data=DATASET_YAML, epochs=20, imgsz=640, batch=8)
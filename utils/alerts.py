@@ -0,0 +1,260 @@
+# utils/alerts.py
+
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+from config import (
+    ALERT_MIN_INTERVAL_S, ALERT_SINKS, ALERT_LOG_PATH, ALERT_SOCKET_ADDR, ALERT_PLC_PULSE_S,
+)
+
+
+class Alert:
+    """One or more defects of the same type (and surface), coalesced into a single notification."""
+
+    __slots__ = ("defect_type", "surface", "count", "first_m", "last_m", "peak_conf", "timestamp",
+                 "defects")
+
+    def __init__(self, info):
+        self.defect_type = info.get("defect_type", "defect")
+        self.surface = info.get("surface")
+        self.count = 0
+        self.first_m = self.last_m = info.get("length_m")
+        self.peak_conf = 0.0
+        self.timestamp = info.get("timestamp")
+        self.defects = []
+        self.add(info)
+
+    def add(self, info):
+        self.count += 1
+        m = info.get("length_m")
+        if m is not None:
+            self.first_m = m if self.first_m is None else min(self.first_m, m)
+            self.last_m = m if self.last_m is None else max(self.last_m, m)
+        self.peak_conf = max(self.peak_conf, info.get("confidence") or 0.0)
+        self.timestamp = info.get("timestamp", self.timestamp)
+        self.defects.append(info)
+
+    @property
+    def message(self):
+        where = f"[{self.surface}] " if self.surface else ""
+        if self.count == 1:
+            return f"{where}{self.defect_type} at {self.last_m:.2f} m"
+        span = (self.last_m - self.first_m) if self.last_m is not None else 0.0
+        return (f"{where}{self.count}× {self.defect_type} in the last {span:.1f} m "
+                f"({self.first_m:.1f}–{self.last_m:.1f} m)")
+
+    def as_dict(self):
+        return {"defect_type": self.defect_type, "surface": self.surface, "count": self.count,
+                "first_m": self.first_m, "last_m": self.last_m, "peak_conf": self.peak_conf,
+                "timestamp": self.timestamp, "message": self.message}
+
+
+class AlertDispatcher:
+    """Rate-limited, coalescing fan-out of defect alerts to pluggable sinks.
+
+    ``submit()`` only queues and returns, so detection never waits on an
+    alert. Per defect type, the first alert goes out immediately; further
+    defects of that type within ``min_interval_s`` are merged into one
+    alert sent when the interval ends ("12× scratch in the last 2.0 m").
+    Streams of different surfaces are rate-limited separately.
+    Sinks are callables taking an ``Alert`` and run on the dispatcher
+    thread; a failing sink is counted and never stops the others.
+    """
+
+    def __init__(self, sinks=(), min_interval_s=ALERT_MIN_INTERVAL_S):
+        self.sinks = list(sinks)
+        self.min_interval_s = min_interval_s
+        self._pending = {}      # (surface, defect_type) -> Alert
+        self._last_sent = {}    # (surface, defect_type) -> monotonic time
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.received = 0
+        self.dispatched = 0
+        self.sink_errors = 0
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def start(self):
+        if self._thread is None:
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, info):
+        """Queue one defect (the ``defect_info`` dict from live detection)."""
+        kind = (info.get("surface"), info.get("defect_type", "defect"))
+        with self._cond:
+            self.received += 1
+            alert = self._pending.get(kind)
+            if alert is None:
+                self._pending[kind] = Alert(info)
+            else:
+                alert.add(info)
+            self._cond.notify()
+
+    __call__ = submit
+
+    def _take_due(self, now, force=False):
+        """Pop alerts whose type is out of its rate-limit window; also the next wake-up delay."""
+        due, wait = [], None
+        for kind in list(self._pending):
+            ready_at = self._last_sent.get(kind, float("-inf")) + self.min_interval_s
+            if force or now >= ready_at:
+                due.append(self._pending.pop(kind))
+                self._last_sent[kind] = now
+            else:
+                wait = ready_at - now if wait is None else min(wait, ready_at - now)
+        return due, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                due, wait = self._take_due(time.monotonic())
+                if not due:
+                    if self._closed:
+                        return
+                    self._cond.wait(wait)
+                    continue
+            self._send(due)
+
+    def _send(self, alerts):
+        with self._send_lock:
+            for alert in alerts:
+                for sink in self.sinks:
+                    try:
+                        sink(alert)
+                    except Exception as exc:
+                        self.sink_errors += 1
+                        print(f"⚠️ Alert sink {getattr(sink, 'name', sink)} failed: {exc}")
+                self.dispatched += 1
+
+    def flush(self):
+        """Send everything pending now, ignoring the rate limit (end of a run)."""
+        with self._cond:
+            due, _ = self._take_due(time.monotonic(), force=True)
+        self._send(due)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        for sink in self.sinks:
+            if hasattr(sink, "close"):
+                sink.close()
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._pending)
+        return {"depth": depth, "received": self.received, "dispatched": self.dispatched,
+                "sink_errors": self.sink_errors}
+
+
+# --------------------------------------------------------------------
+class LogSink:
+    """Append one line per alert to a text file."""
+
+    name = "log"
+
+    def __init__(self, path=ALERT_LOG_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, alert):
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._file.write(f"{stamp}\t{alert.surface or ''}\t{alert.defect_type}\t{alert.count}\t"
+                         f"{alert.message}\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SocketSink:
+    """Fire-and-forget JSON datagram per alert to a local UDP listener."""
+
+    name = "socket"
+
+    def __init__(self, addr=ALERT_SOCKET_ADDR):
+        self.addr = tuple(addr)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def __call__(self, alert):
+        try:
+            self._sock.sendto(json.dumps(alert.as_dict()).encode("utf-8"), self.addr)
+        except (BlockingIOError, ConnectionRefusedError):
+            pass   # nobody listening / buffer full: alerts are best-effort here
+
+    def close(self):
+        self._sock.close()
+
+
+class PLCSink:
+    """Stand-in PLC digital output: pulses high for ``pulse_s`` per alert.
+
+    ``write(state)`` only logs; subclass it with the real fieldbus call
+    (Modbus coil, OPC UA node, GPIO line) for a plant installation.
+    """
+
+    name = "plc"
+
+    def __init__(self, pulse_s=ALERT_PLC_PULSE_S):
+        self.pulse_s = pulse_s
+        self.state = False
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def write(self, state):
+        print(f"🔌 PLC output {'HIGH' if state else 'LOW'}")
+
+    def __call__(self, alert):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()   # extend the pulse instead of toggling
+            if not self.state:
+                self.state = True
+                self.write(True)
+            self._timer = threading.Timer(self.pulse_s, self._release)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _release(self):
+        with self._lock:
+            self._timer = None
+            self.state = False
+            self.write(False)
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self.state:
+                self.state = False
+                self.write(False)
+
+
+SINK_TYPES = {"log": LogSink, "socket": SocketSink, "plc": PLCSink}
+
+
+def make_alert_sinks(names=ALERT_SINKS):
+    """Instantiate the configured sinks by name (see ``SINK_TYPES``)."""
+    sinks = []
+    for name in names:
+        if name not in SINK_TYPES:
+            raise ValueError(f"Unknown alert sink: {name}")
+        sinks.append(SINK_TYPES[name]())
+    return sinks
@@ -0,0 +1,127 @@
+# utils/batching.py
+
+import sys
+import time
+
+from config import INFER_BATCH_SIZE, INFER_MAX_WAIT_MS
+
+
+class BatchInferenceEngine:
+    """Group frames into batches and run one forward pass per batch.
+
+    A batch is closed when it holds ``batch_size`` frames or when
+    ``max_wait_ms`` has passed since its first frame arrived, whichever comes
+    first, so a slow camera never waits longer than the latency budget.
+    Results are returned in submission order.
+    """
+
+    def __init__(self, model, batch_size=None, max_wait_ms=None, lock=None, **predict_kwargs):
+        self.model = model
+        self.lock = lock   # serialises forward passes when several engines share one model
+        self.batch_size = max(1, int(batch_size if batch_size is not None else INFER_BATCH_SIZE))
+        wait_ms = max_wait_ms if max_wait_ms is not None else INFER_MAX_WAIT_MS
+        self.max_wait_s = max(0.0, wait_ms / 1000.0)
+        self.predict_kwargs = {"imgsz": 640, "verbose": False}
+        self.predict_kwargs.update(predict_kwargs)
+
+        self.frames = 0
+        self.batches = 0
+        self.infer_s = 0.0
+
+    # ----------------------------------------------------------------
+    def collect(self, get_item, poll_s=0.5):
+        """Pull up to ``batch_size`` items from ``get_item(timeout)``.
+
+        Returns an empty list if nothing arrived within ``poll_s``.
+        """
+        first = get_item(timeout=poll_s)
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            item = get_item(timeout=remaining)
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def infer(self, frames):
+        """Run one forward pass over ``frames``; returns one result per frame."""
+        frames = list(frames)
+        if not frames:
+            return []
+        t0 = time.perf_counter()
+        if self.lock is not None:
+            with self.lock:
+                results = self.model(frames if len(frames) > 1 else frames[0], **self.predict_kwargs)
+        else:
+            results = self.model(frames if len(frames) > 1 else frames[0], **self.predict_kwargs)
+        self.infer_s += time.perf_counter() - t0
+        self.frames += len(frames)
+        self.batches += 1
+        return list(results)
+
+    # ----------------------------------------------------------------
+    @property
+    def fps(self):
+        """Frames per second of pure inference time."""
+        return self.frames / self.infer_s if self.infer_s else 0.0
+
+    def summary(self):
+        mean_batch = self.frames / self.batches if self.batches else 0.0
+        return (f"batch={self.batch_size} wait={self.max_wait_s * 1000:.0f}ms "
+                f"mean_batch={mean_batch:.2f} inference_fps={self.fps:.1f}")
+
+
+def compare_batch_throughput(model, frames, batch_size=None, repeats=3, **predict_kwargs):
+    """Measure inference FPS for single-frame vs batched mode on the same frames.
+
+    Returns ``{"single_fps": ..., "batched_fps": ..., "speedup": ...}``.
+    """
+    frames = list(frames)
+    if not frames:
+        raise ValueError("compare_batch_throughput needs at least one frame")
+
+    def measure(size):
+        engine = BatchInferenceEngine(model, batch_size=size, max_wait_ms=0, **predict_kwargs)
+        engine.infer(frames[:size])  # warm-up, not counted
+        engine.frames, engine.batches, engine.infer_s = 0, 0, 0.0
+        for _ in range(repeats):
+            for i in range(0, len(frames), size):
+                engine.infer(frames[i:i + size])
+        return engine.fps
+
+    size = max(1, int(batch_size if batch_size is not None else INFER_BATCH_SIZE))
+    single = measure(1)
+    batched = measure(size)
+    return {"single_fps": single, "batched_fps": batched,
+            "speedup": batched / single if single else 0.0}
+
+
+# --------------------------------------------------------------------
+if __name__ == "__main__":
+    # python -m utils.batching <image_folder> [batch_size]
+    import glob
+    import os
+    import cv2
+    from utils.model_registry import get_model
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m utils.batching <image_folder> [batch_size]")
+        sys.exit(0)
+
+    paths = sorted(p for p in glob.glob(os.path.join(sys.argv[1], "*"))
+                   if p.lower().endswith((".jpg", ".jpeg", ".png")))
+    images = [img for img in (cv2.imread(p) for p in paths) if img is not None]
+    if not images:
+        print(f"❌ No images found in {sys.argv[1]}")
+        sys.exit(1)
+
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    stats = compare_batch_throughput(get_model(), images, batch_size=size)
+    print(f"📊 single-frame: {stats['single_fps']:.1f} FPS | "
+          f"batched: {stats['batched_fps']:.1f} FPS | speedup ×{stats['speedup']:.2f}")
@@ -0,0 +1,232 @@
+# utils/camera.py
+
+import atexit
+import threading
+import time
+
+import cv2
+
+from utils.frame_sources import open_source
+from utils.metrics import get_metrics
+from utils.pipeline import Frame, FrameRing
+from config import (
+    CAMERA_DEVICE, CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS, CAMERA_BUFFER_SIZE, CAMERA_FOURCC,
+    CAMERA_READ_RETRIES, CAMERA_IDLE_RELEASE_S,
+)
+
+
+class Subscription(FrameRing):
+    """One consumer's view of a camera's frame stream.
+
+    Frames are queued in this subscriber's own ring with its own drop
+    policy, so a slow consumer never stalls the camera or the others.
+    With ``callback`` set, each frame is handed to it on the capture thread
+    instead (it must return quickly, e.g. ``PreviewWidget.submit``).
+    ``transform`` runs on the capture thread too, e.g. to stamp the strip
+    position at capture time. Frames are shared: treat them as read-only.
+    """
+
+    def __init__(self, camera, maxlen=2, policy="drop_oldest", transform=None, callback=None):
+        super().__init__(maxlen, policy)
+        self.camera = camera
+        self.transform = transform
+        self.callback = callback
+
+    def deliver(self, frame):
+        if self.transform is not None:
+            frame = self.transform(frame)
+        if self.callback is not None:
+            self.callback(frame)
+            with self._cond:
+                self.put_count += 1
+        else:
+            self.put(frame)
+
+    def unsubscribe(self):
+        self.camera._unsubscribe(self)
+        self.close()
+
+
+class Camera:
+    """Single owner of one capture device, shared by any number of subscribers.
+
+    ``device`` is a camera index / URL or a replay source spec (see
+    ``utils.frame_sources.open_source``). One thread reads the device and fans each frame (a ``Frame`` with
+    capture time and index; ``length_m`` is left to subscribers) out to
+    every subscription. The device opens on the first ``subscribe()`` and
+    is released ``idle_release_s`` after the last subscriber leaves, so
+    switching between consumers does not reopen it.
+    """
+
+    def __init__(self, device=CAMERA_DEVICE, width=CAMERA_WIDTH, height=CAMERA_HEIGHT,
+                 fps=CAMERA_FPS, buffer_size=CAMERA_BUFFER_SIZE, fourcc=CAMERA_FOURCC,
+                 retries=CAMERA_READ_RETRIES, idle_release_s=CAMERA_IDLE_RELEASE_S):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.buffer_size = buffer_size
+        self.fourcc = fourcc
+        self.retries = max(1, int(retries))
+        self.idle_release_s = idle_release_s
+        self._cap = None
+        self._thread = None
+        self._lock = threading.Condition()
+        self._subs = []
+        self._latest = None
+        self._stop = False
+        self._idle_since = None
+        self.frames = 0
+        self.read_failures = 0
+        self.opens = 0
+
+    def _open(self):
+        cap = open_source(self.device)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        if self.fourcc:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+        if self.width and self.height:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.fps:
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+        if self.buffer_size:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        self.opens += 1
+        return cap
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._cap is not None
+
+    def subscribe(self, maxlen=2, policy="drop_oldest", transform=None, callback=None):
+        """New ``Subscription``; ``None`` if the device cannot be opened."""
+        with self._lock:
+            if self._cap is None:
+                self._cap = self._open()
+                if self._cap is None:
+                    return None
+                self._stop = False
+                self._thread = threading.Thread(target=self._run, name=f"camera-{self.device}",
+                                                daemon=True)
+                self._thread.start()
+            sub = Subscription(self, maxlen, policy, transform, callback)
+            self._subs.append(sub)
+            self._idle_since = None
+            return sub
+
+    def _unsubscribe(self, sub):
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+            if not self._subs:
+                self._idle_since = time.monotonic()
+
+    def _run(self):
+        failures = 0
+        index = 0
+        metrics, device = get_metrics(), str(self.device)
+        while True:
+            with self._lock:
+                idle = (self._idle_since is not None
+                        and time.monotonic() - self._idle_since >= self.idle_release_s)
+                if self._stop or idle:
+                    subs = self._detach_locked()
+                    break
+                cap = self._cap
+            t0 = time.perf_counter()
+            ret, image = cap.read()
+            metrics.observe("capture", time.perf_counter() - t0, device=device)
+            if not ret and getattr(cap, "exhausted", False):
+                print(f"⏹️ Camera {self.device}: end of replay source.")
+                with self._lock:
+                    subs = self._detach_locked()
+                break
+            if not ret:
+                failures += 1
+                self.read_failures += 1
+                if failures >= self.retries:
+                    print(f"⚠️ Camera {self.device} read failed.")
+                    with self._lock:
+                        subs = self._detach_locked()
+                    break
+                time.sleep(0.01)
+                continue
+            failures = 0
+            index += 1
+            frame = Frame(image, time.monotonic_ns(), None, index)
+            with self._lock:
+                self._latest = frame
+                self.frames += 1
+                subs = list(self._subs)
+                self._lock.notify_all()
+            for sub in subs:
+                try:
+                    sub.deliver(frame)
+                except Exception as exc:
+                    print(f"⚠️ Camera subscriber error: {exc}")
+        for sub in subs:
+            sub.close()   # consumers see the stream end
+
+    def _detach_locked(self):
+        """Release the device and hand back the subscriptions (caller holds the lock)."""
+        subs, self._subs = self._subs, []
+        if self._cap is not None:
+            self._cap.release()   # before a new subscribe() can reopen the device
+        self._cap = None
+        self._thread = None
+        self._latest = None
+        self._idle_since = None
+        self._lock.notify_all()
+        return subs
+
+    def snapshot(self, timeout=1.0):
+        """Copy of the newest frame image (waits up to ``timeout`` for the first one)."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._latest is None and self._cap is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+            return None if self._latest is None else self._latest.image.copy()
+
+    def release(self):
+        """Close the device now; every subscription ends."""
+        with self._lock:
+            self._stop = True
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {"device": self.device, "open": self._cap is not None, "frames": self.frames,
+                    "subscribers": len(self._subs), "read_failures": self.read_failures,
+                    "opens": self.opens}
+
+
+_cameras = {}
+_cameras_lock = threading.Lock()
+
+
+def get_camera(device=CAMERA_DEVICE):
+    """Process-wide ``Camera`` for ``device`` (one owner per device)."""
+    with _cameras_lock:
+        cam = _cameras.get(device)
+        if cam is None:
+            cam = _cameras[device] = Camera(device)
+        return cam
+
+
+def release_all():
+    with _cameras_lock:
+        cams = list(_cameras.values())
+    for cam in cams:
+        cam.release()
+
+
+atexit.register(release_all)
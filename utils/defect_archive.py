@@ -0,0 +1,379 @@
+# utils/defect_archive.py
+
+import atexit
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.sql_connector import connect, flush_defects
+from config import (
+    DB_NAME, ARCHIVE_DIR, ARCHIVE_INTERVAL_S, ARCHIVE_CHUNK_ROWS, ARCHIVE_PURGE_AFTER_DAYS,
+)
+
+COLUMNS = ["id", "sheet_number", "defect_type", "length_meter", "ts", "image_path",
+           "camera_id", "surface", "session_id", "confidence", "box_x1", "box_y1", "box_x2",
+           "box_y2", "frame_w", "frame_h", "model_version", "frame_index", "ts_epoch",
+           "last_length_m", "frames"]
+SELECT_SQL = ("SELECT id, sheet_number, defect_type, length_meter, timestamp, image_path, "
+              "camera_id, surface, session_id, confidence, box_x1, box_y1, box_x2, box_y2, "
+              "frame_w, frame_h, model_version, frame_index, ts_epoch, last_length_m, frames "
+              "FROM defect_logs ")
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"   # defect_logs.timestamp as written by DefectStore
+
+
+def _schemas():
+    import pyarrow as pa
+    data = pa.schema([
+        ("id", pa.int64()), ("sheet_number", pa.string()), ("defect_type", pa.string()),
+        ("length_meter", pa.float64()), ("ts", pa.timestamp("s")), ("image_path", pa.string()),
+        ("camera_id", pa.string()), ("surface", pa.string()), ("session_id", pa.string()),
+        ("confidence", pa.float64()), ("box_x1", pa.float64()), ("box_y1", pa.float64()),
+        ("box_x2", pa.float64()), ("box_y2", pa.float64()), ("frame_w", pa.int64()),
+        ("frame_h", pa.int64()), ("model_version", pa.string()), ("frame_index", pa.int64()),
+        ("ts_epoch", pa.float64()), ("last_length_m", pa.float64()), ("frames", pa.int64()),
+    ])
+    partitions = pa.schema([("date", pa.string()), ("sheet_number", pa.string())])
+    return data, partitions
+
+
+def _parse_ts(strings):
+    """``defect_logs.timestamp`` strings → ``datetime64[s]`` (NaT where unparsable)."""
+    try:
+        return np.array(strings, dtype="datetime64[s]")
+    except ValueError:
+        out = np.full(len(strings), np.datetime64("NaT"), dtype="datetime64[s]")
+        for i, s in enumerate(strings):
+            try:
+                out[i] = np.datetime64(s, "s")
+            except (TypeError, ValueError):
+                pass
+        return out
+
+
+def _rows_to_table(rows):
+    import pyarrow as pa
+    schema, _ = _schemas()
+    columns = [list(col) for col in zip(*rows)] if rows else [[] for _ in COLUMNS]
+    data = dict(zip(COLUMNS, columns))
+    data["ts"] = _parse_ts(data["ts"])
+    return pa.table(data, schema=schema)
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+class DefectArchive:
+    """Columnar history of ``defect_logs``.
+
+    ``roll()`` copies rows newer than the archive watermark into Parquet
+    files partitioned as ``date=YYYY-MM-DD/sheet_number=<id>/``, in chunks
+    of ``chunk_rows``, and optionally purges archived rows older than
+    ``purge_after_days`` from SQLite. ``query()`` reads the archive with
+    partition pruning and row-group predicate pushdown, and adds the rows
+    not archived yet straight from SQLite, so results are always current.
+    """
+
+    def __init__(self, db_name=DB_NAME, root=ARCHIVE_DIR, chunk_rows=ARCHIVE_CHUNK_ROWS,
+                 purge_after_days=ARCHIVE_PURGE_AFTER_DAYS):
+        self.db_name = db_name
+        self.root = root
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.purge_after_days = purge_after_days
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._dataset = None   # discovered file list, reused until the next roll
+        self.rows_archived = 0
+        self.rows_purged = 0
+        self.rolls = 0
+
+    # ---------------- watermark ----------------
+    @staticmethod
+    def _init_state(conn):
+        conn.execute("CREATE TABLE IF NOT EXISTS archive_state (name TEXT PRIMARY KEY, last_id INTEGER)")
+
+    def watermark(self, conn=None):
+        """Highest ``defect_logs.id`` already in the archive."""
+        own = conn is None
+        conn = conn or connect(self.db_name)
+        try:
+            self._init_state(conn)
+            row = conn.execute("SELECT last_id FROM archive_state WHERE name = 'defect_logs'").fetchone()
+            return row[0] if row else 0
+        finally:
+            if own:
+                conn.close()
+
+    # ---------------- roll ----------------
+    def roll(self):
+        """Archive every row newer than the watermark; returns the number of rows archived."""
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        _, partitions = _schemas()
+        partitioning = ds.partitioning(partitions, flavor="hive")
+        flush_defects()
+        archived = 0
+        with self._lock:
+            conn = connect(self.db_name)
+            try:
+                last_id = self.watermark(conn)
+                backlog = conn.execute("SELECT COUNT(*) FROM defect_logs WHERE id > ?",
+                                       (last_id,)).fetchone()[0]
+                if backlog > self.chunk_rows:
+                    print(f"🗄️ Archiving a backlog of {backlog} defect row(s) to {self.root}…")
+                while True:
+                    rows = conn.execute(
+                        SELECT_SQL + "WHERE id > ? ORDER BY id LIMIT ?",
+                        (last_id, self.chunk_rows)).fetchall()
+                    if not rows:
+                        break
+                    table = _rows_to_table(rows)
+                    dates = [str(row[4])[:10] if row[4] else "unknown" for row in rows]
+                    sheets = [str(s) if s not in (None, "") else "unknown" for s in table["sheet_number"].to_pylist()]
+                    table = table.set_column(1, "sheet_number", pa.array(sheets, pa.string()))
+                    table = table.append_column("date", pa.array(dates, pa.string()))
+                    # File names carry the chunk's first id: a re-run after a crash
+                    # between the write and the watermark update overwrites, not duplicates
+                    ds.write_dataset(
+                        table, self.root, format="parquet", partitioning=partitioning,
+                        basename_template=f"part-{rows[0][0]:012d}-{{i}}.parquet",
+                        existing_data_behavior="overwrite_or_ignore",
+                        max_partitions=max(1024, len(set(zip(dates, sheets)))))
+                    last_id = rows[-1][0]
+                    with conn:
+                        conn.execute(
+                            "INSERT OR REPLACE INTO archive_state (name, last_id) VALUES ('defect_logs', ?)",
+                            (last_id,))
+                    archived += len(rows)
+                self._purge(conn, last_id)
+            finally:
+                conn.close()
+                if archived:
+                    self._dataset = None
+            self.rows_archived += archived
+            self.rolls += 1
+        return archived
+
+    def _purge(self, conn, last_id):
+        if not self.purge_after_days or self.purge_after_days <= 0:
+            return
+        cutoff = (datetime.now() - timedelta(days=self.purge_after_days)).strftime(TS_FORMAT)
+        # Sheets with a running (or interrupted, resumable) session keep their rows:
+        # the resume path restores their spool from SQLite
+        with conn:
+            cur = conn.execute(
+                "DELETE FROM defect_logs WHERE id <= ? AND timestamp < ? AND sheet_number NOT IN "
+                "(SELECT sheet_number FROM sessions WHERE status = 'running')", (last_id, cutoff))
+        self.rows_purged += cur.rowcount
+
+    # ---------------- query ----------------
+    def query(self, sheets=None, defect_types=None, start=None, end=None,
+              min_length=None, max_length=None, columns=None, as_pandas=False, include_live=True,
+              cameras=None, surfaces=None):
+        """Defects matching every given predicate.
+
+        ``sheets`` / ``defect_types`` / ``cameras`` / ``surfaces`` are
+        iterables of allowed values;
+        ``start`` (inclusive) and ``end`` (exclusive) are datetimes or ISO
+        strings; lengths are in metres. Returns a dict of NumPy arrays keyed
+        by column (``ts`` is ``datetime64[s]``), or a pandas DataFrame with
+        ``as_pandas=True``.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        schema, partitions = _schemas()
+        start, end = _to_datetime(start), _to_datetime(end)
+        allowed = {name: [str(v) for v in values] for name, values in (
+            ("sheet_number", sheets), ("defect_type", defect_types),
+            ("camera_id", cameras), ("surface", surfaces)) if values is not None}
+        columns = list(columns or COLUMNS)
+        watermark = self.watermark()
+
+        tables = []
+        if watermark and os.path.isdir(self.root):
+            expr = None
+
+            def both(a, b):
+                return b if a is None else a & b
+
+            for name, values in allowed.items():
+                expr = both(expr, ds.field(name).isin(values))
+            if start is not None:   # date partitions prune whole directories
+                expr = both(expr, ds.field("date") >= start.strftime("%Y-%m-%d"))
+                expr = both(expr, ds.field("ts") >= pa.scalar(start, pa.timestamp("s")))
+            if end is not None:
+                expr = both(expr, ds.field("date") <= end.strftime("%Y-%m-%d"))
+                expr = both(expr, ds.field("ts") < pa.scalar(end, pa.timestamp("s")))
+            if min_length is not None:
+                expr = both(expr, ds.field("length_meter") >= float(min_length))
+            if max_length is not None:
+                expr = both(expr, ds.field("length_meter") <= float(max_length))
+
+            dataset = self._dataset
+            if dataset is None:
+                dataset = self._dataset = ds.dataset(
+                    self.root, format="parquet", schema=schema.append(partitions.field("date")),
+                    partitioning=ds.partitioning(partitions, flavor="hive"))
+            tables.append(dataset.to_table(columns=COLUMNS, filter=expr))
+
+        if include_live:
+            flush_defects()
+            where, params = ["id > ?"], [watermark]
+            for name, values in allowed.items():
+                where.append(f"{name} IN ({','.join('?' * len(values))})")
+                params += values
+            if start is not None:
+                where.append("timestamp >= ?")
+                params.append(start.strftime(TS_FORMAT))
+            if end is not None:
+                where.append("timestamp < ?")
+                params.append(end.strftime(TS_FORMAT))
+            if min_length is not None:
+                where.append("length_meter >= ?")
+                params.append(float(min_length))
+            if max_length is not None:
+                where.append("length_meter <= ?")
+                params.append(float(max_length))
+            conn = sqlite3.connect(self.db_name)
+            try:
+                rows = conn.execute(SELECT_SQL + f"WHERE {' AND '.join(where)}", params).fetchall()
+            except sqlite3.OperationalError:   # no defect_logs table yet
+                rows = []
+            finally:
+                conn.close()
+            tables.append(_rows_to_table(rows))
+
+        table = pa.concat_tables(tables) if tables else _rows_to_table([])
+        table = table.select(columns)
+        if as_pandas:
+            return table.to_pandas()
+        return {name: table[name].to_numpy(zero_copy_only=False) for name in columns}
+
+    def sheet_key(self, sheet_id):
+        """Fingerprint of a sheet's rows: its Parquet files plus its rows not archived yet.
+
+        Changes when a roll writes to the sheet's partitions or new rows arrive
+        for it, so results derived from the sheet can be reused until then.
+        """
+        import glob
+        from urllib.parse import quote
+
+        part = glob.escape(f"sheet_number={quote(str(sheet_id), safe='')}")   # hive-encoded
+        files = []
+        for path in sorted(glob.glob(os.path.join(glob.escape(self.root), "date=*", part, "*"))):
+            st = os.stat(path)
+            files.append((os.path.relpath(path, self.root), st.st_size, st.st_mtime_ns))
+        watermark = self.watermark()
+        flush_defects()
+        conn = sqlite3.connect(self.db_name)
+        try:
+            live = conn.execute("SELECT COUNT(*), MAX(id) FROM defect_logs WHERE sheet_number = ? "
+                                "AND id > ?", (str(sheet_id), watermark)).fetchone()
+        except sqlite3.OperationalError:   # no defect_logs table yet
+            live = (0, None)
+        finally:
+            conn.close()
+        return tuple(files), tuple(live)
+
+    def trend(self, freq="day", by="defect_type", **filters):
+        """Defect counts per ``freq`` bucket (day, week, month, hour) and ``by`` column.
+
+        Same filters as ``query``. Returns ``{"bucket", by, "count"}`` arrays.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        cols = ["ts"] + ([by] if by else [])
+        data = self.query(columns=cols, **filters)
+        table = pa.table({"bucket": pc.floor_temporal(pa.array(data["ts"]), unit=freq),
+                          **({by: pa.array(data[by])} if by else {})})
+        keys = ["bucket"] + ([by] if by else [])
+        counts = table.group_by(keys).aggregate([("bucket", "count")]).sort_by([(k, "ascending") for k in keys])
+        counts = counts.rename_columns(keys + ["count"])
+        return {name: counts[name].to_numpy(zero_copy_only=False) for name in counts.column_names}
+
+    # ---------------- periodic roll ----------------
+    def start(self, interval_s=ARCHIVE_INTERVAL_S):
+        if self._thread is None and interval_s and interval_s > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval_s,),
+                                            name="defect-archive", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self, interval_s):
+        # First roll one interval after start, not during app startup
+        while not self._stop.wait(interval_s):
+            try:
+                n = self.roll()
+                if n:
+                    print(f"🗄️ Archived {n} defect row(s) to {self.root}")
+            except Exception as exc:   # keep the GUI alive; retry next interval
+                print(f"⚠️ Defect archive roll failed: {exc}")
+
+    def close(self):
+        """Stop the periodic roll (waits for one in progress)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {"rows_archived": self.rows_archived, "rows_purged": self.rows_purged,
+                "rolls": self.rolls}
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Process-wide DefectArchive, stopped cleanly at exit."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = DefectArchive()
+            atexit.register(_archive.close)
+        return _archive
+
+
+# --------------------------------------------------------------------
+if __name__ == "__main__":
+    # python -m utils.defect_archive roll
+    # python -m utils.defect_archive query [--sheet S ...] [--type T ...] [--days N] [--min-m X] [--max-m Y]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Defect archive: roll SQLite rows to Parquet or query them")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("roll")
+    q = sub.add_parser("query")
+    q.add_argument("--sheet", nargs="*")
+    q.add_argument("--type", nargs="*")
+    q.add_argument("--days", type=float, help="only the last N days")
+    q.add_argument("--min-m", type=float)
+    q.add_argument("--max-m", type=float)
+    args = parser.parse_args()
+
+    archive = DefectArchive()
+    if args.cmd == "roll":
+        print(f"🗄️ Archived {archive.roll()} defect row(s) to {archive.root}")
+    elif args.cmd == "query":
+        t0 = time.perf_counter()
+        start = datetime.now() - timedelta(days=args.days) if args.days else None
+        df = archive.query(sheets=args.sheet, defect_types=args.type, start=start,
+                           min_length=args.min_m, max_length=args.max_m, as_pandas=True)
+        print(df)
+        print(f"📊 {len(df)} defect(s) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    else:
+        parser.print_help()
+        sys.exit(0)
@@ -0,0 +1,236 @@
+# utils/defect_density.py
+
+import math
+import os
+import threading
+
+import numpy as np
+
+from config import (
+    REPORT_DIR, TRACK_MOTION_AXIS, DENSITY_BIN_M, DENSITY_WIDTH_BINS, DENSITY_WORST_N,
+)
+
+
+def across_position(box, shape, axis=TRACK_MOTION_AXIS):
+    """Box centre across the strip as a 0-1 fraction of the frame (0 = left/top edge)."""
+    x0, y0, x1, y1 = box[:4]
+    h, w = shape[:2]
+    if axis == "y":
+        return float(min(max((x0 + x1) / 2 / max(w, 1), 0.0), 1.0))
+    return float(min(max((y0 + y1) / 2 / max(h, 1), 0.0), 1.0))
+
+
+def _across_positions(data, axis=TRACK_MOTION_AXIS):
+    """Vectorised ``across_position`` over archive columns (NaN without geometry)."""
+    def col(name):
+        return np.asarray(data[name], dtype=np.float64)   # None → NaN
+
+    if axis == "y":
+        centre, size = (col("box_x1") + col("box_x2")) / 2, col("frame_w")
+    else:
+        centre, size = (col("box_y1") + col("box_y2")) / 2, col("frame_h")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.clip(centre / np.maximum(size, 1), 0.0, 1.0)
+
+
+def load_defects(sheet_id):
+    """``(length_m, width_pos, defect_type)`` arrays for a sheet.
+
+    Read from the report spool (which has the across-strip position); if a
+    sheet has no spool, they come from the defect archive, with ``width_pos``
+    derived from the stored box geometry (NaN for rows recorded without it).
+    """
+    from report_generator import _iter_spool
+
+    lengths, widths, types = [], [], []
+    for row in _iter_spool(sheet_id):
+        if row.get("length_m") in ("", None):
+            continue
+        lengths.append(float(row["length_m"]))
+        w = row.get("width_pos")
+        widths.append(float(w) if w not in ("", None) else math.nan)
+        types.append(row.get("defect_type") or "unknown")
+    if not lengths:
+        from utils.defect_archive import get_archive
+        data = get_archive().query(sheets=[sheet_id], columns=[
+            "length_meter", "defect_type", "box_x1", "box_y1", "box_x2", "box_y2",
+            "frame_w", "frame_h"])
+        lengths = data["length_meter"]
+        widths = _across_positions(data)
+        types = data["defect_type"]
+    return (np.asarray(lengths, dtype=np.float64), np.asarray(widths, dtype=np.float64),
+            np.asarray(types, dtype=object))
+
+
+class DefectDensity:
+    """Per-sheet defect histograms along (metres) and across (fraction) the strip.
+
+    ``counts[type]`` is a ``(length_bins, width_bins)`` array; ``total`` is
+    their sum. Defects without an across position are counted in
+    ``along[type]`` only.
+    """
+
+    def __init__(self, sheet_id, length_m, width_pos, defect_types,
+                 bin_m=DENSITY_BIN_M, width_bins=DENSITY_WIDTH_BINS, sheet_length_m=None):
+        self.sheet_id = sheet_id
+        self.bin_m = float(bin_m)
+        self.width_bins = int(width_bins)
+        top = sheet_length_m if sheet_length_m else (float(length_m.max()) if len(length_m) else 0.0)
+        n_bins = max(1, int(math.ceil(top / self.bin_m)))
+        self.sheet_length_m = max(top, 0.0)
+        self.length_edges = np.arange(n_bins + 1, dtype=np.float64) * self.bin_m
+        self.width_edges = np.linspace(0.0, 1.0, self.width_bins + 1)
+
+        self.types = sorted(set(defect_types.tolist()))
+        self.counts, self.along = {}, {}
+        has_width = ~np.isnan(width_pos)
+        for t in self.types:
+            sel = defect_types == t
+            self.along[t] = np.histogram(length_m[sel], bins=self.length_edges)[0]
+            both = sel & has_width
+            self.counts[t] = np.histogram2d(length_m[both], width_pos[both],
+                                            bins=(self.length_edges, self.width_edges))[0].astype(np.int64)
+        self.along_total = (sum(self.along.values()) if self.types
+                            else np.zeros(n_bins, dtype=np.int64))
+        self.total = (sum(self.counts.values()) if self.types
+                      else np.zeros((n_bins, self.width_bins), dtype=np.int64))
+        self.n_defects = int(len(length_m))
+
+    @property
+    def per_metre(self):
+        """Defects per metre over the whole sheet."""
+        return self.n_defects / self.sheet_length_m if self.sheet_length_m else 0.0
+
+    def segment_density(self):
+        """Defects per metre for each length bin."""
+        return self.along_total / self.bin_m
+
+    def worst_segments(self, n=DENSITY_WORST_N):
+        """``[(start_m, end_m, count, per_type)]`` for the ``n`` densest bins."""
+        order = np.argsort(-self.along_total, kind="stable")[:n]
+        out = []
+        for i in order:
+            if self.along_total[i] == 0:
+                break
+            per_type = {t: int(self.along[t][i]) for t in self.types if self.along[t][i]}
+            out.append((float(self.length_edges[i]), float(self.length_edges[i + 1]),
+                        int(self.along_total[i]), per_type))
+        return out
+
+    # ---------------- cache (.npz) ----------------
+    def save(self, path, key=""):
+        arrays = {"key": np.array(key), "length_edges": self.length_edges, "width_edges": self.width_edges,
+                  "types": np.asarray(self.types, dtype=str),
+                  "meta": np.array([self.sheet_length_m, self.n_defects], dtype=np.float64)}
+        for i, t in enumerate(self.types):
+            arrays[f"counts_{i}"] = self.counts[t]
+            arrays[f"along_{i}"] = self.along[t]
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, sheet_id, path, key=None):
+        """Density saved by ``save``; ``None`` if it was saved under another ``key``."""
+        data = np.load(path, allow_pickle=False)
+        if key is not None and str(data["key"]) != key:
+            return None
+        self = cls.__new__(cls)
+        self.sheet_id = sheet_id
+        self.length_edges = data["length_edges"]
+        self.width_edges = data["width_edges"]
+        self.bin_m = float(self.length_edges[1] - self.length_edges[0])
+        self.width_bins = len(self.width_edges) - 1
+        self.types = data["types"].tolist()
+        self.counts = {t: data[f"counts_{i}"] for i, t in enumerate(self.types)}
+        self.along = {t: data[f"along_{i}"] for i, t in enumerate(self.types)}
+        n_bins = len(self.length_edges) - 1
+        self.along_total = sum(self.along.values()) if self.types else np.zeros(n_bins, dtype=np.int64)
+        self.total = (sum(self.counts.values()) if self.types
+                      else np.zeros((n_bins, self.width_bins), dtype=np.int64))
+        self.sheet_length_m, n = data["meta"]
+        self.n_defects = int(n)
+        return self
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _source_key(sheet_id):
+    """Changes whenever the sheet's spool (or, without one, its archived rows) changes."""
+    from report_generator import spool_files
+
+    key = []
+    for path in spool_files(sheet_id):
+        st = os.stat(path)
+        key.append((os.path.basename(path), st.st_size, st.st_mtime_ns))
+    if not key:   # same fallback as load_defects
+        from utils.defect_archive import get_archive
+        return ("archive",) + get_archive().sheet_key(sheet_id)
+    return tuple(key)
+
+
+def sheet_density(sheet_id, bin_m=DENSITY_BIN_M, width_bins=DENSITY_WIDTH_BINS):
+    """Cached ``DefectDensity`` for a sheet.
+
+    Results are kept in memory and as ``<sheet>_density.npz`` next to the
+    report; both are reused until the spool (or, for archive-only sheets,
+    the sheet's archive partitions and live rows) changes, so repeated
+    report requests skip the aggregation entirely.
+    """
+    source = _source_key(sheet_id)
+    key = (sheet_id, float(bin_m), int(width_bins))
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == source:
+            return hit[1]
+
+    cache_path = os.path.join(REPORT_DIR, sheet_id, f"{sheet_id}_density.npz")
+    stamp = repr((source, float(bin_m), int(width_bins)))
+    density = None
+    if os.path.exists(cache_path):
+        density = DefectDensity.load(sheet_id, cache_path, key=stamp)
+    if density is None:
+        density = DefectDensity(sheet_id, *load_defects(sheet_id), bin_m=bin_m, width_bins=width_bins)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        density.save(cache_path, key=stamp)
+    with _cache_lock:
+        _cache[key] = (source, density)
+    return density
+
+
+def render_heatmap(density, path=None, cell_px=(24, 24), max_len_px=1600):
+    """Colour heat-map PNG of ``density.total`` (strip length runs left → right).
+
+    Cells are scaled with nearest-neighbour so each bin stays a crisp block;
+    long sheets are compressed (area-averaged) to ``max_len_px``. Returns the image (BGR),
+    and writes it when ``path`` is given.
+    """
+    import cv2
+
+    grid = density.total.T.astype(np.float32)          # (width_bins, length_bins)
+    if not np.any(grid) and np.any(density.along_total):  # no across positions: 1-row strip
+        grid = density.along_total[None, :].astype(np.float32)
+    peak = float(grid.max()) if grid.size else 0.0
+    scaled = np.zeros(grid.shape, np.uint8) if peak == 0 else (grid / peak * 255).astype(np.uint8)
+    colour = cv2.applyColorMap(scaled, cv2.COLORMAP_JET)
+    colour[grid == 0] = (40, 40, 40)
+
+    rows, cols = grid.shape
+    w = min(cols * cell_px[0], max_len_px) if cols else cell_px[0]
+    h = rows * cell_px[1]
+    interp = cv2.INTER_AREA if w < cols else cv2.INTER_NEAREST   # averaged when compressed
+    img = cv2.resize(colour, (max(w, 1), max(h, 1)), interpolation=interp)
+
+    margin = 28
+    canvas = np.full((h + 2 * margin, img.shape[1] + 20, 3), 255, np.uint8)
+    canvas[margin:margin + h, 10:10 + img.shape[1]] = img
+    cv2.putText(canvas, f"{density.sheet_id}: {density.n_defects} defects, "
+                f"{density.per_metre:.3f}/m, peak {int(peak)} per {density.bin_m:g} m cell",
+                (10, 19), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+    cv2.putText(canvas, "0 m", (10, h + margin + 19), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 1)
+    end = f"{density.length_edges[-1]:g} m"
+    cv2.putText(canvas, end, (canvas.shape[1] - 10 - 8 * len(end), h + margin + 19),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 1)
+    if path:
+        cv2.imwrite(path, canvas)
+    return canvas
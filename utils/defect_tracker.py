@@ -0,0 +1,158 @@
+# utils/defect_tracker.py
+
+import itertools
+import time
+
+import numpy as np
+
+from utils.helper import format_timestamp
+from config import (
+    TRACK_ENABLED, TRACK_IOU_THRESHOLD, TRACK_MAX_DISTANCE_PX,
+    TRACK_TTL_FRAMES, TRACK_PX_PER_M, TRACK_MOTION_AXIS,
+)
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class Track:
+    """One physical defect followed across frames."""
+
+    __slots__ = ("track_id", "defect_type", "box", "timestamp", "first_length_m",
+                 "last_length_m", "first_frame", "last_frame", "hits",
+                 "peak_conf", "best_box", "best_frame", "best_index", "t_epoch")
+
+    def __init__(self, track_id, defect_type, box, conf, frame, length_m, frame_index,
+                 capture_index=None):
+        self.track_id = track_id
+        self.defect_type = defect_type
+        self.box = box
+        self.timestamp = format_timestamp()
+        self.t_epoch = time.time()
+        self.first_length_m = self.last_length_m = length_m
+        self.first_frame = self.last_frame = frame_index
+        self.hits = 1
+        self.peak_conf = conf
+        self.best_box = box
+        self.best_frame = frame
+        self.best_index = capture_index   # camera frame number of best_frame
+
+    def update(self, box, conf, frame, length_m, frame_index, capture_index=None):
+        self.box = box
+        self.last_length_m = length_m
+        self.last_frame = frame_index
+        self.hits += 1
+        if conf > self.peak_conf:
+            self.peak_conf = conf
+            self.best_box = box
+            self.best_frame = frame
+            self.best_index = capture_index
+
+
+class DefectTracker:
+    """Associate per-frame detections into tracks and emit each defect once.
+
+    Detections are matched to live tracks of the same class by IoU, falling
+    back to centroid distance for small or fast-moving boxes. If
+    ``px_per_m`` is set, each track's box is shifted along ``motion_axis`` by
+    the strip travel since it was last seen before matching. A track that
+    has not been matched for ``ttl_frames`` frames is finished and returned
+    from ``update``; ``flush`` finishes the rest at end of run.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, max_distance_px=TRACK_MAX_DISTANCE_PX,
+                 ttl_frames=TRACK_TTL_FRAMES, px_per_m=TRACK_PX_PER_M,
+                 motion_axis=TRACK_MOTION_AXIS, enabled=TRACK_ENABLED):
+        self.iou_threshold = iou_threshold
+        self.max_distance_px = max_distance_px
+        self.ttl_frames = ttl_frames
+        self.px_per_m = px_per_m
+        self.motion_axis = 1 if motion_axis == "y" else 0
+        self.enabled = enabled
+        self.tracks: list[Track] = []
+        self._ids = itertools.count(1)
+        self.detections = 0
+        self.emitted = 0
+
+    def _predicted_boxes(self, length_m):
+        boxes = np.array([t.box for t in self.tracks], dtype=np.float32).reshape(-1, 4)
+        if self.px_per_m and len(boxes):
+            travel = np.array([(length_m - t.last_length_m) * self.px_per_m for t in self.tracks],
+                              dtype=np.float32)
+            boxes[:, self.motion_axis] += travel
+            boxes[:, self.motion_axis + 2] += travel
+        return boxes
+
+    def update(self, detections, frame, length_m, frame_index, capture_index=None):
+        """Feed one frame of ``(box_xyxy, conf, defect_type)`` detections.
+
+        ``frame_index`` counts inspected frames (it drives the TTL);
+        ``capture_index`` is the camera's frame number, kept for the best hit.
+        Returns the list of tracks that finished on this frame.
+        """
+        self.detections += len(detections)
+        if not self.enabled:
+            done = [Track(next(self._ids), cls, box, conf, frame, length_m, frame_index,
+                          capture_index)
+                    for box, conf, cls in detections]
+            self.emitted += len(done)
+            return done
+
+        unmatched = list(range(len(detections)))
+        if self.tracks and detections:
+            det_boxes = np.array([d[0] for d in detections], dtype=np.float32)
+            trk_boxes = self._predicted_boxes(length_m)
+            iou = iou_matrix(trk_boxes, det_boxes)
+            det_c = (det_boxes[:, :2] + det_boxes[:, 2:]) / 2
+            trk_c = (trk_boxes[:, :2] + trk_boxes[:, 2:]) / 2
+            dist = np.linalg.norm(trk_c[:, None, :] - det_c[None, :, :], axis=2)
+
+            same_cls = np.array([[t.defect_type == d[2] for d in detections] for t in self.tracks])
+            ok = same_cls & ((iou >= self.iou_threshold) | (dist <= self.max_distance_px))
+            # Greedy assignment: best IoU first, then nearest centroid
+            score = np.where(ok, iou - dist * 1e-6, -np.inf)
+            used_t, used_d = set(), set()
+            for flat in np.argsort(-score, axis=None):
+                ti, di = divmod(int(flat), score.shape[1])
+                if not np.isfinite(score[ti, di]):
+                    break
+                if ti in used_t or di in used_d:
+                    continue
+                box, conf, _cls = detections[di]
+                self.tracks[ti].update(box, conf, frame, length_m, frame_index, capture_index)
+                used_t.add(ti)
+                used_d.add(di)
+            unmatched = [i for i in unmatched if i not in used_d]
+
+        for di in unmatched:
+            box, conf, cls = detections[di]
+            self.tracks.append(Track(next(self._ids), cls, box, conf, frame, length_m, frame_index,
+                          capture_index))
+
+        finished = [t for t in self.tracks if frame_index - t.last_frame > self.ttl_frames]
+        if finished:
+            self.tracks = [t for t in self.tracks if frame_index - t.last_frame <= self.ttl_frames]
+            self.emitted += len(finished)
+        return finished
+
+    def flush(self):
+        """Finish and return every live track."""
+        done, self.tracks = self.tracks, []
+        self.emitted += len(done)
+        return done
+
+    def stats(self):
+        return {"detections": self.detections, "emitted": self.emitted,
+                "active": len(self.tracks)}
@@ -0,0 +1,76 @@
+# utils/detections.py
+
+import numpy as np
+
+from utils.defect_tracker import iou_matrix
+from utils.helper import draw_boxes
+
+
+class Boxes:
+    """NumPy stand-in for ``ultralytics`` Boxes: ``xyxy`` (N, 4), ``conf`` (N,), ``cls`` (N,)."""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.asarray(cls, dtype=np.float32).reshape(-1)
+
+    def __len__(self):
+        return len(self.conf)
+
+
+class DetectionResult:
+    """Detections in full-frame coordinates, shaped like an ultralytics ``Results``.
+
+    Produced by the tiled and ROI inference paths so the rest of the
+    pipeline (tracking, preview) does not care how the boxes were found.
+    """
+
+    def __init__(self, orig_img, boxes, names):
+        self.orig_img = orig_img
+        self.boxes = boxes
+        self.names = names
+
+    def plot(self):
+        return draw_boxes(self.orig_img.copy(), self)
+
+
+def result_arrays(result, offset=(0, 0)):
+    """``(xyxy, conf, cls)`` NumPy arrays for any result, shifted by ``offset`` (x, y)."""
+    boxes = result.boxes
+    xyxy = np.asarray(boxes.xyxy.tolist(), dtype=np.float32).reshape(-1, 4)
+    conf = np.asarray(boxes.conf.tolist(), dtype=np.float32).reshape(-1)
+    cls = np.asarray(boxes.cls.tolist(), dtype=np.float32).reshape(-1)
+    if offset != (0, 0) and len(xyxy):
+        xyxy += np.array([offset[0], offset[1], offset[0], offset[1]], dtype=np.float32)
+    return xyxy, conf, cls
+
+
+def nms(xyxy, conf, cls, iou_thr=0.5, ios_thr=0.0):
+    """Class-aware greedy NMS; returns kept indices (highest confidence first).
+
+    With ``ios_thr`` > 0 a box is also suppressed when that fraction of the
+    smaller box lies inside a kept one — this merges halves of a defect
+    that was cut by a tile border.
+    """
+    if not len(conf):
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(-conf)
+    xyxy, cls = xyxy[order], cls[order]
+    iou = iou_matrix(xyxy, xyxy)
+    suppress = iou >= iou_thr
+    if ios_thr > 0:
+        area = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+        union = area[:, None] + area[None, :]
+        inter = iou * union / (1.0 + iou)
+        ios = inter / np.maximum(np.minimum(area[:, None], area[None, :]), 1e-9)
+        suppress |= ios >= ios_thr
+    suppress &= cls[:, None] == cls[None, :]
+
+    keep = []
+    removed = np.zeros(len(order), dtype=bool)
+    for i in range(len(order)):
+        if removed[i]:
+            continue
+        keep.append(i)
+        removed |= suppress[i]
+    return order[keep]
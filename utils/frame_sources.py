@@ -0,0 +1,232 @@
+# utils/frame_sources.py
+
+import glob
+import os
+import time
+from urllib.parse import parse_qsl
+
+import cv2
+import numpy as np
+
+from config import SOURCE_DEFAULT_FPS, SOURCE_LOOP, SYNTHETIC_DEFECT_RATE, SYNTHETIC_SEED
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+SOURCE_KINDS = ("synthetic", "folder", "video")
+
+
+class ReplaySource:
+    """Base for ``cv2.VideoCapture``-compatible replay sources.
+
+    ``read()`` paces frames to ``fps`` like a real camera (``fps=0`` = as
+    fast as the consumer reads) and returns ``(False, None)`` once
+    ``frames`` frames were produced or a non-looping input ends. ``set()``
+    understands the properties ``Camera`` requests; an explicit ``fps`` in
+    the device spec wins over ``CAP_PROP_FPS``.
+    """
+
+    def __init__(self, fps=None, frames=0, loop=SOURCE_LOOP):
+        self._fps_fixed = fps is not None
+        self.fps = float(fps) if fps is not None else SOURCE_DEFAULT_FPS
+        self.limit = int(frames)
+        self.loop = bool(loop)
+        self.produced = 0
+        self._next_t = None
+        self._opened = True
+        self.exhausted = False   # end of input reached (not a read error)
+
+    def isOpened(self):
+        return self._opened
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FPS and value and not self._fps_fixed:
+            self.fps = float(value)
+            return True
+        return False
+
+    def get(self, prop):
+        return self.fps if prop == cv2.CAP_PROP_FPS else 0.0
+
+    def release(self):
+        self._opened = False
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        if self.limit and self.produced >= self.limit:
+            self.exhausted = True
+            return False, None
+        if self.fps > 0:
+            now = time.perf_counter()
+            if self._next_t is None:
+                self._next_t = now
+            elif now < self._next_t:
+                time.sleep(self._next_t - now)
+            # never "catch up" with a burst after a stall: a camera just skips
+            self._next_t = max(self._next_t, time.perf_counter() - 1.0 / self.fps) + 1.0 / self.fps
+        image = self._next_image()
+        if image is None:
+            self.exhausted = True
+            return False, None
+        self.produced += 1
+        return True, image
+
+    def _next_image(self):
+        raise NotImplementedError
+
+
+class VideoFileSource(ReplaySource):
+    """Recorded footage replayed at its own frame rate (or ``fps``)."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._cap = cv2.VideoCapture(path)
+        self._opened = self._cap.isOpened()
+        native = self._cap.get(cv2.CAP_PROP_FPS) if self._opened else 0
+        if native > 0 and not self._fps_fixed:
+            self.fps = native
+            self._fps_fixed = True   # footage plays at its recorded rate
+
+    def _next_image(self):
+        ok, image = self._cap.read()
+        if not ok and self.loop and self.produced:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, image = self._cap.read()
+        return image if ok else None
+
+    def release(self):
+        super().release()
+        self._cap.release()
+
+
+class FolderSource(ReplaySource):
+    """Images of a folder (e.g. ``data_collection/collected``) in name order.
+
+    With ``cache=1`` decoded images are kept, so looping replays measure the
+    pipeline rather than JPEG decoding.
+    """
+
+    def __init__(self, path, cache=False, **kwargs):
+        super().__init__(**kwargs)
+        if os.path.isfile(path):
+            self.paths = [path]
+        else:
+            self.paths = sorted(p for p in glob.glob(os.path.join(path, "**", "*"), recursive=True)
+                                if p.lower().endswith(IMAGE_EXTS))
+        self._opened = bool(self.paths)
+        self._cache = {} if cache else None
+        self._pos = 0
+
+    def _next_image(self):
+        for _ in range(len(self.paths)):
+            if self._pos >= len(self.paths):
+                if not self.loop:
+                    return None
+                self._pos = 0
+            i, self._pos = self._pos, self._pos + 1
+            image = self._cache.get(i) if self._cache is not None else None
+            if image is None:
+                image = cv2.imread(self.paths[i])
+                if image is None:
+                    continue   # unreadable file: skip it
+                if self._cache is not None:
+                    self._cache[i] = image
+            return image
+        return None
+
+
+class SyntheticSource(ReplaySource):
+    """Moving brushed-steel strip with randomly injected scratches and spots.
+
+    Deterministic for a given ``seed``; ``injected`` counts the defects
+    drawn, as ground truth for benchmarks.
+    """
+
+    def __init__(self, width=1280, height=720, defects=SYNTHETIC_DEFECT_RATE, seed=SYNTHETIC_SEED,
+                 speed_px=12, **kwargs):
+        super().__init__(**kwargs)
+        self.width, self.height = int(width), int(height)
+        self.defect_rate = float(defects)
+        self.speed_px = int(speed_px)
+        self._rng = np.random.default_rng(seed)
+        self._texture = None
+        self._offset = 0
+        self.injected = 0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH and value:
+            self.width, self._texture = int(value), None
+            return True
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT and value:
+            self.height, self._texture = int(value), None
+            return True
+        return super().set(prop, value)
+
+    def _make_texture(self):
+        noise = self._rng.normal(150, 18, (self.height * 2, self.width)).astype(np.float32)
+        streaks = cv2.blur(noise, (61, 1))   # rolling direction is across the frame
+        gray = np.clip(streaks, 0, 255).astype(np.uint8)
+        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+    def _next_image(self):
+        if self._texture is None:
+            self._texture = self._make_texture()
+        rows = self._texture.shape[0]
+        self._offset = (self._offset + self.speed_px) % (rows - self.height)
+        image = self._texture[self._offset:self._offset + self.height].copy()
+        if self._rng.random() < self.defect_rate:
+            self._inject(image)
+        return image
+
+    def _inject(self, image):
+        rng = self._rng
+        x, y = int(rng.integers(0, self.width)), int(rng.integers(0, self.height))
+        if rng.random() < 0.5:
+            length = int(rng.integers(40, max(41, self.width // 4)))
+            angle = rng.uniform(-0.3, 0.3)
+            x2, y2 = int(x + length * np.cos(angle)), int(y + length * np.sin(angle))
+            cv2.line(image, (x, y), (x2, y2), (40, 40, 40), int(rng.integers(2, 5)), cv2.LINE_AA)
+        else:
+            axes = (int(rng.integers(6, 30)), int(rng.integers(6, 30)))
+            cv2.ellipse(image, (x, y), axes, float(rng.uniform(0, 180)), 0, 360, (60, 55, 50), -1)
+        self.injected += 1
+
+
+def _parse_spec(device):
+    """``"kind:path?key=value&…"`` → (kind, path, options); kind is None for plain devices."""
+    spec, _, query = str(device).partition("?")
+    options = {}
+    for key, value in parse_qsl(query):
+        try:
+            options[key] = float(value) if "." in value else int(value)
+        except ValueError:
+            options[key] = value
+    kind, sep, path = spec.partition(":")
+    if kind in SOURCE_KINDS and (sep or kind == "synthetic"):
+        return kind, path, options
+    if os.path.isdir(spec):
+        return "folder", spec, options
+    if os.path.isfile(spec):
+        return ("folder" if spec.lower().endswith(IMAGE_EXTS) else "video"), spec, options
+    return None, None, options
+
+
+def open_source(device):
+    """Capture object for ``device``.
+
+    Integers and URLs open a real device with ``cv2.VideoCapture``; replay
+    sources are given as ``synthetic``, ``folder:<dir>``, ``video:<file>``
+    (or a bare existing path), optionally with options such as
+    ``synthetic?fps=30&frames=3000&defects=0.05`` or
+    ``folder:data_collection/collected?loop=1&cache=1``.
+    """
+    if isinstance(device, int):
+        return cv2.VideoCapture(device)
+    kind, path, options = _parse_spec(device)
+    if kind == "synthetic":
+        return SyntheticSource(**options)
+    if kind == "folder":
+        return FolderSource(path, **options)
+    if kind == "video":
+        return VideoFileSource(path, **options)
+    return cv2.VideoCapture(int(device) if str(device).isdigit() else device)
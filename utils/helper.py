@@ -8,12 +8,49 @@ def format_timestamp():
     """Return current timestamp in HH:MM:SS format."""
     return datetime.now().strftime("%H:%M:%S")
 
-def generate_defect_filename(sheet_id, defect_type):
-    """Generate a unique image filename for a defect."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    return f"{sheet_id}_{defect_type}_{timestamp}.jpg"
+def generate_defect_filename(sheet_id, defect_type, ext=".jpg"):
+    """Generate a unique image filename for a defect (millisecond resolution)."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+    return f"{sheet_id}_{defect_type}_{timestamp}{ext}"
+
+_created_dirs = set()
 
 def save_image(frame, path):
     """Save the current frame to disk."""
-    os.makedirs(os.path.dirname(path), exist_ok=True)
+    folder = os.path.dirname(path)
+    if folder not in _created_dirs:
+        os.makedirs(folder, exist_ok=True)
+        _created_dirs.add(folder)
     cv2.imwrite(path, frame)
+
+
+def draw_boxes(img, result, scale=1.0):
+    """Draw ``result``'s boxes (scaled by ``scale``) onto ``img`` in place."""
+    for xyxy, cls_id, conf in zip(result.boxes.xyxy.tolist(), result.boxes.cls.tolist(),
+                                  result.boxes.conf.tolist()):
+        x1, y1, x2, y2 = (int(v * scale) for v in xyxy)
+        cv2.rectangle(img, (x1, y1), (x2, y2), (0, 0, 255), 1 if scale < 1.0 else 2)
+        cv2.putText(img, f"{result.names[int(cls_id)]} {conf:.2f}", (x1, max(10, y1 - 3)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4 if scale < 1.0 else 0.6, (0, 0, 255), 1)
+    return img
+
+
+def render_preview(result, length_m=None, scale=1.0):
+    """Draw boxes for a YOLO result; with scale < 1 the frame is shrunk first.
+
+    The downscaled path draws plain rectangles on the small image, which is
+    far cheaper than ``result.plot()`` on the full-resolution frame.
+    """
+    if scale >= 1.0:
+        annotated = result.plot()
+    else:
+        h, w = result.orig_img.shape[:2]
+        annotated = cv2.resize(result.orig_img, (max(1, int(w * scale)), max(1, int(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        draw_boxes(annotated, result, scale)
+    if length_m is not None:
+        cv2.putText(
+            annotated, f"Length: {length_m:.2f} m",
+            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1 if scale >= 1.0 else 0.6, (0, 255, 0), 2
+        )
+    return annotated
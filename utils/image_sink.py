@@ -0,0 +1,125 @@
+# utils/image_sink.py
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from config import (
+    IMAGE_FORMAT, IMAGE_QUALITY, IMAGE_WRITER_THREADS,
+    IMAGE_QUEUE_SIZE, IMAGE_BLOCK_WHEN_FULL, CROP_PADDING,
+)
+
+_ENCODE_PARAMS = {
+    "jpg": lambda q: [cv2.IMWRITE_JPEG_QUALITY, int(q)],
+    "webp": lambda q: [cv2.IMWRITE_WEBP_QUALITY, int(q)],
+    # PNG is lossless; map quality 0-100 onto compression level 9-0
+    "png": lambda q: [cv2.IMWRITE_PNG_COMPRESSION, max(0, min(9, 9 - int(q) // 11))],
+}
+
+
+def pad_box(box, shape, padding=CROP_PADDING):
+    """Clamp an (x1, y1, x2, y2) box grown by ``padding`` px to the frame."""
+    h, w = shape[:2]
+    x1, y1, x2, y2 = (int(v) for v in box)
+    return (max(0, x1 - padding), max(0, y1 - padding),
+            min(w, x2 + padding), min(h, y2 + padding))
+
+
+class ImageSink:
+    """Asynchronous defect-image writer backed by a thread pool.
+
+    Each submitted image is encoded exactly once (full frame, or one padded
+    crop per box) and written with a plain file write. At most
+    ``max_pending`` jobs are in flight; when full, ``submit`` either blocks
+    (back-pressure) or drops the job and counts it.
+    """
+
+    def __init__(self, workers=IMAGE_WRITER_THREADS, fmt=IMAGE_FORMAT, quality=IMAGE_QUALITY,
+                 max_pending=IMAGE_QUEUE_SIZE, block=IMAGE_BLOCK_WHEN_FULL, observe=None):
+        fmt = fmt.lower().lstrip(".").replace("jpeg", "jpg")
+        if fmt not in _ENCODE_PARAMS:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        self.ext = "." + fmt
+        self.params = _ENCODE_PARAMS[fmt](quality)
+        self.block = block
+        self.observe = observe   # optional callable(seconds) per encoded + written image
+        self._slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)),
+                                        thread_name_prefix="image-sink")
+        self._dirs = set()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.bytes_written = 0
+
+    # ----------------------------------------------------------------
+    def submit(self, frame, path):
+        """Write the whole ``frame`` to ``path``; returns False if dropped."""
+        return self._submit(self._write, frame, path)
+
+    def submit_crops(self, frame, crops, padding=CROP_PADDING):
+        """Write one padded crop per ``(box, path)`` in ``crops``."""
+        jobs = []
+        for box, path in crops:
+            x1, y1, x2, y2 = pad_box(box, frame.shape, padding)
+            jobs.append((frame[y1:y2, x1:x2], path))
+        return self._submit(self._write_many, jobs)
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            self.submitted += 1
+        if not self._slots.acquire(blocking=self.block):
+            with self._lock:
+                self.dropped += 1
+            return False
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda _f: self._slots.release())
+        return True
+
+    # ----------------------------------------------------------------
+    def _ensure_dir(self, path):
+        folder = os.path.dirname(path)
+        if folder and folder not in self._dirs:
+            os.makedirs(folder, exist_ok=True)
+            self._dirs.add(folder)
+
+    def _write(self, image, path):
+        t0 = time.perf_counter()
+        try:
+            ok, buf = cv2.imencode(self.ext, image, self.params)
+            if not ok:
+                raise ValueError("encode failed")
+            self._ensure_dir(path)
+            with open(path, "wb") as f:
+                f.write(buf)
+        except Exception as exc:
+            with self._lock:
+                self.errors += 1
+            print(f"⚠️ Image write failed ({path}): {exc}")
+            return
+        with self._lock:
+            self.written += 1
+            self.bytes_written += len(buf)
+        if self.observe is not None:
+            self.observe(time.perf_counter() - t0)
+
+    def _write_many(self, jobs):
+        for image, path in jobs:
+            if image.size:
+                self._write(image, path)
+
+    # ----------------------------------------------------------------
+    def close(self):
+        """Wait for pending writes and release the worker threads."""
+        self._pool.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {"submitted": self.submitted, "written": self.written,
+                    "dropped": self.dropped, "errors": self.errors,
+                    "mb": round(self.bytes_written / 1e6, 1)}
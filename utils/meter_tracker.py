@@ -1,19 +1,202 @@
+import bisect
+import threading
 import time
 
+NS_PER_S = 1_000_000_000
+
+
+# --------------------------------------------------------------------
+# Speed sources: each maps elapsed seconds since start → metres travelled.
+class ConstantSpeed:
+    """Fixed line speed."""
+
+    def __init__(self, speed_m_per_sec):
+        self.speed = float(speed_m_per_sec)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def position(self, elapsed_s):
+        return self.speed * elapsed_s
+
+
+class SpeedProfile:
+    """Piecewise-linear speed profile loaded from a ``t_s,speed_mps`` CSV.
+
+    Breakpoint positions are integrated once up front; lookups use a cursor
+    that only moves forward for monotonic queries (amortised O(1)) and fall
+    back to bisection for out-of-order ones. The last speed is held after
+    the final breakpoint.
+    """
+
+    def __init__(self, points):
+        points = sorted((float(t), float(v)) for t, v in points)
+        if not points:
+            raise ValueError("Speed profile is empty")
+        if points[0][0] > 0.0:
+            points.insert(0, (0.0, points[0][1]))
+        self.times = [t for t, _ in points]
+        self.speeds = [v for _, v in points]
+        self.positions = [0.0]
+        for i in range(1, len(points)):
+            dt = self.times[i] - self.times[i - 1]
+            self.positions.append(self.positions[-1] + 0.5 * (self.speeds[i] + self.speeds[i - 1]) * dt)
+        self._cursor = 0
+
+    @classmethod
+    def from_file(cls, path):
+        points = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    t, v = line.split(",")[:2]
+                    points.append((float(t), float(v)))
+                except ValueError:
+                    continue  # header row
+        return cls(points)
+
+    def start(self):
+        self._cursor = 0
+
+    def stop(self):
+        pass
+
+    def position(self, elapsed_s):
+        i = self._cursor
+        n = len(self.times)
+        if elapsed_s < self.times[i]:
+            i = max(0, bisect.bisect_right(self.times, elapsed_s) - 1)
+        while i + 1 < n and self.times[i + 1] <= elapsed_s:
+            i += 1
+        self._cursor = i
+
+        dt = elapsed_s - self.times[i]
+        if i + 1 == n:
+            return self.positions[i] + self.speeds[i] * dt
+        accel = (self.speeds[i + 1] - self.speeds[i]) / (self.times[i + 1] - self.times[i])
+        return self.positions[i] + self.speeds[i] * dt + 0.5 * accel * dt * dt
+
+
+class EncoderSpeed:
+    """Position from an incremental encoder pulse count.
+
+    ``feed(pulses)`` is called by the encoder reader with new pulses; the
+    position between pulses is extrapolated from the last measured speed.
+    With ``simulate_speed`` set, a background thread generates the pulse
+    feed itself (for testing without hardware).
+    """
+
+    def __init__(self, pulses_per_m, simulate_speed=None, simulate_hz=1000):
+        self.pulses_per_m = float(pulses_per_m)
+        self.simulate_speed = simulate_speed
+        self.simulate_hz = simulate_hz
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self._reset()
+
+    def _reset(self):
+        self.start_ns = time.monotonic_ns()
+        self.pulses = 0
+        self.last_ns = self.start_ns
+        self.speed = 0.0
+
+    def feed(self, pulses, t_ns=None):
+        t_ns = t_ns if t_ns is not None else time.monotonic_ns()
+        with self._lock:
+            dt = (t_ns - self.last_ns) / NS_PER_S
+            if dt > 0:
+                self.speed = pulses / self.pulses_per_m / dt
+            self.pulses += pulses
+            self.last_ns = t_ns
+
+    def start(self):
+        with self._lock:
+            self._reset()
+        if self.simulate_speed and not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._simulate, name="encoder-sim", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _simulate(self):
+        period = 1.0 / self.simulate_hz
+        owed = 0.0
+        last = time.monotonic_ns()
+        while self._running:
+            time.sleep(period)
+            now = time.monotonic_ns()
+            owed += self.simulate_speed * self.pulses_per_m * (now - last) / NS_PER_S
+            last = now
+            whole = int(owed)
+            if whole:
+                owed -= whole
+                self.feed(whole, now)
+
+    def position(self, elapsed_s):
+        t_ns = self.start_ns + int(elapsed_s * NS_PER_S)
+        with self._lock:
+            base = self.pulses / self.pulses_per_m
+            return base + self.speed * max(0.0, (t_ns - self.last_ns) / NS_PER_S)
+
+
+# --------------------------------------------------------------------
 class MeterTracker:
-    def __init__(self, sheet_number, speed_m_per_sec=50.0):
+    """Strip position along the coil, based on ``time.monotonic_ns``.
+
+    Frames should be stamped with ``stamp()`` when they are captured, so the
+    recorded position does not depend on how long inference takes.
+    """
+
+    def __init__(self, sheet_number, speed_m_per_sec=50.0, speed_source=None, offset_m=0.0):
         self.sheet_number = sheet_number
-        self.speed = speed_m_per_sec  # meters per second
-        self.start_time = None
+        self.speed = speed_m_per_sec  # meters per second (constant source)
+        self.source = speed_source if speed_source is not None else ConstantSpeed(speed_m_per_sec)
+        self.offset_m = offset_m      # position already covered before start()
+        self.start_ns = None
 
     def start(self):
-        self.start_time = time.time()
+        self.source.start()
+        self.start_ns = time.monotonic_ns()
 
     def stop(self):
-        self.start_time = None
+        self.source.stop()
+        self.start_ns = None
 
-    def get_length(self):
-        if self.start_time is None:
+    def length_at(self, t_ns):
+        """Metres travelled at monotonic time ``t_ns`` (not rounded)."""
+        start_ns = self.start_ns
+        if start_ns is None:
             return 0.0
-        elapsed_time = time.time() - self.start_time
-        return round(self.speed * elapsed_time, 2)  # meters rounded to 2 decimals
\ No newline at end of file
+        return self.offset_m + self.source.position(max(0, t_ns - start_ns) / NS_PER_S)
+
+    def stamp(self):
+        """Return ``(t_ns, length_m)`` for a frame captured right now."""
+        t_ns = time.monotonic_ns()
+        return t_ns, self.length_at(t_ns)
+
+    def get_length(self):
+        return round(self.length_at(time.monotonic_ns()), 2)  # meters rounded to 2 decimals
+
+
+def make_speed_source(kind, speed_m_per_sec, profile_path=None, pulses_per_m=None,
+                      simulate=False):
+    """Build a speed source from config values ("constant", "profile", "encoder")."""
+    if kind == "profile":
+        return SpeedProfile.from_file(profile_path)
+    if kind == "encoder":
+        return EncoderSpeed(pulses_per_m, simulate_speed=speed_m_per_sec if simulate else None)
+    if kind == "constant":
+        return ConstantSpeed(speed_m_per_sec)
+    raise ValueError(f"Unknown speed source: {kind}")
@@ -0,0 +1,359 @@
+# utils/metrics.py
+
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from config import (
+    METRICS_ENABLED, METRICS_HOST, METRICS_PORT, METRICS_WINDOW, PROFILE_DIR, PROFILE_SECONDS,
+    PROFILE_MAX_SECONDS,
+)
+
+PREFIX = "steel"
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Histogram:
+    """Prometheus-style cumulative buckets plus the last ``window`` samples for percentiles."""
+
+    __slots__ = ("counts", "count", "sum", "recent")
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def percentiles(self, qs=(50, 95, 99)):
+        samples = sorted(self.recent)
+        if not samples:
+            return {}
+        last = len(samples) - 1
+        return {f"p{q}_ms": round(1000 * samples[min(last, int(round(q / 100 * last)))], 2)
+                for q in qs}
+
+
+class Metrics:
+    """Process-wide stage timings, counters and sampled gauges.
+
+    ``observe(stage, seconds, **labels)`` and ``inc(name, n, **labels)`` are
+    cheap enough for the per-batch hot path (one lock, no allocation beyond
+    the label key). Gauges are callables sampled only when the metrics are
+    read, e.g. queue depths. Everything is readable as Prometheus text or a
+    JSON snapshot; ``enabled=False`` turns recording into a no-op.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED, window=METRICS_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self._lock = threading.Lock()
+        self._hists = {}
+        self._counters = {}
+        self._gauges = {}
+        self._profilers = []
+
+    # ---------------------------------------------------------------- recording
+    def observe(self, stage, seconds, **labels):
+        if not self.enabled:
+            return
+        key = _key(stage, labels)
+        with self._lock:
+            hist = self._hists.get(key)
+            if hist is None:
+                hist = self._hists[key] = Histogram(self.window)
+            hist.observe(seconds)
+
+    def inc(self, name, n=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def add_gauge(self, name, fn, kind="gauge", **labels):
+        """Register ``fn()`` sampled at read time; ``kind="counter"`` for cumulative values."""
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = (fn, kind)
+        return key
+
+    def remove_gauges(self, keys):
+        with self._lock:
+            for key in keys:
+                self._gauges.pop(key, None)
+
+    # ---------------------------------------------------------------- profiling
+    def add_profiler(self, profiler):
+        with self._lock:
+            self._profilers.append(profiler)
+        return profiler
+
+    def remove_profiler(self, profiler):
+        with self._lock:
+            if profiler in self._profilers:
+                self._profilers.remove(profiler)
+
+    def request_profile(self, seconds=PROFILE_SECONDS):
+        """Ask every registered loop for a cProfile window; returns how many."""
+        with self._lock:
+            profilers = list(self._profilers)
+        for profiler in profilers:
+            profiler.request(seconds)
+        return len(profilers)
+
+    # ---------------------------------------------------------------- reading
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def stage_percentiles(self, **labels):
+        """``{stage: {"p50_ms": …, "p95_ms": …}}`` for the stages carrying ``labels``."""
+        want = set(_key("", labels)[1])
+        with self._lock:
+            items = [(name, hist.percentiles((50, 95))) for (name, lbl), hist in self._hists.items()
+                     if want <= set(lbl)]
+        return dict(items)
+
+    def _sample_gauges(self):
+        with self._lock:
+            gauges = list(self._gauges.items())
+        samples = []
+        for key, (fn, kind) in gauges:
+            try:
+                samples.append((key, kind, fn()))
+            except Exception:
+                continue   # a gauge of a run that is shutting down
+        return samples
+
+    def snapshot(self):
+        with self._lock:
+            hists = {f"{n}{_fmt_labels(l)}": {"count": h.count, "sum_s": round(h.sum, 4),
+                                              **h.percentiles()}
+                     for (n, l), h in self._hists.items()}
+            counters = {f"{n}{_fmt_labels(l)}": v for (n, l), v in self._counters.items()}
+        gauges = {f"{n}{_fmt_labels(l)}": v for (n, l), _kind, v in self._sample_gauges()}
+        return {"stages": hists, "counters": counters, "gauges": gauges}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            hists = [(n, l, list(h.counts), h.count, h.sum) for (n, l), h in self._hists.items()]
+            counters = list(self._counters.items())
+        if hists:
+            name = f"{PREFIX}_stage_seconds"
+            lines += [f"# HELP {name} Time spent per pipeline stage.", f"# TYPE {name} histogram"]
+            for stage, labels, counts, count, total in sorted(hists):
+                labels = (("stage", stage),) + labels
+                cumulative = 0
+                for le, c in zip(BUCKETS + ("+Inf",), counts):
+                    cumulative += c
+                    lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+        typed = set()
+        for (n, labels), value in sorted(counters):
+            name = f"{PREFIX}_{n}_total"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_fmt_labels(labels)} {value}")
+        for (n, labels), kind, value in sorted(self._sample_gauges(), key=lambda s: s[0]):
+            name = f"{PREFIX}_{n}" + ("_total" if kind == "counter" else "")
+            if name not in typed:
+                lines.append(f"# TYPE {name} {kind}")
+                typed.add(name)
+            lines.append(f"{name}{_fmt_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class PeriodicLog:
+    """Prints one summary line for a labelled loop every ``interval_s`` (0 = never).
+
+    ``maybe_log()`` is called from the loop itself, so it costs one clock
+    read per iteration and needs no thread.
+    """
+
+    def __init__(self, metrics, interval_s, stages=("queue", "infer", "parse", "latency"), **labels):
+        self.metrics = metrics
+        self.interval_s = interval_s
+        self.stages = stages
+        self.labels = labels
+        self._next = time.monotonic() + interval_s
+        self._last_frames = 0
+        self._last_t = time.monotonic()
+
+    def maybe_log(self):
+        if not self.interval_s:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            return
+        self._next = now + self.interval_s
+        frames = self.metrics.counter("frames", **self.labels)
+        fps = (frames - self._last_frames) / (now - self._last_t)
+        self._last_frames, self._last_t = frames, now
+        pct = self.metrics.stage_percentiles(**self.labels)
+        parts = [f"fps={fps:.1f}", f"defects={self.metrics.counter('defects', **self.labels)}"]
+        parts += [f"{stage}={pct[stage]['p50_ms']}/{pct[stage]['p95_ms']}ms"
+                  for stage in self.stages if pct.get(stage)]
+        tag = "".join(f" [{v}]" for v in self.labels.values() if v is not None)
+        print(f"📈{tag} " + "  ".join(parts) + "  (p50/p95)")
+
+
+class ProfileWindow:
+    """cProfile capture over a bounded window of the loop that calls ``poll()``.
+
+    cProfile only sees the thread it is enabled on, so the detection loop
+    polls once per iteration (two attribute reads while idle); a request
+    from any thread (HTTP ``/profile``, CLI) starts the window on the next
+    iteration. The ``.prof`` file opens in snakeviz / ``python -m pstats``.
+    """
+
+    def __init__(self, name="live", out_dir=PROFILE_DIR, top=20):
+        self.name = name
+        self.out_dir = out_dir
+        self.top = top
+        self._requested = None
+        self._profile = None
+        self._until = 0.0
+
+    def request(self, seconds=PROFILE_SECONDS):
+        self._requested = float(seconds)
+
+    def poll(self):
+        if self._requested is None and self._profile is None:
+            return
+        now = time.monotonic()
+        if self._profile is None:
+            seconds, self._requested = self._requested, None
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as exc:   # another profiler already active
+                print(f"⚠️ Profiling unavailable: {exc}")
+                return
+            self._profile, self._until = profile, now + seconds
+            print(f"🔬 Profiling {self.name} for {seconds:.0f}s…")
+        elif now >= self._until:
+            self.stop()
+
+    def stop(self):
+        """End an active window: dump the ``.prof`` file and print the top entries."""
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return None
+        profile.disable()
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"{self.name}_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+        profile.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+        print(out.getvalue())
+        print(f"🔬 Profile saved: {path}")
+        return path
+
+
+# --------------------------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            body, ctype = self.metrics.render_prometheus(), "text/plain; version=0.0.4"
+        elif url.path == "/stats":
+            body, ctype = json.dumps(self.metrics.snapshot(), indent=2), "application/json"
+        elif url.path == "/profile":
+            try:
+                seconds = float(parse_qs(url.query).get("seconds", [PROFILE_SECONDS])[0])
+            except ValueError:
+                seconds = math.nan
+            if not seconds > 0:   # also rejects NaN
+                self.send_error(400, "seconds must be a positive number")
+                return
+            seconds = min(seconds, PROFILE_MAX_SECONDS)
+            n = self.metrics.request_profile(seconds)
+            body, ctype = f"profiling {n} loop(s) for {seconds:g}s\n", "text/plain"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass   # scrapes every few seconds would flood the console
+
+
+_metrics = None
+_server = None
+_lock = threading.Lock()
+
+
+def get_metrics():
+    """Process-wide ``Metrics`` registry."""
+    global _metrics
+    with _lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
+
+
+def serve_metrics(port=METRICS_PORT, host=METRICS_HOST, tries=8):
+    """Start the local HTTP endpoint once per process (``/metrics``, ``/stats``, ``/profile``).
+
+    If the port is taken (e.g. another stream's worker process) the next
+    free one of ``tries`` ports is used. Returns the bound port or None.
+    """
+    global _server
+    metrics = get_metrics()
+    with _lock:
+        if _server is not None:
+            return _server.server_address[1]
+        if not port or not metrics.enabled:
+            return None
+        handler = type("MetricsHandler", (_Handler,), {"metrics": metrics})
+        for p in range(port, port + tries):
+            try:
+                _server = ThreadingHTTPServer((host, p), handler)
+                break
+            except OSError:
+                continue
+        else:
+            print(f"⚠️ Metrics endpoint: ports {port}-{port + tries - 1} are in use.")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    bound = _server.server_address[1]
+    print(f"📈 Metrics on http://{host}:{bound}/metrics (pid {os.getpid()}, py-spy: "
+          f"py-spy top --pid {os.getpid()})")
+    return bound
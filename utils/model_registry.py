@@ -0,0 +1,146 @@
+# utils/model_registry.py
+
+import glob
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from config import (
+    MODEL_PATH, MODEL_FOLLOW_LATEST, MODEL_RUNS_DIR, WARMUP_IMGSZ, INFERENCE_BACKEND,
+)
+
+_models = {}   # resolved path -> {"model", "mtime", "version", "load_s", "warmup_s"}
+_lock = threading.Lock()
+
+# Exported artefact next to ``best.pt`` for each backend (see export_module.py)
+BACKEND_SUFFIXES = {
+    "pytorch": ".pt",
+    "onnx": ".onnx",
+    "onnx_int8": "_int8.onnx",
+    "openvino": "_openvino_model",
+    "openvino_int8": "_int8_openvino_model",
+}
+
+
+def backend_path(weights, backend):
+    """Path of the ``backend`` variant of a ``.pt`` weights file."""
+    if backend not in BACKEND_SUFFIXES:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    stem, _ext = os.path.splitext(weights)
+    return stem + BACKEND_SUFFIXES[backend]
+
+
+def latest_weights(runs_dir=MODEL_RUNS_DIR):
+    """Newest ``*/weights/best.pt`` produced by train_module.py, or None."""
+    candidates = glob.glob(os.path.join(runs_dir, "*", "weights", "best.pt"))
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+def resolve_model_path(path=None, backend=None):
+    """Weights to load: ``path`` (default MODEL_PATH / latest run) on ``backend``.
+
+    If the exported file for the backend is missing, the ``.pt`` is used.
+    """
+    if path is None:
+        path = MODEL_PATH
+        if MODEL_FOLLOW_LATEST:
+            path = latest_weights() or path
+    backend = backend or INFERENCE_BACKEND
+    if path.endswith(".pt") and backend != "pytorch":
+        exported = backend_path(path, backend)
+        if os.path.exists(exported):
+            path = exported
+        else:
+            print(f"⚠️ No {backend} export at {exported}; using PyTorch weights. "
+                  f"Run: python export_module.py --weights {path}")
+    return os.path.abspath(path)
+
+
+def weights_version(path):
+    """Short identifier of a weights file (or exported model folder).
+
+    ``<name>@<sha1[:12]>`` of the content, so the same weights copied to
+    another machine or run folder keep their version and retrained ones
+    don't; ``name`` is the path below MODEL_RUNS_DIR when inside it.
+    """
+    files = ([path] if os.path.isfile(path) else
+             sorted(p for p in glob.glob(os.path.join(path, "**", "*"), recursive=True)
+                    if os.path.isfile(p)))
+    digest = hashlib.sha1()
+    for name in files:
+        with open(name, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    rel = os.path.relpath(path, MODEL_RUNS_DIR)
+    name = os.path.basename(path) if rel.startswith("..") else rel.replace(os.sep, "/")
+    return f"{name}@{digest.hexdigest()[:12]}"
+
+
+def warm_up(model, imgsz=WARMUP_IMGSZ, runs=1):
+    """Run dummy inference so the first real frame doesn't pay for lazy init."""
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        model(dummy, imgsz=imgsz, verbose=False)
+    return time.perf_counter() - t0
+
+
+def get_model(path=None, warmup=True, backend=None):
+    """Return a loaded (and warmed-up) YOLO model, loading each weights file once.
+
+    Models are keyed by resolved path and file mtime, so a weights file
+    rewritten by training is reloaded on the next call. ``backend``
+    (default INFERENCE_BACKEND) selects PyTorch, ONNX Runtime or OpenVINO;
+    all of them return the same ultralytics ``Results``.
+    """
+    from ultralytics import YOLO
+
+    path = resolve_model_path(path, backend)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    with _lock:
+        entry = _models.get(path)
+        if entry is not None and entry["mtime"] == mtime:
+            return entry["model"]
+
+        if entry is not None:
+            print(f"🔄 Weights changed on disk, reloading {path}")
+        t0 = time.perf_counter()
+        model = YOLO(path, task="detect")
+        load_s = time.perf_counter() - t0
+        warmup_s = warm_up(model) if warmup else 0.0
+        _models[path] = {"model": model, "mtime": mtime,
+                         "version": weights_version(path) if mtime is not None else path,
+                         "load_s": load_s, "warmup_s": warmup_s}
+        print(f"🧠 Model ready: {os.path.relpath(path)} "
+              f"(load {load_s * 1000:.0f} ms, warm-up {warmup_s * 1000:.0f} ms)")
+        return model
+
+
+def preload(path=None):
+    """Load and warm the model on a background thread (call at app start)."""
+    def load():
+        try:
+            get_model(path)
+        except Exception as exc:
+            print(f"⚠️ Model preload failed: {exc}")
+    thread = threading.Thread(target=load, name="model-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def model_version(model):
+    """Version string of a model returned by ``get_model`` (None if unknown)."""
+    with _lock:
+        for entry in _models.values():
+            if entry["model"] is model:
+                return entry["version"]
+    return None
+
+
+def model_timings():
+    """``{path: {"load_s", "warmup_s"}}`` for every loaded model."""
+    with _lock:
+        return {p: {"load_s": e["load_s"], "warmup_s": e["warmup_s"]} for p, e in _models.items()}
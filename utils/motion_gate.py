@@ -0,0 +1,68 @@
+# utils/motion_gate.py
+
+import time
+
+import numpy as np
+
+from config import (
+    MOTION_THRESHOLD, MOTION_DOWNSCALE, MOTION_MAX_SKIP, MOTION_MIN_INSPECT_INTERVAL_S,
+)
+
+
+def thumbnail(frame, step=MOTION_DOWNSCALE):
+    """Strided grey thumbnail (no resize, no copy of the full frame)."""
+    small = frame[::step, ::step]
+    if small.ndim == 3:
+        return small.mean(axis=2, dtype=np.float32)
+    return small.astype(np.float32)
+
+
+class MotionGate:
+    """Skip inference on frames that match the last inspected frame.
+
+    A frame is inspected when its mean absolute grey difference against the
+    last *inspected* frame exceeds ``threshold`` (0-255 scale). Regardless
+    of change, at least one frame every ``max_skip`` frames and every
+    ``min_interval_s`` seconds is inspected, so coverage never drops below
+    that guaranteed rate.
+    """
+
+    def __init__(self, threshold=MOTION_THRESHOLD, step=MOTION_DOWNSCALE,
+                 max_skip=MOTION_MAX_SKIP, min_interval_s=MOTION_MIN_INSPECT_INTERVAL_S):
+        self.threshold = threshold
+        self.step = step
+        self.max_skip = max_skip
+        self.min_interval_s = min_interval_s
+        self._ref = None
+        self._since = 0
+        self._last_t = 0.0
+        self.seen = 0
+        self.skipped = 0
+        self.forced = 0
+        self.last_diff = 0.0
+
+    def should_infer(self, frame):
+        self.seen += 1
+        thumb = thumbnail(frame, self.step)
+        now = time.perf_counter()
+        if self._ref is None or self._ref.shape != thumb.shape:
+            changed = True
+        else:
+            self.last_diff = float(np.abs(thumb - self._ref).mean())
+            changed = self.last_diff > self.threshold
+
+        if not changed:
+            if self._since + 1 < self.max_skip and now - self._last_t < self.min_interval_s:
+                self._since += 1
+                self.skipped += 1
+                return False
+            self.forced += 1
+
+        self._ref = thumb
+        self._since = 0
+        self._last_t = now
+        return True
+
+    def stats(self):
+        return {"frames": self.seen, "skipped": self.skipped, "forced": self.forced,
+                "inspected": self.seen - self.skipped}
@@ -0,0 +1,226 @@
+# utils/pipeline.py
+
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+# A captured frame with its capture time (monotonic ns) and strip position
+Frame = namedtuple("Frame", "image t_ns length_m index")
+
+
+class FrameRing:
+    """Bounded ring buffer between the capture thread and inference.
+
+    When full, the oldest frame is discarded so the consumer always sees the
+    newest frames (newest-frame-wins). With ``policy="drop_newest"`` the
+    incoming frame is discarded instead, keeping a contiguous run of frames.
+    Dropped frames are counted.
+    """
+
+    def __init__(self, maxlen=2, policy="drop_oldest"):
+        if policy not in ("drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown ring policy: {policy}")
+        self.maxlen = max(1, int(maxlen))
+        self.policy = policy
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxlen:
+                self.dropped += 1
+                if self.policy == "drop_newest":
+                    return
+                self._items.popleft()
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest buffered item, or None on timeout / when closed and empty."""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        with self._cond:
+            return self._closed and not self._items
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def stats(self):
+        return {"depth": len(self), "maxlen": self.maxlen,
+                "frames": self.put_count, "dropped": self.dropped}
+
+
+class SinkWorker:
+    """Background worker that applies ``handler`` to submitted items.
+
+    ``policy`` decides what happens when the queue is full:
+      "drop_oldest" – evict the oldest pending item (display, previews)
+      "drop_newest" – reject the new item (persistence never blocks inference)
+      "block"       – wait for space (use only where back-pressure is wanted)
+    ``observe`` receives the handler time of each item (stage metrics).
+    """
+
+    def __init__(self, name, handler, maxsize=256, policy="drop_newest", observe=None):
+        if policy not in ("drop_oldest", "drop_newest", "block"):
+            raise ValueError(f"Unknown sink policy: {policy}")
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.observe = observe   # optional callable(seconds) per handled item
+        self._queue = queue.Queue(maxsize=max(1, int(maxsize)))
+        self._thread = threading.Thread(target=self._run, name=f"sink-{name}", daemon=True)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_s = 0.0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, item):
+        """Queue ``item``; returns False if it was dropped."""
+        with self._lock:
+            self.submitted += 1
+        if self.policy == "block":
+            self._queue.put(item)
+            return True
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        if self.policy == "drop_newest":
+            with self._lock:
+                self.dropped += 1
+            return False
+        # drop_oldest: make room for the newest item
+        try:
+            self._queue.get_nowait()
+            self._queue.task_done()
+            with self._lock:
+                self.dropped += 1
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                t0 = time.perf_counter()
+                try:
+                    self.handler(item)
+                except Exception as exc:
+                    with self._lock:
+                        self.errors += 1
+                    print(f"⚠️ [{self.name}] sink error: {exc}")
+                dt = time.perf_counter() - t0
+                with self._lock:
+                    self.processed += 1
+                    self.busy_s += dt
+                if self.observe is not None:
+                    self.observe(dt)
+            finally:
+                self._queue.task_done()
+
+    def close(self, timeout=None):
+        """Drain pending items, then stop the worker thread."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {"depth": self._queue.qsize(), "submitted": self.submitted,
+                    "processed": self.processed, "dropped": self.dropped,
+                    "errors": self.errors, "busy_s": round(self.busy_s, 3)}
+
+
+_STOP = object()
+
+
+class PreviewThrottle:
+    """Decide which frames get a preview: every ``every_n``-th frame, at most ``max_fps``.
+
+    ``every_n=0`` disables previews entirely (headless); ``max_fps=0`` means no cap.
+    """
+
+    def __init__(self, every_n=1, max_fps=0.0):
+        self.every_n = int(every_n)
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self._count = 0
+        self._last = 0.0
+
+    def due(self):
+        if self.every_n <= 0:
+            return False
+        self._count += 1
+        if self._count % self.every_n:
+            return False
+        now = time.perf_counter()
+        if now - self._last < self.min_interval:
+            return False
+        self._last = now
+        return True
+
+
+class LatencyWindow:
+    """Capture-to-result latencies of the most recent ``maxlen`` frames."""
+
+    def __init__(self, maxlen=10000):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, t_ns, now_ns=None):
+        """Record one frame captured at ``t_ns`` (monotonic ns) and finished now."""
+        now_ns = time.monotonic_ns() if now_ns is None else now_ns
+        with self._lock:
+            self._samples.append((now_ns - t_ns) / 1e6)
+
+    def percentiles(self, qs=(50, 95, 99)):
+        """``{"p50_ms": …, …}``; empty if no frame was recorded."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {}
+        last = len(samples) - 1
+        return {f"p{q}_ms": round(samples[min(last, int(round(q / 100 * last)))], 1) for q in qs}
+
+
+def format_stage_stats(stages):
+    """One line per stage, e.g. for the end-of-run summary."""
+    lines = []
+    for name, stats in stages.items():
+        parts = "  ".join(f"{k}={v}" for k, v in stats.items())
+        lines.append(f"   {name:<9} {parts}")
+    return "\n".join(lines)
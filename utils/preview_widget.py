@@ -0,0 +1,105 @@
+# utils/preview_widget.py
+
+import threading
+
+import cv2
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QLabel, QSizePolicy
+
+from utils.pipeline import PreviewThrottle
+from config import PREVIEW_MAX_FPS
+
+_HAS_BGR888 = hasattr(QImage, "Format_BGR888")   # Qt >= 5.14
+
+
+class PreviewWidget(QLabel):
+    """Live BGR frame preview that never makes producers or the GUI wait.
+
+    ``submit(frame)`` may be called from any thread at any rate: frames
+    over the ``max_fps`` cap are dropped at once, and the rest go into a
+    single latest-frame slot (a newer frame replaces one not yet shown).
+    A scaler thread resizes the newest frame to the widget size with
+    OpenCV and wraps it in a ``Format_BGR888`` QImage without a colour
+    conversion; the GUI thread only turns that small image into a pixmap.
+    """
+
+    _image_ready = pyqtSignal(QImage, object)
+
+    def __init__(self, text="Camera preview", max_fps=PREVIEW_MAX_FPS, parent=None):
+        super().__init__(text, parent)
+        self.setAlignment(Qt.AlignCenter)
+        self.setMinimumSize(160, 120)
+        self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)   # pixmaps must not resize the layout
+        self._throttle = PreviewThrottle(1, max_fps)
+        self._cond = threading.Condition()
+        self._slot = None
+        self._target = (self.width(), self.height())
+        self._closed = False
+        self.submitted = 0
+        self.dropped = 0
+        self.shown = 0
+        self._image_ready.connect(self._show_image)
+        self._thread = threading.Thread(target=self._scale_loop, name="preview-scale", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        """Offer a BGR frame; returns immediately."""
+        with self._cond:
+            self.submitted += 1
+            if not self._throttle.due():
+                self.dropped += 1
+                return
+            if self._slot is not None:
+                self.dropped += 1      # stale frame never shown
+            self._slot = frame
+            self._cond.notify()
+
+    def clear_preview(self):
+        with self._cond:
+            self._slot = None
+        self.clear()
+
+    def _scale_loop(self):
+        while True:
+            with self._cond:
+                while self._slot is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                frame, self._slot = self._slot, None
+                tw, th = self._target
+            h, w = frame.shape[:2]
+            s = min(tw / w, th / h)
+            if 0 < s < 1.0:
+                frame = cv2.resize(frame, (max(1, int(w * s)), max(1, int(h * s))),
+                                   interpolation=cv2.INTER_AREA)
+            if not frame.flags["C_CONTIGUOUS"]:
+                frame = frame.copy()
+            if not _HAS_BGR888:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            h, w = frame.shape[:2]
+            fmt = QImage.Format_BGR888 if _HAS_BGR888 else QImage.Format_RGB888
+            # QImage wraps the array's buffer; the array travels with it to stay alive
+            qimg = QImage(frame.data, w, h, frame.strides[0], fmt)
+            self._image_ready.emit(qimg, frame)
+
+    def _show_image(self, qimg, _buffer):
+        self.setPixmap(QPixmap.fromImage(qimg))
+        self.shown += 1
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        with self._cond:
+            self._target = (max(1, self.width()), max(1, self.height()))
+
+    def close_preview(self):
+        """Stop the scaler thread (the widget can no longer be fed)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            return {"submitted": self.submitted, "shown": self.shown, "dropped": self.dropped}
@@ -0,0 +1,137 @@
+# utils/roi.py
+
+import time
+
+import numpy as np
+
+from utils.detections import Boxes, DetectionResult, result_arrays
+from config import (
+    ROI_MODE, ROI_FIXED, ROI_MARGIN_PX, ROI_REFRESH_FRAMES, ROI_SMOOTHING, TRACK_MOTION_AXIS,
+)
+
+
+def find_strip_edges(frame, axis=TRACK_MOTION_AXIS, step=4):
+    """Locate the strip's two edges across the direction of travel.
+
+    Works on a strided (downsampled) grey profile: the column (or row) mean
+    brightness is smoothed and the strongest rising edge in the first half
+    and falling edge in the second half are taken as the strip borders.
+    Returns ``(lo, hi)`` in full-resolution pixels.
+    """
+    small = frame[::step, ::step]
+    grey = small.mean(axis=2) if small.ndim == 3 else small.astype(np.float32)
+    profile = grey.mean(axis=0 if axis == "y" else 1)
+    n = len(profile)
+    if n < 8:
+        return 0, n * step
+    k = max(3, n // 50)
+    profile = np.convolve(profile, np.ones(k) / k, mode="same")
+    grad = np.diff(profile)
+    half = len(grad) // 2
+    lo = int(np.argmax(np.abs(grad[:half])))
+    hi = half + int(np.argmax(np.abs(grad[half:]))) + 1
+    return lo * step, hi * step
+
+
+class StripROI:
+    """Region of interest: the strip itself, without rollers or background.
+
+    ``mode`` is "fixed" (``ROI_FIXED`` frame fractions), "auto" (strip
+    edges re-detected every ``refresh_frames`` and smoothed) or "off".
+    """
+
+    def __init__(self, mode=ROI_MODE, fixed=ROI_FIXED, margin=ROI_MARGIN_PX,
+                 refresh_frames=ROI_REFRESH_FRAMES, smoothing=ROI_SMOOTHING,
+                 axis=TRACK_MOTION_AXIS):
+        if mode not in ("off", "fixed", "auto"):
+            raise ValueError(f"Unknown ROI mode: {mode}")
+        self.mode = mode
+        self.fixed = fixed
+        self.margin = margin
+        self.refresh_frames = max(1, int(refresh_frames))
+        self.smoothing = smoothing
+        self.axis = axis
+        self._edges = None
+        self._count = 0
+
+    def window(self, frame):
+        """``(x0, y0, x1, y1)`` pixel window for ``frame``."""
+        h, w = frame.shape[:2]
+        if self.mode == "off":
+            return 0, 0, w, h
+        if self.mode == "fixed":
+            fx0, fy0, fx1, fy1 = self.fixed
+            return int(fx0 * w), int(fy0 * h), int(fx1 * w), int(fy1 * h)
+
+        if self._edges is None or self._count % self.refresh_frames == 0:
+            lo, hi = find_strip_edges(frame, self.axis)
+            if self._edges is not None:
+                a = self.smoothing
+                lo = a * self._edges[0] + (1 - a) * lo
+                hi = a * self._edges[1] + (1 - a) * hi
+            self._edges = (lo, hi)
+        self._count += 1
+
+        extent = w if self.axis == "y" else h
+        lo = max(0, int(self._edges[0]) - self.margin)
+        hi = min(extent, int(self._edges[1]) + self.margin)
+        if hi - lo < extent // 10:       # implausible edge estimate: use the whole frame
+            lo, hi = 0, extent
+        return (lo, 0, hi, h) if self.axis == "y" else (0, lo, w, hi)
+
+    def crop(self, frame):
+        """Zero-copy view of the ROI and its ``(x0, y0)`` offset."""
+        x0, y0, x1, y1 = self.window(frame)
+        return frame[y0:y1, x0:x1], (x0, y0)
+
+
+class ROIInference:
+    """Crop each frame to the strip ROI before inference and map boxes back.
+
+    Wraps a BatchInferenceEngine (or TiledInference) and keeps its
+    ``infer`` contract, so results are in full-frame coordinates.
+    """
+
+    def __init__(self, engine, roi=None):
+        self.engine = engine
+        self.roi = roi or StripROI()
+        self.pixels_in = 0
+        self.pixels_inferred = 0
+        self.roi_s = 0.0
+
+    def infer(self, frames):
+        frames = list(frames)
+        t0 = time.perf_counter()
+        crops, offsets = [], []
+        for frame in frames:
+            crop, offset = self.roi.crop(frame)
+            crops.append(crop)
+            offsets.append(offset)
+            self.pixels_in += frame.shape[0] * frame.shape[1]
+            self.pixels_inferred += crop.shape[0] * crop.shape[1]
+        self.roi_s += time.perf_counter() - t0
+
+        out = []
+        for frame, offset, result in zip(frames, offsets, self.engine.infer(crops)):
+            xyxy, conf, cls = result_arrays(result, offset)
+            out.append(DetectionResult(frame, Boxes(xyxy, conf, cls), self.model.names))
+        return out
+
+    @property
+    def model(self):
+        return self.engine.model
+
+    @property
+    def batch_size(self):
+        return self.engine.batch_size
+
+    @property
+    def frames(self):
+        return self.engine.frames
+
+    def collect(self, get_item, poll_s=0.5):
+        return self.engine.collect(get_item, poll_s)
+
+    def summary(self):
+        kept = self.pixels_inferred / self.pixels_in if self.pixels_in else 1.0
+        return f"roi {self.roi.mode}: {kept:.0%} of pixels inferred; {self.engine.summary()}"
@@ -0,0 +1,187 @@
+# utils/session.py
+
+import os
+import itertools
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from utils.sql_connector import connect, get_store
+from config import DB_NAME, SESSION_RESUME, SESSION_STALE_S
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SESSION_FIELDS = ("id", "sheet_number", "camera_id", "surface", "status", "started_at",
+                  "updated_at", "ended_at", "frames", "length_m", "defects", "resumes", "pid")
+
+
+def _now():
+    return datetime.now().strftime(TS_FORMAT)
+
+
+def interrupted_sessions(sheet_id=None, camera_id=None, stale_s=SESSION_STALE_S, db_name=DB_NAME):
+    """Sessions that never ended: still "running" but silent for ``stale_s`` seconds.
+
+    A live session refreshes ``updated_at`` on every store flush, so a stale
+    one belongs to a process that died. Newest first, as dicts.
+    """
+    cutoff = datetime.fromtimestamp(time.time() - stale_s).strftime(TS_FORMAT)
+    sql = (f"SELECT {', '.join(SESSION_FIELDS)} FROM sessions "
+           "WHERE status = 'running' AND updated_at < ?")
+    args = [cutoff]
+    if sheet_id is not None:
+        sql += " AND sheet_number = ? AND camera_id IS ?"
+        args += [sheet_id, camera_id]
+    conn = sqlite3.connect(db_name)
+    try:
+        rows = conn.execute(sql + " ORDER BY updated_at DESC", args).fetchall()
+    except sqlite3.OperationalError:   # database from before sessions existed
+        rows = []
+    finally:
+        conn.close()
+    return [dict(zip(SESSION_FIELDS, row)) for row in rows]
+
+
+def close_session(session_id, status="abandoned", db_name=DB_NAME):
+    """Mark an interrupted session as done without resuming it."""
+    conn = connect(db_name)
+    with conn:
+        conn.execute("UPDATE sessions SET status = ?, ended_at = ? WHERE id = ?",
+                     (status, _now(), session_id))
+    conn.close()
+
+
+class DetectionSession:
+    """Crash-safe journal of one detection run of a sheet (per camera stream).
+
+    ``begin()`` commits the session row, resuming an interrupted session of
+    the same sheet and stream when asked. The detection loop only updates
+    the progress in memory (``update``); the DefectStore writer thread
+    writes it in the same transaction as the defect rows and counts the
+    session's rows there, so journaling never blocks detection and the
+    defect count always matches what was committed. ``end()`` marks the
+    session finished.
+
+    The journaled ``length_m`` is a committed watermark, not the position
+    of the last inferred frame: it stays below the first position of every
+    open track and of every row handed to the DB sink (``submitted``) but
+    not committed yet, so a resumed run re-inspects those stretches instead
+    of skipping defects that were lost with the crash.
+    """
+
+    def __init__(self, sheet_id, camera_id=None, surface=None, db_name=DB_NAME, store=None):
+        self.sheet_id = sheet_id
+        self.camera_id = camera_id
+        self.surface = surface
+        self.db_name = db_name
+        self.store = store
+        self.id = None
+        self.frames = 0
+        self.length_m = 0.0
+        self.defects = 0
+        self.resumed = False
+        self._staged = 0
+        self._committing = 0
+        self._prior = None
+        self._progress = (0.0, None)   # (current position, first position of open tracks)
+        self._in_flight = deque()      # positions of submitted rows, in submission order
+        self._lock = threading.Lock()
+
+    def lookup(self):
+        """The interrupted session ``begin(resume=True)`` would continue, or None.
+
+        Lets the caller start the meter at the resumed position before the
+        session (and the camera) are started.
+        """
+        if self._prior is None:
+            self._prior = interrupted_sessions(self.sheet_id, self.camera_id, db_name=self.db_name)
+        return self._prior[0] if self._prior else None
+
+    def begin(self, resume=SESSION_RESUME):
+        store = self.store or get_store()
+        self.store = store
+        self.lookup()
+        prior = self._prior
+        conn = connect(self.db_name)
+        with conn:
+            for old in prior[1:] if resume else prior:
+                conn.execute("UPDATE sessions SET status = 'abandoned', ended_at = ? WHERE id = ?",
+                             (_now(), old["id"]))
+            if resume and prior:
+                old = prior[0]
+                self.id, self.resumed = old["id"], True
+                self.frames, self.length_m = old["frames"], old["length_m"]
+                self._progress = (self.length_m, None)
+                self.defects = old["defects"]
+                conn.execute("UPDATE sessions SET updated_at = ?, resumes = resumes + 1, pid = ? "
+                             "WHERE id = ?", (_now(), os.getpid(), self.id))
+            else:
+                self.id = uuid.uuid4().hex[:16]
+                now = _now()
+                conn.execute("INSERT INTO sessions (id, sheet_number, camera_id, surface, status, "
+                             "started_at, updated_at, pid) VALUES (?, ?, ?, ?, 'running', ?, ?, ?)",
+                             (self.id, self.sheet_id, self.camera_id, self.surface, now, now,
+                              os.getpid()))
+        conn.close()
+        store.attach(self)
+        if self.resumed:
+            print(f"♻️ Resuming session {self.id} of {self.sheet_id} at {self.length_m:.2f} m "
+                  f"({self.frames} frames, {self.defects} defects so far).")
+        return self
+
+    # ---------------------------------------------------------------- hot path
+    def update(self, frames, length_m, open_from=None):
+        """Progress so far: absolute frame count, strip position and the
+        first position of the tracks still open (None if there are none)."""
+        self.frames = frames
+        if length_m is not None:
+            self.length_m = length_m
+        self._progress = (self.length_m, open_from)   # one assignment: read consistently
+
+    def submitted(self, length_m):
+        """A defect row at ``length_m`` was queued for the DB (call before queueing it)."""
+        with self._lock:
+            self._in_flight.append(length_m)
+
+    def withdraw(self):
+        """The row of the last ``submitted`` call was dropped and will never be committed."""
+        with self._lock:
+            if self._in_flight:
+                self._in_flight.pop()
+
+    def watermark(self, committing=0):
+        """Position below which every defect is committed once ``committing`` more rows are."""
+        length_m, open_from = self._progress
+        with self._lock:
+            pending = min(itertools.islice(self._in_flight, committing, None), default=None)
+        return min(v for v in (length_m, open_from, pending) if v is not None)
+
+    # ---------------------------------------------------------------- store thread
+    def write(self, conn, rows):
+        """Called by DefectStore inside its flush transaction (doubles as the heartbeat)."""
+        self._committing = sum(1 for row in rows if row[7] == self.id)
+        self._staged = self.defects + self._committing
+        conn.execute("UPDATE sessions SET frames = ?, length_m = ?, defects = ?, updated_at = ? "
+                     "WHERE id = ?", (self.frames, self.watermark(self._committing), self._staged,
+                                      _now(), self.id))
+
+    def committed(self):
+        """The flush transaction went through."""
+        self.defects = self._staged
+        with self._lock:
+            for _ in range(min(self._committing, len(self._in_flight))):
+                self._in_flight.popleft()
+        self._committing = 0
+
+    def end(self, status="finished"):
+        """Final flush (rows + progress), then close the session."""
+        self.store.flush()
+        self.store.detach(self)
+        conn = connect(self.db_name)
+        with conn:
+            conn.execute("UPDATE sessions SET status = ?, ended_at = ?, updated_at = ? WHERE id = ?",
+                         (status, _now(), _now(), self.id))
+        conn.close()
@@ -1,9 +1,43 @@
+import atexit
 import sqlite3
+import threading
+import time
 from datetime import datetime
-from config import DB_NAME
+from config import DB_NAME, DB_BATCH_SIZE, DB_FLUSH_INTERVAL_S, DB_MIGRATE_CHUNK_ROWS
 
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
+INSERT_SQL = '''
+    INSERT INTO defect_logs (sheet_number, defect_type, length_meter, timestamp, image_path,
+                             camera_id, surface, session_id, confidence,
+                             box_x1, box_y1, box_x2, box_y2, frame_w, frame_h,
+                             model_version, frame_index, ts_epoch, last_length_m, frames)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Columns added after the first release; init_db() adds them to older databases
+ADDED_COLUMNS = {"camera_id": "TEXT", "surface": "TEXT", "session_id": "TEXT",
+                 "confidence": "REAL",
+                 # detection box in frame pixels (xyxy) and the frame size it refers to
+                 "box_x1": "REAL", "box_y1": "REAL", "box_x2": "REAL", "box_y2": "REAL",
+                 "frame_w": "INTEGER", "frame_h": "INTEGER",
+                 "model_version": "TEXT", "frame_index": "INTEGER",
+                 "ts_epoch": "REAL",   # Unix time of `timestamp`, for numeric range queries
+                 # tracked extent: last position the defect was seen at, frames it was seen in
+                 "last_length_m": "REAL", "frames": "INTEGER"}
+
+# PRAGMA user_version once every backfill below has run on a database
+SCHEMA_VERSION = 2
+
+
+def connect(db_name=DB_NAME):
+    """Open a connection with WAL journaling and relaxed (but crash-safe) fsync."""
+    conn = sqlite3.connect(db_name, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def init_db(db_name=DB_NAME):
+    conn = connect(db_name)
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS defect_logs (
@@ -15,17 +49,218 @@ def init_db():
             image_path TEXT
         )
     ''')
-    conn.commit()
-    conn.close()
-
-def insert_defect(sheet_number, defect_type, length_meter, image_path):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+    existing = {row[1] for row in c.execute("PRAGMA table_info(defect_logs)")}
+    for name, decl in ADDED_COLUMNS.items():
+        if name not in existing:   # metadata-only change in SQLite, no table rewrite
+            c.execute(f"ALTER TABLE defect_logs ADD COLUMN {name} {decl}")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_defect_logs_sheet ON defect_logs (sheet_number)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_defect_logs_type ON defect_logs (defect_type)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_defect_logs_timestamp ON defect_logs (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_defect_logs_session ON defect_logs (session_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_defect_logs_epoch ON defect_logs (ts_epoch)")
     c.execute('''
-        INSERT INTO defect_logs (sheet_number, defect_type, length_meter, timestamp, image_path)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (sheet_number, defect_type, length_meter, timestamp, image_path))
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            sheet_number TEXT,
+            camera_id TEXT,
+            surface TEXT,
+            status TEXT,
+            started_at TEXT,
+            updated_at TEXT,
+            ended_at TEXT,
+            frames INTEGER DEFAULT 0,
+            length_m REAL DEFAULT 0,
+            defects INTEGER DEFAULT 0,
+            resumes INTEGER DEFAULT 0,
+            pid INTEGER
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_sheet ON sessions (sheet_number, status)")
     conn.commit()
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        migrate_db(conn)
     conn.close()
-#use when neeed
\ No newline at end of file
+
+
+def migrate_db(conn, chunk_rows=DB_MIGRATE_CHUNK_ROWS):
+    """Backfill the columns older rows lack, ``chunk_rows`` ids per transaction.
+
+    Only ``ts_epoch`` can be derived (from the text timestamp, which is
+    local time); box geometry, model and frame index stay NULL for rows
+    written before they were recorded. Short transactions keep the write
+    lock free for a detection run sharing the database, and since only NULL
+    cells are filled an interrupted migration just continues on the next
+    ``init_db()``. Returns the number of rows updated.
+    """
+    lo, hi = conn.execute("SELECT MIN(id), MAX(id) FROM defect_logs").fetchone()
+    updated = 0
+    if lo is not None:
+        t0 = time.perf_counter()
+        chunk_rows = max(1, int(chunk_rows))
+        for start in range(lo, hi + 1, chunk_rows):
+            with conn:
+                cur = conn.execute(
+                    "UPDATE defect_logs SET ts_epoch = CAST(strftime('%s', timestamp, 'utc') AS REAL) "
+                    "WHERE id >= ? AND id < ? AND ts_epoch IS NULL AND timestamp IS NOT NULL",
+                    (start, start + chunk_rows))
+            updated += cur.rowcount
+        if updated:
+            print(f"🛠️ Migrated {updated} defect row(s) to schema v{SCHEMA_VERSION} "
+                  f"in {time.perf_counter() - t0:.1f}s")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return updated
+
+
+class DefectStore:
+    """Buffered defect writer with one long-lived connection.
+
+    Rows are queued in memory and written with ``executemany`` in a single
+    transaction once ``batch_size`` rows are pending or ``flush_interval``
+    seconds have passed, by a background writer thread. ``flush()`` forces a
+    synchronous write; ``close()`` flushes and stops the writer.
+
+    Attached session journals (``utils.session.DetectionSession``) write
+    their progress in the same transaction as the rows, so after a crash
+    the recorded defect count matches the committed rows and the recorded
+    position is a watermark: every defect before it has been committed.
+    """
+
+    def __init__(self, db_name=DB_NAME, batch_size=DB_BATCH_SIZE,
+                 flush_interval=DB_FLUSH_INTERVAL_S):
+        self.db_name = db_name
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._conn = None
+        self._thread = None
+        self._closed = False
+        self._journals = []
+        self.rows_written = 0
+        self.flushes = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer, name="defect-store", daemon=True)
+            self._thread.start()
+        return self
+
+    def add(self, sheet_number, defect_type, length_meter, image_path, timestamp=None,
+            camera_id=None, surface=None, session_id=None, confidence=None,
+            box=None, frame_size=None, model_version=None, frame_index=None, ts_epoch=None,
+            last_length_m=None, frames=None):
+        """Queue one defect row.
+
+        ``box`` is the xyxy detection box in pixels of a frame of
+        ``frame_size`` ``(width, height)``; ``ts_epoch`` (default now) also
+        sets ``timestamp`` when that is not given.
+        """
+        if ts_epoch is None:
+            ts_epoch = time.time()
+        if timestamp is None:
+            timestamp = datetime.fromtimestamp(ts_epoch).strftime("%Y-%m-%d %H:%M:%S")
+        x1, y1, x2, y2 = (float(v) for v in box[:4]) if box is not None else (None,) * 4
+        frame_w, frame_h = frame_size if frame_size is not None else (None, None)
+        with self._cond:
+            self._pending.append((sheet_number, defect_type, length_meter, timestamp, image_path,
+                                  camera_id, surface, session_id, confidence,
+                                  x1, y1, x2, y2, frame_w, frame_h,
+                                  model_version, frame_index, ts_epoch, last_length_m, frames))
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def attach(self, journal):
+        """Have ``journal.write(conn, rows)`` run in every flush transaction."""
+        with self._cond:
+            self._journals.append(journal)
+
+    def detach(self, journal):
+        with self._cond:
+            if journal in self._journals:
+                self._journals.remove(journal)
+
+    def flush(self):
+        """Write every pending row now; returns the number of rows written."""
+        with self._write_lock:
+            with self._cond:
+                rows, self._pending = self._pending, []
+                journals = list(self._journals)
+            if not rows and not journals:
+                return 0
+            try:
+                if self._conn is None:
+                    self._conn = connect(self.db_name)
+                with self._conn:
+                    if rows:
+                        self._conn.executemany(INSERT_SQL, rows)
+                    for journal in journals:
+                        journal.write(self._conn, rows)
+            except sqlite3.Error:
+                # Keep the rows for the next attempt instead of losing them
+                with self._cond:
+                    self._pending[:0] = rows
+                raise
+            for journal in journals:
+                journal.committed()
+            self.rows_written += len(rows)
+            self.flushes += 1
+        return len(rows)
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except sqlite3.Error as exc:
+                print(f"⚠️ Defect store flush failed: {exc}")
+                time.sleep(self.flush_interval)
+            if closed:
+                return
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._pending)
+        return {"depth": depth, "rows_written": self.rows_written, "flushes": self.flushes}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide DefectStore, started on first use and flushed at exit."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DefectStore().start()
+            atexit.register(_store.close)
+        return _store
+
+
+def flush_defects():
+    """Block until every buffered defect row is committed."""
+    if _store is not None:
+        _store.flush()
+
+
+def insert_defect(sheet_number, defect_type, length_meter, image_path, **fields):
+    """Queue a defect row on the shared store (``fields``: see ``DefectStore.add``)."""
+    get_store().add(sheet_number, defect_type, length_meter, image_path, **fields)
+#use when neeed
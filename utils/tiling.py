@@ -0,0 +1,126 @@
+# utils/tiling.py
+
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.detections import Boxes, DetectionResult, nms, result_arrays
+from config import (
+    TILE_SIZE, TILE_OVERLAP, TILE_REGIONS, TILE_INCLUDE_FULL, TILE_NMS_IOU, TILE_MERGE_IOS,
+)
+
+GRID_CACHE_SIZE = 32   # frame shapes whose tile grid is kept (ROI crops vary per frame)
+
+
+def tile_grid(h, w, tile=TILE_SIZE, overlap=TILE_OVERLAP, regions=TILE_REGIONS):
+    """Overlapping ``(x0, y0, x1, y1)`` windows covering ``regions`` of an h×w frame.
+
+    Regions are ``(x0, y0, x1, y1)`` fractions of the frame. Tiles are kept
+    at full ``tile`` size where the frame allows by shifting the last tile
+    of each row/column inward.
+    """
+    stride = max(1, int(tile * (1.0 - overlap)))
+    windows = []
+    for fx0, fy0, fx1, fy1 in regions or [(0.0, 0.0, 1.0, 1.0)]:
+        rx0, ry0 = int(fx0 * w), int(fy0 * h)
+        rx1, ry1 = int(fx1 * w), int(fy1 * h)
+
+        def starts(lo, hi):
+            if hi - lo <= tile:
+                return [lo]
+            out = list(range(lo, hi - tile, stride))
+            out.append(hi - tile)
+            return out
+
+        for y0 in starts(ry0, ry1):
+            for x0 in starts(rx0, rx1):
+                win = (x0, y0, min(x0 + tile, rx1), min(y0 + tile, ry1))
+                if win not in windows:
+                    windows.append(win)
+    return windows
+
+
+class TiledInference:
+    """Run a frame as overlapping tiles in one batch and merge the boxes.
+
+    ``engine`` is a BatchInferenceEngine; every tile of every frame (plus an
+    optional downscaled full-frame pass for large defects) goes through a
+    single ``engine.infer`` call. Boxes are mapped back to frame coordinates
+    and merged with class-aware cross-tile NMS.
+    """
+
+    def __init__(self, engine, tile=TILE_SIZE, overlap=TILE_OVERLAP, regions=TILE_REGIONS,
+                 include_full=TILE_INCLUDE_FULL, iou_thr=TILE_NMS_IOU, ios_thr=TILE_MERGE_IOS):
+        self.engine = engine
+        self.tile = tile
+        self.overlap = overlap
+        self.regions = regions
+        self.include_full = include_full
+        self.iou_thr = iou_thr
+        self.ios_thr = ios_thr
+        self._grids = OrderedDict()   # LRU: shape -> windows
+        self.frames = 0
+        self.tiles = 0
+        self.infer_s = 0.0
+
+    def _grid(self, shape):
+        key = shape[:2]
+        grid = self._grids.get(key)
+        if grid is None:
+            grid = self._grids[key] = tile_grid(key[0], key[1], self.tile, self.overlap, self.regions)
+            if len(self._grids) > GRID_CACHE_SIZE:
+                self._grids.popitem(last=False)
+        else:
+            self._grids.move_to_end(key)
+        return grid
+
+    def infer(self, frames):
+        """Same contract as ``BatchInferenceEngine.infer``: one result per frame."""
+        frames = list(frames)
+        if not frames:
+            return []
+        t0 = time.perf_counter()
+        crops, owners = [], []
+        for fi, frame in enumerate(frames):
+            if self.include_full:
+                crops.append(frame)
+                owners.append((fi, 0, 0))
+            for x0, y0, x1, y1 in self._grid(frame.shape):
+                crops.append(frame[y0:y1, x0:x1])   # view, no copy
+                owners.append((fi, x0, y0))
+
+        per_frame = [[] for _ in frames]
+        for (fi, x0, y0), result in zip(owners, self.engine.infer(crops)):
+            per_frame[fi].append(result_arrays(result, (x0, y0)))
+
+        names = self.engine.model.names
+        merged = []
+        for frame, parts in zip(frames, per_frame):
+            xyxy = np.concatenate([p[0] for p in parts]) if parts else np.zeros((0, 4), np.float32)
+            conf = np.concatenate([p[1] for p in parts]) if parts else np.zeros(0, np.float32)
+            cls = np.concatenate([p[2] for p in parts]) if parts else np.zeros(0, np.float32)
+            keep = nms(xyxy, conf, cls, self.iou_thr, self.ios_thr)
+            merged.append(DetectionResult(frame, Boxes(xyxy[keep], conf[keep], cls[keep]), names))
+
+        self.infer_s += time.perf_counter() - t0
+        self.frames += len(frames)
+        self.tiles += len(crops)
+        return merged
+
+    @property
+    def model(self):
+        return self.engine.model
+
+    @property
+    def batch_size(self):
+        return self.engine.batch_size
+
+    def collect(self, get_item, poll_s=0.5):
+        return self.engine.collect(get_item, poll_s)
+
+    def summary(self):
+        tiles_per_frame = self.tiles / self.frames if self.frames else 0.0
+        ms_per_frame = self.infer_s / self.frames * 1000 if self.frames else 0.0
+        return (f"tiled {self.tile}px/{self.overlap:.0%} overlap: {tiles_per_frame:.1f} tiles/frame, "
+                f"{ms_per_frame:.1f} ms/frame; {self.engine.summary()}")
@@ -0,0 +1,50 @@
+# utils/toast.py
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QLabel
+
+from config import ALERT_TOAST_MS, ALERT_TOAST_MAX
+
+
+class ToastStack:
+    """Non-modal notifications stacked in the bottom-right corner of ``parent``.
+
+    Each toast hides itself after ``duration_ms``; at most ``max_visible``
+    are shown, the oldest making room for new ones. Must be used from the
+    GUI thread (feed it through a signal).
+    """
+
+    STYLE = ("background-color: rgba(160, 30, 30, 220); color: white; "
+             "border-radius: 6px; padding: 8px 12px; font-weight: bold;")
+
+    def __init__(self, parent, duration_ms=ALERT_TOAST_MS, max_visible=ALERT_TOAST_MAX):
+        self.parent = parent
+        self.duration_ms = duration_ms
+        self.max_visible = max_visible
+        self._toasts = []
+
+    def show_message(self, text):
+        while len(self._toasts) >= self.max_visible:
+            self._dismiss(self._toasts[0])
+        toast = QLabel(text, self.parent)
+        toast.setStyleSheet(self.STYLE)
+        toast.setAttribute(Qt.WA_TransparentForMouseEvents)
+        toast.adjustSize()
+        toast.show()
+        toast.raise_()
+        self._toasts.append(toast)
+        QTimer.singleShot(self.duration_ms, lambda t=toast: self._dismiss(t))
+        self.relayout()
+
+    def _dismiss(self, toast):
+        if toast in self._toasts:
+            self._toasts.remove(toast)
+            toast.deleteLater()
+            self.relayout()
+
+    def relayout(self):
+        margin, y = 12, self.parent.height() - 12
+        for toast in reversed(self._toasts):   # newest at the bottom
+            y -= toast.height()
+            toast.move(self.parent.width() - toast.width() - margin, y)
+            y -= 6